@@ -1,6 +1,22 @@
-"""Package placeholder for linuxcli_grep.
+"""Linux-komentoriviharjoitusten (grep) harjoitus- ja arviointiohjelma.
 
-Move functional code here when refactoring from root-level scripts.
+Moduulit:
+    konfiguraatio    configs/config.json (luetaan laiskasti)
+    tehtavat         tehtävätiedoston jäsennys ja käännetty nippu
+    tehtavasarjat    tehtäväsarjojen (grep, awk, sed) rekisteri ja --set
+    suoritus         komentojen tarkistus ja ajo
+    moottori         sisäinen suoritusmoottori (execution_engine = "inprocess")
+    valimuisti       viitetulosten välimuisti
+    vertailu         virtaava tulosteiden vertailu
+    tila             tila.json, journal ja results.json
+    profilointi      --profile-mittaukset
+    mittarit         --metrics-käyttömittarit (Prometheus-tekstimuoto)
+    arviointi        --check ja --batch
+    interaktiivinen  interaktiivinen harjoitustila
+    palaute          interaktiivisen tilan rajattu palaute ja erot
+    cli              komentorivi (konsolikomento `linuxcli-grep`)
+
+Paketin tuonti ei lue tiedostoja eikä tuo alimoduuleja.
 """
 
 __version__ = "0.1.0"
@@ -0,0 +1,311 @@
+"""Tallennettujen vastausten uudelleenvalidointi (`--check` ja `--batch`)."""
+import json
+import os
+import sys
+import threading
+from concurrent.futures import Future, ThreadPoolExecutor
+from pathlib import Path
+from typing import Any, Callable, Dict, List, Optional, Tuple
+
+from . import mittarit, profilointi
+from .konfiguraatio import asetukset
+from .profilointi import profiloi_tehtava, tehtavan_profiili, tulosta_hitaimmat
+from .tehtavasarjat import avaa_tehtavat
+from .tehtavat import tehtavan_odotettu
+from .tila import lataa_tila, tallenna_tila, tehtavan_avain, tiivista_journal, varmista_opiskelijatiedot
+from .valimuisti import (aja_oikea_komento, kirjoita_valimuistit, tuomio_valimuisti, validoinnin_sormenjalki,
+                         vertaa_tuomiolla, viite_valimuisti)
+from .vertailu import tulosteen_tiivisteet
+
+
+def oletus_rinnakkaisuus() -> int:
+    """Oletusmäärä rinnakkaisia työntekijöitä: prosessorien määrä."""
+    return os.cpu_count() or 1
+
+
+class Arvioija:
+    """Ajaa uudelleenvalidoinnit yhteisessä säiepoolissa.
+
+    Kunkin tehtävän oikea tuloste ja sen rivitiivisteet lasketaan vain
+    kerran, vaikka samaa tehtävää validoitaisiin usealle opiskelijalle.
+    Oikeaa komentoa ei ajeta, jos tehtävänipussa on voimassa oleva
+    odotettu tuloste.
+    Samat opiskelijan komennot arvioidaan tuomiovälimuistista ajamatta.
+    """
+
+    def __init__(self, tehtavat: List[Tuple[str, str]], pool: ThreadPoolExecutor):
+        self.tehtavat = tehtavat
+        self.pool = pool
+        self._viitteet: Dict[int, Future] = {}
+        self._lukko = threading.Lock()
+
+    def viite(self, i: int) -> Future:
+        with self._lukko:
+            if i not in self._viitteet:
+                oikea = self.tehtavat[i][1]
+                odotettu = tehtavan_odotettu(self.tehtavat, i)
+                self._viitteet[i] = self._aja(
+                    i, lambda: tulosteen_tiivisteet(aja_oikea_komento(oikea, odotettu)))
+            return self._viitteet[i]
+
+    def validoi(self, i: int, student_cmd: str) -> Future:
+        # Viiteajo on jonossa ennen tätä ajoa, joten odotus ei lukitu
+        viite = self.viite(i)
+        return self._aja(i, lambda: vertaa_tuomiolla(i, student_cmd, viite.result()))
+
+    def _aja(self, i: int, fn: Callable[[], Any]) -> Future:
+        def tehtavana():
+            with profiloi_tehtava(i):
+                return fn()
+        return self.pool.submit(tehtavana)
+
+    def aloita(self, tila: Dict[str, Any], ennallaan: Optional[Dict[int, str]] = None) -> Dict[int, Future]:
+        """Käynnistä tilan kaikkien "oikein"-vastausten uudelleenvalidointi.
+
+        `ennallaan`-sanakirjan tehtävät ohitetaan, jos tilaan tallennettu
+        sormenjälki ("validoitu") on sama kuin sanakirjassa.
+        """
+        ajot = {}
+        for i, (_, oikea) in enumerate(self.tehtavat):
+            task_status = tila.get(tehtavan_avain(i))
+            if (
+                isinstance(task_status, dict)
+                and task_status.get("status") == "oikein"
+                and task_status.get("student_cmd")
+                and oikea
+            ):
+                if ennallaan and task_status.get("validoitu") == ennallaan.get(i):
+                    continue
+                ajot[i] = self.validoi(i, task_status["student_cmd"])
+        return ajot
+
+
+def validointien_sormenjaljet(tehtavat: List[Tuple[str, str]], tila: Dict[str, Any]) -> Dict[int, str]:
+    """Tilan "oikein"-vastausten nykyiset sormenjäljet (`validoinnin_sormenjalki`)."""
+    jaljet = {}
+    for i, (_, oikea) in enumerate(tehtavat):
+        task_status = tila.get(tehtavan_avain(i))
+        if (
+            isinstance(task_status, dict)
+            and task_status.get("status") == "oikein"
+            and task_status.get("student_cmd")
+            and oikea
+        ):
+            jalki = validoinnin_sormenjalki(task_status["student_cmd"], oikea)
+            if jalki is not None:
+                jaljet[i] = jalki
+    return jaljet
+
+
+def kirjaa_validoinnit(tila: Dict[str, Any], yhteensa: int, ajot: Dict[int, Future],
+                       moodi: str = "check", sormenjaljet: Optional[Dict[int, str]] = None) -> Tuple[int, bool]:
+    """Päivitä tila validointien perusteella; palauttaa (oikein, muuttui).
+
+    Tulokset käsitellään tehtäväjärjestyksessä, joten pisteet ja tallennettu
+    tila ovat samat kuin peräkkäisessä ajossa. `moodi` on mittareiden nimiö.
+    Läpäisseisiin tehtäviin tallennetaan `sormenjaljet`-sanakirjan
+    sormenjälki ("validoitu"), jotta seuraava ajo voi ohittaa ne.
+    """
+    oikein = 0
+    changed = False
+    for i in range(yhteensa):
+        task_status = tila.get(tehtavan_avain(i))
+
+        # Jos tehtävä on vastauksessa objektina (uusi muoto)
+        if isinstance(task_status, dict):
+            status = task_status.get("status")
+
+            if i in ajot:
+                # Validoi uudelleen vertaamalla komentojen tulosteita
+                if mittarit.MITTARIT:
+                    mittarit.kirjaa_tuomio(moodi, ajot[i].result().sama)
+                if ajot[i].result().sama:
+                    oikein += 1
+                    jalki = (sormenjaljet or {}).get(i)
+                    if jalki is not None and task_status.get("validoitu") != jalki:
+                        task_status["validoitu"] = jalki
+                        changed = True
+                else:
+                    # Validointi epäonnistui - merkitse väärin
+                    task_status["status"] = "väärin"
+                    task_status.pop("validoitu", None)
+                    changed = True
+            elif status == "oikein":
+                oikein += 1
+        # Vanha muoto (string)
+        elif task_status == "oikein":
+            oikein += 1
+    return oikein, changed
+
+
+def ylittyneet_rajat(ajot: Dict[int, Future]) -> Dict[int, str]:
+    """Tehtävät, joiden validoinnissa jokin hiekkalaatikon raja ylittyi."""
+    return {i: ajo.result().raja for i, ajo in ajot.items() if ajo.result().raja}
+
+
+def rakenna_tulokset(tila: Dict[str, Any], yhteensa: int, opiskelijatiedot: Dict[str, Any], oikein: int,
+                     rajat: Optional[Dict[int, str]] = None) -> Dict[str, Any]:
+    """Rakenna koneellisesti luettava tulos (results.json-muoto).
+
+    `rajat`-sanakirjan tehtäville lisätään kenttä "limit" (ylittynyt raja).
+    """
+    per_task = []
+    for i in range(yhteensa):
+        ts = tila.get(tehtavan_avain(i))
+        if isinstance(ts, dict):
+            status = ts.get("status")
+            student_cmd = ts.get("student_cmd")
+        else:
+            status = ts if ts is not None else "ei_vastattu"
+            student_cmd = None
+        entry = {"id": i, "status": status, "student_cmd": student_cmd}
+        if rajat and i in rajat:
+            entry["limit"] = rajat[i]
+        if profilointi.PROFILOINTI:
+            entry["profile"] = tehtavan_profiili(i)
+        per_task.append(entry)
+
+    return {
+        "nimi": opiskelijatiedot["nimi"],
+        "opiskelijanumero": opiskelijatiedot["opiskelijanumero"],
+        "score": oikein,
+        "total": yhteensa,
+        "per_task": per_task,
+    }
+
+
+def check_mode(jobs: Optional[int] = None, profiloi: bool = False, inkrementaalinen: bool = False):
+    """Validoi tilan "oikein"-vastaukset uudelleen ja kirjoita results.json.
+
+    Oletuksena kaikki tehtävät validoidaan. `inkrementaalinen`
+    (`--incremental`) ohittaa tehtävät, joiden komennot ja luetut
+    tiedostot ovat ennallaan edellisestä `--incremental`-validoinnista
+    (tilan "validoitu"-sormenjälki, jonka vain se tallentaa). Sormenjälki luetaan opiskelijan tilasta ja
+    on kenen tahansa laskettavissa, joten ohitus on vain paikalliseen
+    käyttöön; CI:n `--check` validoi aina kaiken. Profilointi validoi
+    aina kaikki tehtävät.
+    """
+    profilointi.PROFILOINTI = profiloi
+    if profiloi:
+        # getrusage(RUSAGE_CHILDREN)-erotukset ovat kohdistettavissa vain peräkkäin ajettaessa
+        jobs = 1
+        inkrementaalinen = False
+    tehtavat = avaa_tehtavat()
+    tila = lataa_tila()
+    # Kesken jääneen session journal tila.json:iin (esim. valmis.sh ennen committia)
+    tiivista_journal(tila)
+    opiskelijatiedot = varmista_opiskelijatiedot(tila, kysy_kayttajalta=False)
+
+    yhteensa = len(tehtavat)
+    jobs = max(1, jobs or oletus_rinnakkaisuus())
+
+    print("🔍 CHECK-MODE - Validoidaan uudelleen")
+
+    # Sormenjäljet lasketaan ja tallennetaan vain --incremental-ajossa, jotta
+    # tavallinen --check (esim. valmis.sh) ei kirjoita tilaan ylimääräistä
+    sormenjaljet = validointien_sormenjaljet(tehtavat, tila) if inkrementaalinen else {}
+    with ThreadPoolExecutor(max_workers=jobs) as pool:
+        ajot = Arvioija(tehtavat, pool).aloita(tila, sormenjaljet if inkrementaalinen else None)
+    oikein, changed = kirjaa_validoinnit(tila, yhteensa, ajot, sormenjaljet=sormenjaljet)
+    kirjoita_valimuistit()
+    ohitetut = sum(1 for i in sormenjaljet if i not in ajot)
+    if ohitetut:
+        print(f"⏭️  {ohitetut} tehtävää ennallaan edellisestä validoinnista, ei ajettu uudelleen (--incremental)")
+
+    # Jos jotain muuttui tilassa, tallenna se
+    if changed:
+        tallenna_tila(tila)
+
+    results = rakenna_tulokset(tila, yhteensa, opiskelijatiedot, oikein, ylittyneet_rajat(ajot))
+
+    # Kirjoita tulos tiedostoon ja stdoutiin
+    try:
+        with open(asetukset().results_file, "w", encoding="utf-8") as f:
+            json.dump(results, f, ensure_ascii=False, indent=2)
+    except Exception:
+        pass
+
+    print(json.dumps(results, ensure_ascii=False))
+
+    print(f"Oikein: {oikein}/{yhteensa}")
+    print(f"🗄️  Viitetulosten välimuisti: {viite_valimuisti().tilasto()}")
+    print(f"🗄️  Tuomiovälimuisti: {tuomio_valimuisti().tilasto()}")
+    mittarit.kirjoita()
+    if profiloi:
+        tulosta_hitaimmat(tehtavat)
+
+    if oikein == yhteensa:
+        print("✅ Kaikki tehtävät oikein")
+        sys.exit(0)
+    else:
+        print("❌ Kaikki tehtävät eivät ole oikein")
+        sys.exit(1)
+
+# ---------- Eräarviointi ----------
+
+def etsi_palautukset(hakemisto: Path) -> List[Tuple[str, Path]]:
+    """Etsi arvioitavat tilatiedostot.
+
+    Hakemisto voi sisältää suoraan `<opiskelija>.json`-tilatiedostoja tai
+    opiskelijoiden checkout-hakemistoja, joista luetaan `tila_tiedosto`.
+    Palauttaa `(opiskelija, tilatiedosto)`-parit nimen mukaan järjestettynä.
+    """
+    palautukset = []
+    for p in sorted(hakemisto.iterdir()):
+        if p.is_file() and p.suffix == ".json":
+            palautukset.append((p.stem, p))
+        elif p.is_dir() and (p / asetukset().tila_tiedosto).is_file():
+            palautukset.append((p.name, p / asetukset().tila_tiedosto))
+    return palautukset
+
+
+def batch_mode(hakemisto: str, jobs: Optional[int] = None, tulos_hakemisto: str = "output/batch"):
+    """Arvioi kaikki hakemiston palautukset yhdessä prosessissa.
+
+    Tehtävät luetaan ja oikeat tulosteet lasketaan vain kerran; kaikkien
+    opiskelijoiden validoinnit ajetaan samassa säiepoolissa. Opiskelijoiden
+    tilatiedostoja ei muokata.
+    """
+    tehtavat = avaa_tehtavat()
+    yhteensa = len(tehtavat)
+    palautukset = etsi_palautukset(Path(hakemisto))
+    jobs = max(1, jobs or oletus_rinnakkaisuus())
+    ulos = Path(tulos_hakemisto)
+    ulos.mkdir(parents=True, exist_ok=True)
+
+    print(f"📦 BATCH-MODE - {len(palautukset)} palautusta, {jobs} rinnakkaista ajoa")
+
+    tilat = {opiskelija: lataa_tila(polku) for opiskelija, polku in palautukset}
+    with ThreadPoolExecutor(max_workers=jobs) as pool:
+        arvioija = Arvioija(tehtavat, pool)
+        # Kaikki ajot jonoon ennen ensimmäistäkään odotusta
+        ajot = {opiskelija: arvioija.aloita(tila) for opiskelija, tila in tilat.items()}
+    kirjoita_valimuistit()
+
+    yhteenveto = []
+    for opiskelija, polku in palautukset:
+        tila = tilat[opiskelija]
+        oikein, _ = kirjaa_validoinnit(tila, yhteensa, ajot[opiskelija], moodi="batch")
+        opiskelijatiedot = {
+            "nimi": tila.get("nimi") or "",
+            "opiskelijanumero": tila.get("opiskelijanumero") or "",
+        }
+        results = rakenna_tulokset(tila, yhteensa, opiskelijatiedot, oikein, ylittyneet_rajat(ajot[opiskelija]))
+        (ulos / f"{opiskelija}.json").write_text(
+            json.dumps(results, ensure_ascii=False, indent=2), encoding="utf-8"
+        )
+        yhteenveto.append({
+            "opiskelija": opiskelija,
+            "lahde": str(polku),
+            **{k: results[k] for k in ("nimi", "opiskelijanumero", "score", "total")},
+        })
+        print(f"{oikein:>3}/{yhteensa}  {opiskelija}")
+
+    (ulos / "yhteenveto.json").write_text(
+        json.dumps({"total": yhteensa, "opiskelijat": yhteenveto}, ensure_ascii=False, indent=2),
+        encoding="utf-8",
+    )
+    print(f"✅ Tulokset kirjoitettu: {ulos}/ ({len(yhteenveto)} opiskelijaa)")
+    print(f"🗄️  Viitetulosten välimuisti: {viite_valimuisti().tilasto()}")
+    print(f"🗄️  Tuomiovälimuisti: {tuomio_valimuisti().tilasto()}")
+    mittarit.kirjoita()
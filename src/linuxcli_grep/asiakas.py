@@ -0,0 +1,69 @@
+"""Kevyt asiakas arviointipalvelimelle (ks. `palvelin`).
+
+Ei tuo asyncioa eikä suoritusmoduuleja, ja `socket` tuodaan vasta kun
+palvelimen soketti on olemassa, joten interaktiivisen tilan käynnistys
+pysyy kevyenä.
+"""
+import json
+from pathlib import Path
+from typing import Any, Dict, Optional, Tuple
+
+# Palvelin ajaa vain data/-hakemiston tiedostoja lukevia komentoja; muut
+# ajetaan paikallisesti
+DATAN_ULKOPUOLELLA = "komento lukee tiedostoja data/-hakemiston ulkopuolelta"
+
+
+class PalvelinVirhe(Exception):
+    """Palvelin vastasi virheellä tai yhteys katkesi."""
+
+
+class PalvelinAsiakas:
+    def __init__(self, polku: Path, aikaraja_s: float):
+        import socket
+        self._soketti = socket.socket(socket.AF_UNIX, socket.SOCK_STREAM)
+        self._soketti.settimeout(aikaraja_s)
+        self._soketti.connect(str(polku))
+        self._lukija = self._soketti.makefile('rb')
+
+    @classmethod
+    def yhdista(cls, polku: Path, aikaraja_s: float = 60.0) -> Optional["PalvelinAsiakas"]:
+        """Yhdistä palvelimeen; None, jos palvelin ei ole käynnissä."""
+        if not polku.exists():
+            return None
+        try:
+            asiakas = cls(polku, aikaraja_s)
+            asiakas.pyynto({"op": "ping"})
+            return asiakas
+        except (OSError, AttributeError, PalvelinVirhe):  # AttributeError: ei AF_UNIXia
+            return None
+
+    def pyynto(self, pyynto: Dict[str, Any]) -> Dict[str, Any]:
+        try:
+            self._soketti.sendall(json.dumps(pyynto, ensure_ascii=False).encode('utf-8') + b"\n")
+            rivi = self._lukija.readline()
+        except OSError as e:
+            raise PalvelinVirhe(str(e))
+        if not rivi:
+            raise PalvelinVirhe("yhteys katkesi")
+        vastaus = json.loads(rivi)
+        if not vastaus.get("ok"):
+            raise PalvelinVirhe(vastaus.get("error", "tuntematon virhe"))
+        return vastaus
+
+    def arvioi(self, tehtava: int, cmd: str, tunniste: str = "", sarja: Optional[str] = None) -> Tuple[str, str]:
+        """Aja opiskelijan komento palvelimella; palauttaa (oma tuloste, oikea tuloste)."""
+        pyynto = {"op": "grade", "task": tehtava, "cmd": cmd, "client": tunniste}
+        if sarja is not None:
+            pyynto["set"] = sarja
+        vastaus = self.pyynto(pyynto)
+        return vastaus["student_output"], vastaus["reference_output"]
+
+    def tilastot(self) -> Dict[str, Any]:
+        return self.pyynto({"op": "stats"})["stats"]
+
+    def mittarit(self) -> str:
+        return self.pyynto({"op": "metrics"})["metrics"]
+
+    def sulje(self) -> None:
+        self._lukija.close()
+        self._soketti.close()
@@ -0,0 +1,113 @@
+"""Komentorivikäyttöliittymä (`linuxcli-grep` / `python3 harjoitus.py`).
+
+Tilojen toteutukset tuodaan vasta valitun tilan perusteella, jotta esim.
+interaktiivinen käynnistys ei lataa säiepoolia eikä sisäistä moottoria.
+"""
+import argparse
+import sys
+from typing import List, Optional
+
+
+def parse_args(argv: List[str]) -> argparse.Namespace:
+    parser = argparse.ArgumentParser(description="Linux-komentoriviharjoitukset.")
+    parser.add_argument("komento", nargs="?", choices=["serve", "stats", "metrics", "sets"],
+                        help="serve: käynnistä arviointipalvelin; stats: näytä palvelimen tilastot; "
+                             "metrics: palvelimen mittarit Prometheus-muodossa; sets: listaa tehtäväsarjat")
+    parser.add_argument("--set", dest="sarja", metavar="SARJA",
+                        help="Tehtäväsarja (esim. grep, awk, sed; oletus: default_task_set konfiguraatiosta)")
+    parser.add_argument("--socket", metavar="POLKU",
+                        help="Arviointipalvelimen soketti (oletus: daemon_socket konfiguraatiosta)")
+    parser.add_argument("--check", "--ci", dest="check", action="store_true",
+                        help="Validoi tallennetut vastaukset ja kirjoita results.json")
+    parser.add_argument("--batch", metavar="HAKEMISTO",
+                        help="Arvioi kaikki hakemiston tila.json-tiedostot tai checkoutit")
+    parser.add_argument("--batch-output", default="output/batch", metavar="HAKEMISTO",
+                        help="Eräarvioinnin tuloshakemisto (oletus: output/batch)")
+    parser.add_argument("--jobs", type=int, default=None, metavar="N",
+                        help="Rinnakkaisten validointien/arviointien määrä (oletus: prosessorien määrä)")
+    parser.add_argument("--incremental", action="store_true",
+                        help="--check: ohita tehtävät, jotka ovat ennallaan edellisestä validoinnista "
+                             "(vain paikalliseen käyttöön, ei CI:hin)")
+    parser.add_argument("--profile", action="store_true",
+                        help="Mittaa komentojen ajoajat ja resurssit (check: per_task-kenttään results.json:iin)")
+    parser.add_argument("--metrics", metavar="TIEDOSTO",
+                        help="Kerää käyttömittarit tähän Prometheus-tekstitiedostoon (oletus: metrics_file konfiguraatiosta)")
+    return parser.parse_args(argv)
+
+
+def stats_mode(soketti: Optional[str] = None, mittarit: bool = False) -> None:
+    import json
+    from pathlib import Path
+
+    from .asiakas import PalvelinAsiakas
+    from .konfiguraatio import asetukset
+
+    asiakas = PalvelinAsiakas.yhdista(Path(soketti) if soketti else asetukset().palvelin_soketti)
+    if asiakas is None:
+        print("❌ Arviointipalvelin ei ole käynnissä")
+        sys.exit(1)
+    if mittarit:
+        print(asiakas.mittarit(), end="")
+    else:
+        print(json.dumps(asiakas.tilastot(), ensure_ascii=False, indent=2))
+    asiakas.sulje()
+
+
+def ota_mittarit_kayttoon(polku: Optional[str]) -> None:
+    from .konfiguraatio import asetukset
+
+    polku = polku or asetukset().mittaritiedosto
+    if polku:
+        from . import mittarit
+        mittarit.ota_kayttoon(polku)
+
+
+def sets_mode() -> None:
+    from .tehtavasarjat import rekisteri
+
+    r = rekisteri()
+    for tunniste in r.tunnisteet():
+        sarja = r.sarja(tunniste)
+        oletus = " (oletus)" if tunniste == r.oletus else ""
+        print(f"{tunniste}{oletus}: {sarja.tiedosto}, sallitut: {' '.join(sarja.sallitut_komennot)}, "
+              f"aikaraja {sarja.aikaraja_s} s")
+
+
+def valitse_sarja(tunniste: Optional[str]) -> None:
+    from .tehtavasarjat import TuntematonSarja, rekisteri, valitse
+
+    try:
+        sarja = valitse(tunniste)
+    except TuntematonSarja:
+        print(f"❌ Tuntematon tehtäväsarja: {tunniste} (sarjat: {', '.join(rekisteri().tunnisteet())})")
+        sys.exit(2)
+    for polku in sarja.puuttuvat_datat():
+        print(f"⚠️  Tehtäväsarjan {sarja.tunniste} datatiedosto puuttuu: {polku}")
+
+
+def main(argv: Optional[List[str]] = None) -> None:
+    args = parse_args(sys.argv[1:] if argv is None else argv)
+    if args.komento == "sets":
+        sets_mode()
+        return
+    if args.komento not in ("stats", "metrics"):
+        valitse_sarja(args.sarja)
+        ota_mittarit_kayttoon(args.metrics)
+    if args.komento == "serve":
+        from .palvelin import serve_mode
+        serve_mode(args.socket, jobs=args.jobs)
+    elif args.komento in ("stats", "metrics"):
+        stats_mode(args.socket, mittarit=args.komento == "metrics")
+    elif args.batch:
+        from .arviointi import batch_mode
+        batch_mode(args.batch, jobs=args.jobs, tulos_hakemisto=args.batch_output)
+    elif args.check:
+        from .arviointi import check_mode
+        check_mode(jobs=args.jobs, profiloi=args.profile, inkrementaalinen=args.incremental)
+    else:
+        from .interaktiivinen import interactive_mode
+        interactive_mode(profiloi=args.profile)
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,87 @@
+"""Oikeiden tulosteiden esihaku interaktiivisessa tilassa.
+
+Taustasäikeessä pyörii asyncio-silmukka, jossa nykyisen ja seuraavan
+ratkaisemattoman tehtävän oikeat komennot ajetaan sillä aikaa, kun
+opiskelija kirjoittaa vastaustaan. Vastauksen jälkeen ajetaan enää
+opiskelijan komento. Tarpeettomaksi käyneet haut (esim. `skip`, `exit`)
+perutaan, jolloin niiden prosessiryhmät tapetaan.
+
+asyncio tuodaan vasta taustasäikeessä, joten esihaku ei hidasta
+interaktiivisen tilan käynnistystä.
+"""
+import threading
+from typing import Any, Dict, Optional, Tuple
+
+from .suoritus import aja_komento_async
+from .valimuisti import aja_oikea_komento_async
+
+
+class Esihaku:
+    def __init__(self):
+        self._asyncio: Any = None
+        self._peruttu: Tuple[type, ...] = ()
+        self._silmukka: Any = None
+        self._valmis = threading.Event()
+        # tehtävä -> (oikea komento, concurrent.futures.Future)
+        self._haut: Dict[int, Tuple[str, Any]] = {}
+        self._saie = threading.Thread(target=self._aja, name="esihaku", daemon=True)
+        self._saie.start()
+
+    def _aja(self) -> None:
+        import asyncio
+        import concurrent.futures
+        self._asyncio = asyncio
+        self._peruttu = (asyncio.CancelledError, concurrent.futures.CancelledError)
+        self._silmukka = asyncio.new_event_loop()
+        self._valmis.set()
+        try:
+            self._silmukka.run_forever()
+        finally:
+            self._silmukka.close()
+
+    def _laheta(self, coro) -> Any:
+        self._valmis.wait()
+        return self._asyncio.run_coroutine_threadsafe(coro, self._silmukka)
+
+    def esihae(self, komennot: Dict[int, str]) -> None:
+        """Käynnistä annettujen tehtävien oikeat komennot; peru muiden haut."""
+        for i in list(self._haut):
+            if i not in komennot:
+                self._haut.pop(i)[1].cancel()
+        for i, cmd in komennot.items():
+            if i not in self._haut:
+                self._haut[i] = (cmd, self._laheta(aja_oikea_komento_async(cmd)))
+
+    def oikea(self, i: int, cmd: str) -> str:
+        """Oikean komennon tuloste; odottaa esihakua tai ajaa komennon nyt."""
+        haku = self._haut.pop(i, None)
+        if haku is not None and haku[0] == cmd:
+            try:
+                return haku[1].result()
+            except self._peruttu:
+                pass
+        return self._laheta(aja_oikea_komento_async(cmd)).result()
+
+    def opiskelija(self, cmd: str) -> str:
+        return self._laheta(aja_komento_async(cmd)).result()
+
+    def sulje(self, aikaraja_s: Optional[float] = 5.0) -> None:
+        """Peru kaikki keskeneräiset ajot ja pysäytä silmukka."""
+        self._haut.clear()
+        if not self._valmis.wait(aikaraja_s):
+            return
+        asyncio = self._asyncio
+
+        async def peru_kaikki() -> None:
+            tehtavat = [t for t in asyncio.all_tasks() if t is not asyncio.current_task()]
+            for t in tehtavat:
+                t.cancel()
+            # Odotetaan, että perutut ajot ehtivät tappaa prosessiryhmänsä
+            await asyncio.gather(*tehtavat, return_exceptions=True)
+
+        try:
+            self._laheta(peru_kaikki()).result(aikaraja_s)
+        except Exception:
+            pass
+        self._silmukka.call_soon_threadsafe(self._silmukka.stop)
+        self._saie.join(aikaraja_s)
@@ -0,0 +1,425 @@
+"""Resurssirajoitettu komentojen ajo.
+
+Komento jäsennetään putken vaiheiksi (`komentorivi.jasenna_putki`), ja
+vaiheet käynnistetään suoraan ilman shelliä käyttöjärjestelmän putkilla
+ketjutettuina. Kaikki vaiheet ovat samassa, omassa prosessiryhmässään, ja
+niille asetetaan `setrlimit`-rajat (CPU-aika, osoiteavaruus, tiedostokoko,
+prosessien määrä) konfiguraatiosta. Aikarajan tai tulosterajan ylittyessä
+koko ryhmä tapetaan, joten putken vaiheita ei jää orvoiksi. Ajon jälkeen
+päätellään, mikä raja (jos mikään) ylittyi.
+
+Prosessiryhmä asetetaan `Popen`-parametrilla ja rajat `prlimit`-kääreellä,
+joka asettaa rajat ja korvaa itsensä komennolla (yksi ylimääräinen exec per
+vaihe). Jos `prlimit` puuttuu, rajat asetetaan `preexec_fn`-funktiolla, joka
+kutsuu vain `setrlimit`-funktiota valmiiksi lasketuilla arvoilla; se ei tuo
+moduuleja eikä ota Python-tason lukkoja, joten sen voi ajaa forkin jälkeen
+myös palvelimen monisäikeisessä prosessissa. Näin vaiheille ei tarvitse
+käynnistää kullekin omaa Python-tulkkia (kymmeniä millisekunteja per vaihe).
+"""
+import contextvars
+import functools
+import os
+import signal
+import subprocess
+import sys
+import threading
+from typing import Any, Callable, List, NamedTuple, Optional, Sequence, Tuple
+
+try:
+    import resource
+except ImportError:  # esim. Windows: ei rlimit-rajoja
+    resource = None
+
+from .komentorivi import Vaihe, jasenna_putki
+from .konfiguraatio import asetukset
+
+# Rajojen nimet (results.json:n "limit"-kenttä)
+AIKARAJA = "aikaraja"
+CPU = "cpu"
+MUISTI = "muisti"
+TIEDOSTOKOKO = "tiedostokoko"
+PROSESSIT = "prosessit"
+TULOSTE = "tuloste"
+
+# stderr-viestit, joista rajan ylitys tunnistetaan (kun raja on asetettu)
+_MUISTIVIESTIT = (b"memory exhausted", b"Cannot allocate memory", b"MemoryError")
+_PROSESSIVIESTIT = (b"fork", b"Resource temporarily unavailable")
+_STDERR_MAKSIMI = 64 * 1024
+
+# Popen(process_group=...) on Python 3.11:stä alkaen; vanhemmissa jokainen
+# vaihe aloittaa oman istuntonsa (ja ryhmänsä), ja ryhmät tapetaan erikseen.
+_YHTEINEN_RYHMA = sys.version_info >= (3, 11)
+
+# Raja: (resurssin nimi `resource`-moduulissa ja prlimitin optio, (pehmeä, kova))
+Raja = Tuple[str, Tuple[int, int]]
+
+_PRLIMIT_OPTIOT = {"RLIMIT_CPU": "cpu", "RLIMIT_AS": "as", "RLIMIT_FSIZE": "fsize", "RLIMIT_NPROC": "nproc"}
+
+
+def _rajaa_kovaan(nimi: str, arvo: Tuple[int, int]) -> Raja:
+    """Rajaa arvot nykyiseen kovaan rajaan, jotta kääre ei epäonnistu sen asettamisessa."""
+    _, kova = resource.getrlimit(getattr(resource, nimi))
+    if kova == resource.RLIM_INFINITY:
+        return nimi, arvo
+    return nimi, (min(arvo[0], kova), min(arvo[1], kova))
+
+
+def _rlimit_rajat() -> List[Raja]:
+    if resource is None:
+        return []
+    a = asetukset()
+    rajat = []
+    if a.raja_cpu_s > 0:
+        # Pehmeä raja lähettää SIGXCPU:n, kova tappaa varmasti sekuntia myöhemmin
+        rajat.append(("RLIMIT_CPU", (a.raja_cpu_s, a.raja_cpu_s + 1)))
+    if a.raja_muisti_mt > 0:
+        rajat.append(("RLIMIT_AS", (a.raja_muisti_mt << 20,) * 2))
+    if a.raja_tiedostokoko_mt > 0:
+        rajat.append(("RLIMIT_FSIZE", (a.raja_tiedostokoko_mt << 20,) * 2))
+    if a.raja_prosessit > 0 and hasattr(resource, "RLIMIT_NPROC"):
+        rajat.append(("RLIMIT_NPROC", (a.raja_prosessit,) * 2))
+    return [_rajaa_kovaan(nimi, arvo) for nimi, arvo in rajat]
+
+
+@functools.lru_cache(maxsize=None)
+def _prlimit() -> Optional[str]:
+    # shutil tuodaan vasta tarvittaessa, jotta moduulin tuonti pysyy kevyenä
+    import shutil
+    return shutil.which("prlimit")
+
+
+def _rajoitettu_argv(argv: List[str], rajat: List[Raja]) -> List[str]:
+    """Kääri komento `prlimit`-ohjelmaan, joka asettaa rajat ja korvaa itsensä komennolla.
+
+    Ohjelma haetaan PATHista jo tässä, jotta puuttuva ohjelma näkyy
+    `FileNotFoundError`-poikkeuksena kuten ilman käärettä. Ilman rajoja tai
+    `prlimit`-ohjelmaa komento palautetaan sellaisenaan (ks. `_rajojen_asetus`).
+    """
+    prlimit = _prlimit()
+    if not rajat or prlimit is None:
+        return list(argv)
+    import shutil
+    ohjelma = shutil.which(argv[0])
+    if ohjelma is None:
+        raise FileNotFoundError(f"komentoa ei löydy: {argv[0]}")
+    optiot = [f"--{_PRLIMIT_OPTIOT[nimi]}={p}:{k}" for nimi, (p, k) in rajat]
+    return [prlimit, *optiot, "--", ohjelma, *argv[1:]]
+
+
+def _rajojen_asetus(rajat: List[Raja]) -> Optional[Callable[[], None]]:
+    """`preexec_fn`, joka asettaa rajat lapsessa, kun `prlimit` puuttuu; muuten None."""
+    if not rajat or _prlimit() is not None:
+        return None
+    asetettavat = [(getattr(resource, nimi), arvo) for nimi, arvo in rajat]
+    setrlimit = resource.setrlimit
+
+    def aseta() -> None:
+        for r, arvo in asetettavat:
+            try:
+                setrlimit(r, arvo)
+            except (ValueError, OSError):
+                pass
+
+    return aseta
+
+
+def _jasenna(cmd) -> List[Vaihe]:
+    return jasenna_putki(cmd) if isinstance(cmd, str) else list(cmd)
+
+
+def _tapa_ryhma(prosessit: Sequence) -> None:
+    if not prosessit:
+        return
+    ryhmat = prosessit[:1] if _YHTEINEN_RYHMA else prosessit
+    tapettu = False
+    for proc in ryhmat:
+        try:
+            os.killpg(proc.pid, signal.SIGKILL)
+            tapettu = True
+        except (ProcessLookupError, PermissionError, AttributeError):
+            pass
+    if tapettu and _YHTEINEN_RYHMA:
+        return
+    for proc in prosessit:
+        if proc.returncode is None:
+            try:
+                proc.kill()
+            except ProcessLookupError:
+                pass
+
+
+def _odota_korjaamatta(proc) -> None:
+    """Odota prosessin päättymistä; zombi jätetään varaamaan pid ja prosessiryhmä.
+
+    Ilman `os.waitid`-funktiota prosessi korjataan heti (`wait`).
+    """
+    if proc.returncode is None and hasattr(os, "waitid"):
+        try:
+            os.waitid(os.P_PID, proc.pid, os.WEXITED | os.WNOWAIT)
+            return
+        except ChildProcessError:
+            pass
+    proc.wait()
+
+
+def _paattele_raja(aikakatkaistu: bool, tuloste_ylittyi: bool,
+                   paluukoodit: Sequence[Optional[int]], stderr: bytes) -> Optional[str]:
+    if aikakatkaistu:
+        return AIKARAJA
+    if tuloste_ylittyi:
+        return TULOSTE
+    # Rajan ylittänyt vaihe voi olla mikä tahansa putken vaihe
+    signaalit = {-rc for rc in paluukoodit if rc is not None and rc < 0}
+    if getattr(signal, "SIGXCPU", None) in signaalit:
+        return CPU
+    if getattr(signal, "SIGXFSZ", None) in signaalit:
+        return TIEDOSTOKOKO
+    a = asetukset()
+    if a.raja_muisti_mt > 0 and any(v in stderr for v in _MUISTIVIESTIT):
+        return MUISTI
+    if a.raja_prosessit > 0 and all(v in stderr for v in _PROSESSIVIESTIT):
+        return PROSESSIT
+    return None
+
+
+def _kaynnista(vaiheet: List[Vaihe], stderr: int, kaynnista: Callable[..., Any]) -> List[Any]:
+    """Käynnistä vaiheet putkiin ketjutettuina; viimeisen vaiheen stdout jää kutsujalle.
+
+    `kaynnista(argv, stdin, stdout, stderr, ryhma, preexec)` luo yhden
+    prosessin; `ryhma` 0 aloittaa uuden prosessiryhmän (putken ensimmäinen
+    vaihe), muut vaiheet liittyvät ensimmäisen vaiheen ryhmään. `preexec`
+    asettaa rajat, jos niitä ei aseteta kääreellä. Jos jonkin vaiheen käynnistys
+    epäonnistuu, jo käynnistetyt tapetaan.
+    """
+    rajat = _rlimit_rajat()
+    preexec = _rajojen_asetus(rajat)
+    prosessit: List[Any] = []
+    edellinen: Optional[int] = None   # edellisen vaiheen stdoutin lukupää
+    try:
+        for k, vaihe in enumerate(vaiheet):
+            if vaihe.syote is not None:
+                stdin = os.open(vaihe.syote, os.O_RDONLY)
+                if edellinen is not None:
+                    os.close(edellinen)  # kuten shell: `<` korvaa putken
+            elif edellinen is not None:
+                stdin = edellinen
+            else:
+                # Ei päätteen syötettä: `grep kuvio` ilman tiedostoa ei jää odottamaan
+                stdin = subprocess.DEVNULL
+            edellinen = None
+            viimeinen = k == len(vaiheet) - 1
+            if viimeinen:
+                stdout, lukupaa = subprocess.PIPE, None
+            else:
+                lukupaa, stdout = os.pipe()
+            ryhma = prosessit[0].pid if prosessit else 0
+            try:
+                prosessit.append(kaynnista(
+                    _rajoitettu_argv(vaihe.argv, rajat), stdin, stdout,
+                    subprocess.DEVNULL if vaihe.virheet_pois else stderr,
+                    ryhma, preexec,
+                ))
+            finally:
+                if stdin != subprocess.DEVNULL:
+                    os.close(stdin)
+                if not viimeinen:
+                    os.close(stdout)
+            edellinen = lukupaa
+    except BaseException:
+        if edellinen is not None:
+            os.close(edellinen)
+        _tapa_ryhma(prosessit)
+        raise
+    return prosessit
+
+
+class Peruutus:
+    """Työn (esim. palvelimen yhden arvioinnin) käynnistämät ajot.
+
+    `peru()` tappaa käynnissä olevat ajot ja heti ne, jotka työ käynnistää
+    perumisen jälkeen. Työ ajetaan funktiolla `peruttavissa`.
+    """
+
+    def __init__(self):
+        self.peruttu = False
+        self._ajot: List["Ajo"] = []
+        self._lukko = threading.Lock()
+
+    def _lisaa(self, ajo: "Ajo") -> None:
+        with self._lukko:
+            self._ajot.append(ajo)
+            if not self.peruttu:
+                return
+        ajo.tapa()
+
+    def _poista(self, ajo: "Ajo") -> None:
+        with self._lukko:
+            self._ajot.remove(ajo)
+
+    def peru(self) -> None:
+        with self._lukko:
+            self.peruttu = True
+            ajot = list(self._ajot)
+        for ajo in ajot:
+            ajo.tapa()
+
+
+_PERUUTUS: "contextvars.ContextVar[Optional[Peruutus]]" = contextvars.ContextVar("peruutus", default=None)
+
+
+def peruttavissa(peruutus: Peruutus, funktio: Callable[..., Any], *args: Any) -> Any:
+    """Aja `funktio(*args)` niin, että sen käynnistämät ajot voi tappaa `peruutus.peru()`:lla."""
+    merkki = _PERUUTUS.set(peruutus)
+    try:
+        return funktio(*args)
+    finally:
+        _PERUUTUS.reset(merkki)
+
+
+class Ajo:
+    """Käynnissä oleva rajoitettu komento.
+
+    `stdout` on putken viimeisen vaiheen tavuputki; kutsujan on kutsuttava
+    `lopeta()` lukemisen jälkeen (myös kesken jätettäessä), minkä jälkeen
+    `raja()` kertoo ylittyneen rajan. Paluukoodi on viimeisen vaiheen
+    (kuten shellissä).
+    """
+
+    def __init__(self, cmd, aikaraja_s: float):
+        self.aikakatkaistu = threading.Event()
+        self.tuloste_ylittyi = False
+        # Suojaa ryhmän tappamisen ja korjaamisen: korjatun ryhmän tunnus
+        # voi jo olla toisen prosessiryhmän käytössä
+        self._lukko = threading.Lock()
+        self._korjattu = False
+        vaiheet = _jasenna(cmd)
+        virhe_luku, virhe_kirjoitus = os.pipe()
+        try:
+            self.prosessit = _kaynnista(vaiheet, virhe_kirjoitus, self._popen)
+        except BaseException:
+            os.close(virhe_luku)
+            raise
+        finally:
+            os.close(virhe_kirjoitus)
+        self.proc = self.prosessit[-1]
+        self.stdout = self.proc.stdout
+        self._stderr_putki = open(virhe_luku, 'rb')
+        self._stderr: List[bytes] = []
+        self._stderr_lukija = threading.Thread(target=self._lue_stderr, daemon=True)
+        self._stderr_lukija.start()
+        self._ajastin = threading.Timer(aikaraja_s, self._aikakatkaise)
+        self._ajastin.daemon = True
+        self._ajastin.start()
+        self._peruutus = _PERUUTUS.get()
+        if self._peruutus is not None:
+            self._peruutus._lisaa(self)
+
+    @staticmethod
+    def _popen(argv, stdin, stdout, stderr, ryhma, preexec=None):
+        if not hasattr(os, "setpgid"):
+            ryhmitys = {}
+        elif _YHTEINEN_RYHMA:
+            ryhmitys = {"process_group": ryhma}
+        else:
+            ryhmitys = {"start_new_session": True}
+        return subprocess.Popen(argv, stdin=stdin, stdout=stdout, stderr=stderr,
+                                preexec_fn=preexec, **ryhmitys)
+
+    def _lue_stderr(self) -> None:
+        koko = 0
+        for rivi in self._stderr_putki:
+            if koko < _STDERR_MAKSIMI:
+                self._stderr.append(rivi)
+                koko += len(rivi)
+
+    def _aikakatkaise(self) -> None:
+        self.aikakatkaistu.set()
+        self.tapa()
+
+    def tapa(self) -> None:
+        """Tapa koko prosessiryhmä (kaikki putken vaiheet), ellei sitä ole jo korjattu."""
+        with self._lukko:
+            if not self._korjattu:
+                _tapa_ryhma(self.prosessit)
+
+    def lopeta(self) -> None:
+        """Odota ajon loppuun (tai tapa se) ja siivoa ryhmän jäljelle jääneet prosessit."""
+        # Kesken jätetty viimeinen vaihe saa SIGPIPE:n; muuten odotetaan sen
+        # päättymistä (esim. `sort -o`), kunnes ajastin tappaa ryhmän
+        self.proc.stdout.close()
+        _odota_korjaamatta(self.proc)
+        self._ajastin.cancel()
+        # Aiemmat vaiheet (esim. `yes | head`) voivat olla vielä käynnissä.
+        # Ryhmä merkitään korjatuksi ennen korjaamista, jottei `peru()` tai
+        # ajastin tapa vapautunutta (ehkä jo uudelleenkäytettyä) ryhmää.
+        with self._lukko:
+            _tapa_ryhma(self.prosessit)
+            self._korjattu = True
+        for proc in self.prosessit:
+            proc.wait()
+        if self._peruutus is not None:
+            self._peruutus._poista(self)
+        self._stderr_lukija.join(1)
+        self._stderr_putki.close()
+
+    def raja(self) -> Optional[str]:
+        """Päättele, mikä raja ylittyi; None jos ajo päättyi normaalisti."""
+        return _paattele_raja(self.aikakatkaistu.is_set(), self.tuloste_ylittyi,
+                              [p.returncode for p in self.prosessit], b"".join(self._stderr))
+
+
+class AjonTulos(NamedTuple):
+    stdout: bytes
+    returncode: Optional[int]
+    raja: Optional[str] = None
+
+
+def aja_rajoitetusti(cmd, aikaraja_s: Optional[float] = None,
+                     maksimi_tavut: Optional[int] = None) -> AjonTulos:
+    """Aja komento rajoitettuna ja kerää sen stdout (enintään `maksimi_tavut`).
+
+    `cmd` on komentorivi tai valmiiksi jäsennetyt vaiheet.
+    """
+    a = asetukset()
+    ajo = Ajo(cmd, a.timeout_seconds if aikaraja_s is None else aikaraja_s)
+    return _keraa(ajo, a.maksimi_tuloste if maksimi_tavut is None else maksimi_tavut)
+
+
+def _keraa(ajo: Ajo, maksimi_tavut: int) -> AjonTulos:
+    palat: List[bytes] = []
+    koko = 0
+    try:
+        while True:
+            pala = ajo.stdout.read1(1 << 16)
+            if not pala:
+                break
+            koko += len(pala)
+            if koko > maksimi_tavut:
+                ajo.tuloste_ylittyi = True
+                break
+            palat.append(pala)
+    finally:
+        ajo.lopeta()
+    return AjonTulos(b"".join(palat), ajo.proc.returncode, ajo.raja())
+
+
+async def aja_rajoitetusti_async(cmd, aikaraja_s: Optional[float] = None,
+                                 maksimi_tavut: Optional[int] = None) -> AjonTulos:
+    """Kuten `aja_rajoitetusti`, mutta odotettavana.
+
+    Tuloste kerätään säikeessä, koska asyncion lapsiprosessien valvoja
+    korjaisi putken ensimmäisen vaiheen ennen kuin muut ehtivät liittyä sen
+    prosessiryhmään. Jos kutsuva tehtävä perutaan, koko prosessiryhmä tapetaan.
+    """
+    # asyncio tuodaan vasta tarvittaessa, jotta moduulin tuonti pysyy kevyenä
+    import asyncio
+
+    a = asetukset()
+    ajo = Ajo(cmd, a.timeout_seconds if aikaraja_s is None else aikaraja_s)
+    try:
+        return await asyncio.to_thread(
+            _keraa, ajo, a.maksimi_tuloste if maksimi_tavut is None else maksimi_tavut)
+    except asyncio.CancelledError:
+        # Säie saa EOF:n ja siivoaa ajon loppuun itse
+        ajo.tapa()
+        raise
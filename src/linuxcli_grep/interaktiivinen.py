@@ -0,0 +1,261 @@
+"""Interaktiivinen harjoitustila."""
+from pathlib import Path
+from typing import FrozenSet, Optional, Tuple
+
+from . import mittarit, profilointi
+from .asiakas import DATAN_ULKOPUOLELLA, PalvelinAsiakas, PalvelinVirhe
+from .esihaku import Esihaku
+from .konfiguraatio import asetukset
+from .palaute import Erot, nayta_sivuttimella, tulosta_erot, tulosta_esikatselu
+from .profilointi import profiloi_ajo, profiloi_tehtava, tulosta_hitaimmat, viimeisimmat_ajot
+from .suoritus import aja_komento, turvallinen_komento
+from .tehtavasarjat import avaa_tehtavat
+from .tehtavat import tehtavan_odotettu
+from .tila import kirjaa_tila, lataa_tila, tallenna_tila, tehtavan_avain, tiivista_journal, varmista_opiskelijatiedot
+from .valimuisti import aja_oikea_komento, kirjoita_valimuistit, odotettu_tuloste, tuomio_valimuisti, tuomion_avain
+from .vertailu import tulosteen_tiivisteet
+
+
+def _tuomion_avain(i: int, cmd: str, oikea_res: str) -> Tuple[Optional[str], FrozenSet[bytes]]:
+    """Tuomiovälimuistin avain ja viitetulosteen rivitiivisteet (ks. `valimuisti.vertaa_tuomiolla`)."""
+    viite = tulosteen_tiivisteet(oikea_res)
+    if not viite or oikea_res.startswith("(virhe:"):
+        return None, viite
+    return tuomion_avain(i, cmd), viite
+
+
+def interactive_mode(profiloi: bool = False):
+    profilointi.PROFILOINTI = profiloi
+    tehtavat = avaa_tehtavat()
+    tila = lataa_tila()
+    tila_olemassa = Path(asetukset().tila_tiedosto).exists()
+
+    # Pyydä opiskelijatiedot heti, jos tila.json luodaan ensimmäistä kertaa
+    tiedot_ennen = (tila.get("nimi"), tila.get("opiskelijanumero"))
+    varmista_opiskelijatiedot(tila, kysy_kayttajalta=True)
+    # Journal kirjaa vain tehtävien avaimet, joten uudet tiedot vedokseen heti
+    if not tila_olemassa or tiedot_ennen != (tila.get("nimi"), tila.get("opiskelijanumero")):
+        tallenna_tila(tila)
+
+    # Käytä arviointipalvelinta, jos sellainen on käynnissä (linuxcli-grep serve)
+    palvelin = PalvelinAsiakas.yhdista(asetukset().palvelin_soketti)
+
+    skipped_this_session = set()
+    # Edellisen väärän vastauksen erot `ero`-komentoa varten
+    viimeisimmat_erot: Optional[Erot] = None
+    rivit = asetukset().palaute_rivit
+
+    def is_completed(task_id):
+        """Tarkista onko tehtävä valmis"""
+        status = tila.get(tehtavan_avain(task_id))
+        if isinstance(status, dict):
+            return status.get("status") == "oikein"
+        return status == "oikein"
+
+    def valmis_tuloste(j):
+        """Tehtävänippuun tallennettu oikea tuloste, jos data on ennallaan."""
+        return odotettu_tuloste(tehtavan_odotettu(tehtavat, j), tehtavat[j][1])
+
+    # Oikeat tulosteet haetaan taustalla, kun komentoja ajetaan paikallisesti.
+    # Profiloidessa ajetaan peräkkäin, jotta mittaukset kohdistuvat oikein.
+    esihaku = Esihaku() if palvelin is None and not profiloi else None
+
+    try:
+        while True:
+            ratkaisemattomat = [
+                i for i in range(len(tehtavat))
+                if not is_completed(i) and i not in skipped_this_session
+            ]
+
+            if not ratkaisemattomat:
+                # Tarkista onko kaikki tehtävät todella suoritettu oikein
+                remaining = [i for i in range(len(tehtavat)) if not is_completed(i)]
+                # Tiivistä journal vedokseen, jotta tila.json on ajan tasalla
+                tallenna_tila(tila)
+                if not remaining:
+                    print("\n🎉 Kaikki tehtävät suoritettu!")
+                else:
+                    print(f"\nℹ️  Tehtäviä tekemättä: {len(remaining)}. Voit palata niihin käynnistämällä ohjelman uudestaan.")
+                if profiloi:
+                    tulosta_hitaimmat(tehtavat)
+                return
+
+            i = ratkaisemattomat[0]
+            kuvaus, oikea = tehtavat[i]
+            if esihaku is not None:
+                # Nykyinen ja seuraava ratkaisematon; muiden haut perutaan
+                esihaku.esihae({
+                    j: tehtavat[j][1] for j in ratkaisemattomat[:2]
+                    if tehtavat[j][1] and valmis_tuloste(j) is None
+                })
+
+            print(f"\n📝 Tehtävä {i+1}/{len(tehtavat)}")
+            print(f"{i+1}. {kuvaus}")
+
+            cmd = input("💻 Komento (skip / exit / lista): ").strip()
+
+            if not cmd:
+                print("⚠️  Syötä komento tai käytä skip/exit/lista")
+                continue
+
+            if cmd == "exit":
+                tallenna_tila(tila)
+                print("💾 Tila tallennettu.")
+                # Näytä montako tehtävää on vielä tekemättä ja ohje palata niihin
+                remaining = [i for i in range(len(tehtavat)) if not is_completed(i)]
+                tehdyt = sum(1 for i in range(len(tehtavat)) if is_completed(i))
+                total = len(tehtavat)
+                if remaining:
+                    print(f"ℹ️  Tehty: {tehdyt}/{total}. Tehtäviä tekemättä: {len(remaining)}. Voit palata niihin käynnistämällä ohjelman uudestaan.")
+                else:
+                    print(f"\n🎉 Kaikki tehtävät suoritettu! Tehty: {tehdyt}/{total}")
+                if profiloi:
+                    tulosta_hitaimmat(tehtavat)
+                return
+
+            if cmd == "lista":
+                print("\n📋 Tehtävien status:")
+                for j in range(len(tehtavat)):
+                    task_status = tila.get(tehtavan_avain(j))
+                    # Jos tehtävä on tallennettu objektina
+                    if isinstance(task_status, dict):
+                        if task_status.get("status") == "oikein":
+                            status_msg = "✅ Oikein"
+                        elif task_status.get("status") == "väärin":
+                            status_msg = "❌ Väärin"
+                        else:
+                            status_msg = "⏳ Skipattu"
+                    else:
+                        # Ei tallennettua tilaa
+                        if j in skipped_this_session:
+                            status_msg = "⏳ Skipattu"
+                        elif task_status is None:
+                            status_msg = "⏳ Ei vastattu"
+                        elif task_status == "oikein":
+                            status_msg = "✅ Oikein"
+                        elif task_status == "väärin":
+                            status_msg = "❌ Väärin"
+                        else:
+                            status_msg = "⏳ Ei vastattu"
+
+                    print(f"{status_msg:<15} {j+1}. {tehtavat[j][0]}")
+                print()
+                continue
+
+            if cmd == "ero":
+                if viimeisimmat_erot is None:
+                    print("ℹ️  Ei näytettävää eroa: ero näytetään väärän vastauksen jälkeen.")
+                else:
+                    nayta_sivuttimella(viimeisimmat_erot.koko_ero())
+                continue
+
+            if cmd == "skip":
+                skipped_this_session.add(i)
+                print(f"⏭️  Tehtävä {i+1} skipattu. Seuraavaan...")
+                continue
+
+            if not turvallinen_komento(cmd):
+                print("❌ Komento ei ole sallittu tässä harjoituksessa.")
+                continue
+
+            # Suoritetaan komennot
+            viimeisimmat_erot = None
+            with profiloi_tehtava(i):
+                tulokset = None
+                if palvelin is not None:
+                    try:
+                        tulokset = palvelin.arvioi(i, cmd, tila.get("opiskelijanumero", ""), asetukset().tehtavasarja)
+                    except PalvelinVirhe as e:
+                        if str(e) == "komento ei ole sallittu":
+                            print("❌ Komento ei ole sallittu tässä harjoituksessa.")
+                            continue
+                        # DATAN_ULKOPUOLELLA: ajetaan paikallisesti, yhteys säilyy
+                        if str(e) != DATAN_ULKOPUOLELLA:
+                            # Palvelin ei vastaa: jatketaan paikallisesti
+                            print(f"⚠️  Arviointipalvelin ei käytettävissä ({e}); ajetaan paikallisesti.")
+                            palvelin.sulje()
+                            palvelin = None
+                valmiiksi_oikein = False
+                if tulokset is not None:
+                    opiskelija_res, oikea_res = tulokset
+                else:
+                    if esihaku is not None and valmis_tuloste(i) is None:
+                        oikea_res = esihaku.oikea(i, oikea)
+                    else:
+                        oikea_res = aja_oikea_komento(oikea, tehtavan_odotettu(tehtavat, i))
+                avain, viite = _tuomion_avain(i, cmd, oikea_res)
+                if tulokset is None:
+                    if avain is not None:
+                        tuomio = tuomio_valimuisti().hae_tuomio(avain, viite)
+                        valmiiksi_oikein = tuomio is not None and tuomio["sama"]
+                    if valmiiksi_oikein:
+                        if profiloi:
+                            with profiloi_ajo("student", cmd) as mittaus:
+                                mittaus.update(cached=True)
+                    else:
+                        # Väärän vastauksen palautteeseen tarvitaan opiskelijan tuloste
+                        opiskelija_res = esihaku.opiskelija(cmd) if esihaku is not None else aja_komento(cmd)
+            if profiloi:
+                viimeisimmat = viimeisimmat_ajot(i, 2)
+                print("⏱️  " + ", ".join(
+                    f"{a['role']}: {a['wall_s'] * 1000:.1f} ms" + (" (välimuisti)" if a.get("cached") else "")
+                    for a in viimeisimmat
+                ))
+
+            if valmiiksi_oikein:
+                # Sama komento on jo todettu oikeaksi samalla datalla (tuomiovälimuisti)
+                tulosta_esikatselu("— Oikea vastaus —", oikea_res, rivit)
+                print("✅ Oikein (sama komento on jo arvioitu, sitä ei ajettu uudelleen)")
+                tila[tehtavan_avain(i)] = {
+                    "status": "oikein",
+                    "student_cmd": cmd
+                }
+            # Jos komento epäonnistui (returncode != 0) tai stdout tyhjä, merkitään väärin
+            elif not opiskelija_res:
+                print("❌ Sinun komennollasi ei tullut tulosta tai se epäonnistui.")
+                tila[tehtavan_avain(i)] = {
+                    "status": "väärin",
+                    "student_cmd": cmd
+                }
+            else:
+                # Verrataan rivit joukkoina, jotta rivijärjestys ei pilaa vertailua
+                erot = Erot(oikea_res, opiskelija_res, viite)
+
+                # Tulostetaan tulosteiden alku (loput `ero`-komennolla)
+                rajattu = tulosta_esikatselu("— Oikea vastaus —", oikea_res, rivit)
+                rajattu = tulosta_esikatselu("— Sinun vastaus —", opiskelija_res, rivit) or rajattu
+
+                if erot.sama:
+                    print("✅ Oikein")
+                    tila[tehtavan_avain(i)] = {
+                        "status": "oikein",
+                        "student_cmd": cmd
+                    }
+                else:
+                    print("❌ Väärin")
+                    # Näytetään erot riveittäin
+                    rajattu = tulosta_erot(erot, rivit) or rajattu
+                    viimeisimmat_erot = erot
+                    if rajattu:
+                        print("📄 Koko ero ja tulosteet: kirjoita 'ero'")
+                    tila[tehtavan_avain(i)] = {
+                        "status": "väärin",
+                        "student_cmd": cmd
+                    }
+                if avain is not None and not opiskelija_res.startswith("(virhe:"):
+                    sama = erot.sama
+                    syy = "" if sama else ("ylimääräinen rivi" if erot.vain_omassa else "rivejä puuttuu")
+                    tuomio_valimuisti().tallenna_tuomio(avain, viite, sama, syy)
+
+            kirjaa_tila(tila, tehtavan_avain(i))
+            if mittarit.MITTARIT:
+                mittarit.kirjaa_tuomio("interactive", tila[tehtavan_avain(i)]["status"] == "oikein")
+    except (KeyboardInterrupt, EOFError):
+        print("\n💾 Tila tallennettu.")
+    finally:
+        # Journalin muutokset tila.json:iin kaikilla poistumisteillä
+        tiivista_journal(tila)
+        if esihaku is not None:
+            esihaku.sulje()
+        kirjoita_valimuistit()
+        mittarit.kirjoita()
@@ -0,0 +1,192 @@
+"""Komentorivin jäsennys putken vaiheiksi.
+
+Sama jäsennys syöttää sekä tarkistuksen (`suoritus.turvallinen_komento`)
+että ajon (`hiekkalaatikko`, `moottori`), joten tarkistaja ja suorittaja
+tulkitsevat komennon aina samoin. Komentoja ei ajeta shellin kautta.
+
+Tuettu osajoukko `/bin/sh`:sta:
+
+- yksin- ja kaksoislainausmerkit sekä kenoviiva
+- glob-kuviot (`*`, `?`, `[...]`), jotka laajennetaan kuten shell
+- putket `|`
+- syötteen uudelleenohjaus `< tiedosto`
+- virheiden hylkäys `2>/dev/null`
+
+Muut shellin ominaisuudet (ketjutus, muuttujat, korvaukset,
+aaltosulkulaajennus, tilde, kommentit, muut uudelleenohjaukset) aiheuttavat
+`TuetumatonKomento`-poikkeuksen. Merkit `$`, `{`, `}`, `~` ja `#` ovat
+kirjaimellisia silloin, kun shellkin tulkitsisi ne kirjaimellisesti
+(esim. `grep Error$ ...` ja `grep -E [0-9]{3} ...`).
+"""
+import glob
+from typing import List, NamedTuple, Optional
+
+_SHELL_ERIKOISMERKIT = set(';&<>`()\n')
+# `$` aloittaa laajennuksen, jos sitä seuraa jokin näistä (muuten kirjaimellinen)
+_LAAJENNUKSEN_ALUT = set('{(\'"_?#@*!$-0123456789abcdefghijklmnopqrstuvwxyzABCDEFGHIJKLMNOPQRSTUVWXYZ')
+# Merkit, joihin aaltosulkulausekkeen tarkistus sanan sisällä päättyy
+_SANAN_LOPPU = set(' \t|<>;&()\n')
+_GLOB_MERKIT = set('*?[')
+_NULL_LAITE = "/dev/null"
+
+
+class TuetumatonKomento(Exception):
+    """Komento käyttää ominaisuutta, jota ei tueta."""
+
+
+class Vaihe(NamedTuple):
+    """Putken yksi vaihe: ohjelma argumentteineen ja uudelleenohjaukset."""
+    argv: List[str]
+    syote: Optional[str] = None    # `< tiedosto`
+    virheet_pois: bool = False     # `2>/dev/null`
+
+
+def _aaltosulkulaajennus(cmd: str, i: int) -> bool:
+    """Aloittaako kohdan `i` aaltosulje laajennuksen (`{a,b}`, `{1..3}`)?
+
+    Vain osa shelleistä (esim. bash) laajentaa nämä, joten ne hylätään;
+    muut aaltosulkeet ovat kirjaimellisia kuten kaikissa shelleissä.
+    """
+    loppu = i + 1
+    while loppu < len(cmd) and cmd[loppu] not in _SANAN_LOPPU:
+        loppu += 1
+    sisalto = cmd[i + 1:loppu]
+    sulku = sisalto.find('}')
+    return sulku >= 0 and (',' in sisalto[:sulku] or '..' in sisalto[:sulku])
+
+
+def jasenna_putki(cmd: str) -> List[Vaihe]:
+    """Jäsennä komentorivi putken vaiheiksi ja laajenna glob-kuviot."""
+    vaiheet: List[Vaihe] = []
+    sanat: List[str] = []
+    teksti: List[str] = []    # sanan kirjaimellinen sisältö
+    kuvio: List[str] = []     # sama sana glob-kuviona (lainatut osat escapattu)
+    sana_alkanut = False
+    sanassa_lainausta = False
+    on_glob = False
+    syote: Optional[str] = None
+    virheet_pois = False
+    ohjaus: Optional[str] = None   # "<" tai "2>": seuraava sana on kohde
+
+    def paata_sana():
+        nonlocal sana_alkanut, sanassa_lainausta, on_glob, ohjaus, syote, virheet_pois
+        if sana_alkanut:
+            sana = ''.join(teksti)
+            if ohjaus == '<':
+                if syote is not None:
+                    raise TuetumatonKomento("useampi syötteen uudelleenohjaus")
+                syote = sana
+                ohjaus = None
+            elif ohjaus == '2>':
+                if sana != _NULL_LAITE:
+                    raise TuetumatonKomento("uudelleenohjaus tiedostoon")
+                virheet_pois = True
+                ohjaus = None
+            elif on_glob:
+                osumat = sorted(glob.glob(''.join(kuvio)))
+                sanat.extend(osumat if osumat else [sana])
+            else:
+                sanat.append(sana)
+        teksti.clear()
+        kuvio.clear()
+        sana_alkanut = False
+        sanassa_lainausta = False
+        on_glob = False
+
+    def lisaa(merkit: str, lainattu: bool):
+        nonlocal sana_alkanut, sanassa_lainausta
+        teksti.append(merkit)
+        kuvio.append(glob.escape(merkit) if lainattu else merkit)
+        sana_alkanut = True
+        sanassa_lainausta = sanassa_lainausta or lainattu
+
+    def aloita_ohjaus(merkki: str):
+        nonlocal ohjaus
+        if ohjaus is not None:
+            raise TuetumatonKomento("uudelleenohjaukselta puuttuu kohde")
+        ohjaus = merkki
+
+    def paata_vaihe():
+        nonlocal syote, virheet_pois
+        paata_sana()
+        if ohjaus is not None:
+            raise TuetumatonKomento("uudelleenohjaukselta puuttuu kohde")
+        if not sanat:
+            raise TuetumatonKomento("tyhjä putken vaihe")
+        vaiheet.append(Vaihe(list(sanat), syote, virheet_pois))
+        sanat.clear()
+        syote = None
+        virheet_pois = False
+
+    i = 0
+    n = len(cmd)
+    while i < n:
+        c = cmd[i]
+        if c == "'":
+            j = cmd.find("'", i + 1)
+            if j < 0:
+                raise TuetumatonKomento("pariton lainausmerkki")
+            lisaa(cmd[i + 1:j], True)
+            i = j + 1
+        elif c == '"':
+            i += 1
+            osat = []
+            while True:
+                if i >= n:
+                    raise TuetumatonKomento("pariton lainausmerkki")
+                c = cmd[i]
+                if c == '"':
+                    i += 1
+                    break
+                if c == '`' or (c == '$' and i + 1 < n and cmd[i + 1] in _LAAJENNUKSEN_ALUT - set('\'"')):
+                    raise TuetumatonKomento("laajennus lainausmerkeissä")
+                if c == '\\' and i + 1 < n and cmd[i + 1] in '"\\$`':
+                    osat.append(cmd[i + 1])
+                    i += 2
+                    continue
+                osat.append(c)
+                i += 1
+            lisaa(''.join(osat), True)
+        elif c == '\\':
+            if i + 1 >= n or cmd[i + 1] == '\n':
+                raise TuetumatonKomento("rivinjatko")
+            lisaa(cmd[i + 1], True)
+            i += 2
+        elif c in ' \t':
+            paata_sana()
+            i += 1
+        elif c == '|':
+            if cmd.startswith('||', i):
+                raise TuetumatonKomento("ketjutus")
+            paata_vaihe()
+            i += 1
+        elif c == '<' and not cmd.startswith('<<', i):
+            paata_sana()
+            aloita_ohjaus('<')
+            i += 1
+        elif (c == '>' and sana_alkanut and not sanassa_lainausta and teksti == ['2']
+              and not cmd.startswith('>>', i) and not cmd.startswith('>&', i)):
+            # `2>`: numero kuuluu ohjaukseen, ei argumentteihin
+            teksti.clear()
+            kuvio.clear()
+            sana_alkanut = False
+            aloita_ohjaus('2>')
+            i += 1
+        elif c in _SHELL_ERIKOISMERKIT:
+            raise TuetumatonKomento(f"shellin erikoismerkki {c!r}")
+        elif c == '$' and i + 1 < n and cmd[i + 1] in _LAAJENNUKSEN_ALUT:
+            raise TuetumatonKomento("muuttuja tai korvaus")
+        elif c == '#' and not sana_alkanut:
+            raise TuetumatonKomento("kommentti")
+        elif c == '~' and (not sana_alkanut or cmd[i - 1] in '=:'):
+            raise TuetumatonKomento("tilde")
+        elif c == '{' and _aaltosulkulaajennus(cmd, i):
+            raise TuetumatonKomento("aaltosulkulaajennus")
+        else:
+            if c in _GLOB_MERKIT:
+                on_glob = True
+            lisaa(c, False)
+            i += 1
+
+    paata_vaihe()
+    return vaiheet
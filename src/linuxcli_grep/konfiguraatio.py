@@ -0,0 +1,114 @@
+"""Konfiguraation laiska lataus.
+
+`configs/config.json` luetaan vasta, kun asetuksia ensimmäisen kerran
+tarvitaan, joten paketin moduulien tuonti ei lue tiedostoja.
+"""
+import json
+from pathlib import Path
+from typing import Any, Dict, Optional
+
+# Ladataan konfiguraatio `configs/config.json`. Jos sitä ei ole,
+# käytetään kovakoodattuja oletuksia.
+CONFIG_PATH = Path("configs/config.json")
+
+
+def load_config(path: Path) -> Dict[str, Any]:
+    defaults = {
+        "tehtavat_tiedosto": "data/tasks/tehtavat.txt.enc",
+        "tila_tiedosto": "configs/tila.json",
+        "results_file": "output/results.json",
+        "timeout_seconds": 3,
+        "allowed_commands": ["grep", "wc", "sort", "uniq", "head", "tail", "cat"],
+        "execution_engine": "subprocess",
+        "cache_dir": ".cache",
+        "reference_cache_max_entries": 512,
+        "reference_cache_max_bytes": 32 * 1024 * 1024,
+        "verdict_cache_max_entries": 4096,
+        "line_index_max_open": 64,
+        "max_output_bytes": 64 * 1024 * 1024,
+        "state_fsync": False,
+        "state_compact_every": 50,
+        "limit_cpu_seconds": 10,
+        "limit_address_space_mb": 1024,
+        "limit_file_size_mb": 16,
+        "limit_processes": 0,
+        "daemon_socket": ".cache/linuxcli-grep.sock",
+        "daemon_socket_mode": "0600",
+        "daemon_socket_group": "",
+        "daemon_concurrency": 0,
+        "daemon_max_queue": 256,
+        "default_task_set": "grep",
+        "metrics_file": "",
+        "feedback_preview_lines": 20,
+    }
+    if not path.exists():
+        return defaults
+    try:
+        cfg = json.loads(path.read_text(encoding="utf-8"))
+        # merge defaults with provided config
+        for k, v in defaults.items():
+            cfg.setdefault(k, v)
+        return cfg
+    except Exception:
+        return defaults
+
+
+class Asetukset:
+    """Konfiguraatiosta johdetut asetukset.
+
+    Attribuutteja voi muuttaa ajon aikana (esim. työkaluissa tilapäisiin
+    tiedostoihin osoittamiseksi).
+    """
+
+    def __init__(self, config: Dict[str, Any]):
+        self.config = config
+        self.tehtavat_tiedosto = config["tehtavat_tiedosto"]
+        self.tila_tiedosto = config["tila_tiedosto"]
+        self.results_file = config["results_file"]
+        self.timeout_seconds = int(config.get("timeout_seconds", 3))
+        self.sallitut_komennot = tuple(config.get("allowed_commands", []))
+        # "subprocess" (oletus) tai "inprocess" (sisäinen Python-moottori)
+        self.suoritusmoottori = config.get("execution_engine", "subprocess")
+        self.valimuisti_hakemisto = Path(config["cache_dir"])
+        self.viite_valimuisti_koko = int(config.get("reference_cache_max_entries", 512))
+        self.viite_valimuisti_tavut = int(config.get("reference_cache_max_bytes", 32 * 1024 * 1024))
+        self.tuomio_valimuisti_koko = int(config.get("verdict_cache_max_entries", 4096))
+        # Muistikartoitettuja rivi-indeksejä auki enintään (LRU)
+        self.riviindeksi_avoimet = max(1, int(config.get("line_index_max_open", 64)))
+        self.maksimi_tuloste = int(config.get("max_output_bytes", 64 * 1024 * 1024))
+        self.tila_fsync = bool(config.get("state_fsync", False))
+        self.tila_tiivistysvali = max(1, int(config.get("state_compact_every", 50)))
+        # Komentojen setrlimit-rajat (0 = ei rajaa). Prosessiraja on
+        # käyttäjäkohtainen (RLIMIT_NPROC), joten se on oletuksena pois.
+        self.raja_cpu_s = int(config.get("limit_cpu_seconds", 10))
+        self.raja_muisti_mt = int(config.get("limit_address_space_mb", 1024))
+        self.raja_tiedostokoko_mt = int(config.get("limit_file_size_mb", 16))
+        self.raja_prosessit = int(config.get("limit_processes", 0))
+        # Arviointipalvelin (`linuxcli-grep serve`); rinnakkaisuus 0 = prosessorien määrä
+        self.palvelin_soketti = Path(config.get("daemon_socket", ".cache/linuxcli-grep.sock"))
+        # Soketin tila (oktaalimerkkijono, esim. "0660") ja ryhmä (nimi tai gid;
+        # tyhjä = palvelimen käyttäjän ryhmä); jaettu palvelin, ks. README
+        tila = config.get("daemon_socket_mode", "0600")
+        self.palvelin_soketin_tila = int(tila, 8) if isinstance(tila, str) else int(tila)
+        self.palvelin_soketin_ryhma = str(config.get("daemon_socket_group", "") or "")
+        self.palvelin_rinnakkaisuus = int(config.get("daemon_concurrency", 0))
+        self.palvelin_jonon_maksimi = max(1, int(config.get("daemon_max_queue", 256)))
+        # Valittu tehtäväsarja (ks. `tehtavasarjat.valitse`); oletussarjan
+        # tehtävien avaimet ovat tila.json:ssa ilman etuliitettä
+        self.tehtavasarja = config.get("default_task_set", "grep")
+        self.tila_etuliite = ""
+        # Käyttömittarit (ks. `mittarit`); tyhjä = pois käytöstä
+        self.mittaritiedosto = config.get("metrics_file", "")
+        # Interaktiivisen palautteen esikatselurivit osaa kohden (ks. `palaute`)
+        self.palaute_rivit = max(1, int(config.get("feedback_preview_lines", 20)))
+
+
+_ASETUKSET: Optional[Asetukset] = None
+
+
+def asetukset() -> Asetukset:
+    """Palauta asetukset; konfiguraatio luetaan ensimmäisellä kutsulla."""
+    global _ASETUKSET
+    if _ASETUKSET is None:
+        _ASETUKSET = Asetukset(load_config(CONFIG_PATH))
+    return _ASETUKSET
@@ -0,0 +1,190 @@
+"""Käyttömittarit Prometheus-tekstimuodossa (`--metrics` / `metrics_file`).
+
+Laskurit: ajetut komennot, aikakatkaisut ja ylittyneet rajat,
+`turvallinen_komento`-hylkäykset, tuomiot sekä välimuistien osumat.
+Histogrammi: komentojen kesto ohjelmittain (putken ensimmäinen ohjelma,
+sallittujen komentojen ulkopuoliset nimellä "muu").
+
+Mittarit kerätään prosessin muistiin ja `kirjoita()` lisää ne
+mittaritiedostoon: tiedostossa jo olevat arvot luetaan ja summataan
+(tiedostolukon alla), joten saman koneen kaikkien ajojen ja opiskelijoiden
+mittarit kertyvät samaan tiedostoon. Tiedoston voi lukea esim.
+node_exporterin textfile-kerääjällä.
+
+Kun mittarit eivät ole käytössä (`MITTARIT = False`), kuumalla polulla on
+vain tämän lipun tarkistus.
+"""
+import os
+import threading
+from pathlib import Path
+from typing import Any, Dict, List, Optional, Tuple
+
+from .konfiguraatio import asetukset
+
+MITTARIT = False
+_POLKU: Optional[Path] = None
+
+# Kestohistogrammin rajat (s)
+RAJAT = (0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1.0, 2.5, 5.0, 10.0)
+
+_KUVAUKSET = {
+    "linuxcli_commands_total": ("counter", "Ajetut komennot ohjelman ja roolin mukaan."),
+    "linuxcli_command_timeouts_total": ("counter", "Aikakatkaistut komennot ohjelman ja roolin mukaan."),
+    "linuxcli_limit_exceeded_total": ("counter", "Hiekkalaatikon rajan ylittäneet komennot rajan mukaan."),
+    "linuxcli_rejected_commands_total": ("counter", "turvallinen_komento-tarkistuksen hylkäämät komennot."),
+    "linuxcli_verdicts_total": ("counter", "Arvioidut vastaukset tilan ja tuomion mukaan."),
+    "linuxcli_cache_lookups_total": ("counter", "Välimuistihaut välimuistin ja tuloksen mukaan."),
+    "linuxcli_command_duration_seconds": ("histogram", "Komentojen kesto ohjelman ja roolin mukaan."),
+}
+
+Sarja = Tuple[str, Tuple[Tuple[str, str], ...]]
+
+_lukko = threading.Lock()
+_laskurit: Dict[Sarja, float] = {}
+_histogrammit: Dict[Sarja, List[float]] = {}   # [osumat per raja..., +Inf, summa]
+
+
+def ota_kayttoon(polku: Path) -> None:
+    global MITTARIT, _POLKU
+    MITTARIT = True
+    _POLKU = Path(polku)
+
+
+def kasvata(nimi: str, maara: float = 1, **nimiot: str) -> None:
+    avain = (nimi, tuple(sorted(nimiot.items())))
+    with _lukko:
+        _laskurit[avain] = _laskurit.get(avain, 0) + maara
+
+
+def havainnoi(nimi: str, arvo: float, **nimiot: str) -> None:
+    avain = (nimi, tuple(sorted(nimiot.items())))
+    with _lukko:
+        h = _histogrammit.get(avain)
+        if h is None:
+            h = _histogrammit[avain] = [0.0] * (len(RAJAT) + 2)
+        for k, raja in enumerate(RAJAT):
+            if arvo <= raja:
+                h[k] += 1
+        h[len(RAJAT)] += 1
+        h[-1] += arvo
+
+
+def ohjelma(cmd: str) -> str:
+    """Histogrammin nimiö: putken ensimmäinen ohjelma, jos se on sallittu."""
+    sana = cmd.split(None, 1)[0] if cmd.strip() else ""
+    return sana if sana in asetukset().sallitut_komennot else "muu"
+
+
+def kirjaa_ajo(mittaus: Dict[str, Any], kesto_s: float) -> None:
+    """Kirjaa yksi komennon ajo (`profilointi.profiloi_ajo`-mittaus)."""
+    nimiot = {"command": ohjelma(mittaus["cmd"]), "role": mittaus["role"]}
+    kasvata("linuxcli_commands_total", **nimiot)
+    havainnoi("linuxcli_command_duration_seconds", kesto_s, **nimiot)
+    if mittaus.get("timed_out"):
+        kasvata("linuxcli_command_timeouts_total", **nimiot)
+    if mittaus.get("limit"):
+        kasvata("linuxcli_limit_exceeded_total", limit=mittaus["limit"])
+
+
+def kirjaa_tuomio(tila: str, oikein: bool) -> None:
+    kasvata("linuxcli_verdicts_total", mode=tila, verdict="oikein" if oikein else "väärin")
+
+
+# ---------- Tekstimuoto ----------
+
+def _nimiot(nimiot: Tuple[Tuple[str, str], ...]) -> str:
+    if not nimiot:
+        return ""
+    osat = []
+    for k, v in nimiot:
+        v = v.replace("\\", "\\\\").replace("\n", "\\n").replace('"', '\\"')
+        osat.append(f'{k}="{v}"')
+    return "{" + ",".join(osat) + "}"
+
+
+def _rivit(nollaa: bool = False) -> Dict[str, Dict[str, float]]:
+    """Prosessin mittarit näytteinä: mittari -> {näyterivin avain: arvo}."""
+    naytteet: Dict[str, Dict[str, float]] = {}
+    with _lukko:
+        for (nimi, nimiot), arvo in _laskurit.items():
+            naytteet.setdefault(nimi, {})[nimi + _nimiot(nimiot)] = arvo
+        for (nimi, nimiot), h in _histogrammit.items():
+            sarja = naytteet.setdefault(nimi, {})
+            for k, raja in enumerate(RAJAT):
+                sarja[f"{nimi}_bucket" + _nimiot(nimiot + (("le", repr(raja)),))] = h[k]
+            sarja[f"{nimi}_bucket" + _nimiot(nimiot + (("le", "+Inf"),))] = h[len(RAJAT)]
+            sarja[f"{nimi}_sum" + _nimiot(nimiot)] = h[-1]
+            sarja[f"{nimi}_count" + _nimiot(nimiot)] = h[len(RAJAT)]
+        if nollaa:
+            _laskurit.clear()
+            _histogrammit.clear()
+    return naytteet
+
+
+def _perusnimi(nayte: str) -> str:
+    nimi = nayte.split("{", 1)[0]
+    for paate in ("_bucket", "_sum", "_count"):
+        if nimi.endswith(paate) and nimi[:-len(paate)] in _KUVAUKSET:
+            return nimi[:-len(paate)]
+    return nimi
+
+
+def _lue(teksti: str) -> Dict[str, Dict[str, float]]:
+    naytteet: Dict[str, Dict[str, float]] = {}
+    for rivi in teksti.splitlines():
+        if not rivi or rivi.startswith("#"):
+            continue
+        nayte, _, arvo = rivi.rpartition(" ")
+        try:
+            naytteet.setdefault(_perusnimi(nayte), {})[nayte] = float(arvo)
+        except ValueError:
+            continue
+    return naytteet
+
+
+def muotoile(naytteet: Optional[Dict[str, Dict[str, float]]] = None) -> str:
+    """Mittarit Prometheus-tekstimuodossa (oletus: tämän prosessin mittarit)."""
+    if naytteet is None:
+        naytteet = _rivit()
+    rivit = []
+    for nimi in sorted(naytteet):
+        tyyppi, kuvaus = _KUVAUKSET.get(nimi, ("untyped", ""))
+        rivit.append(f"# HELP {nimi} {kuvaus}")
+        rivit.append(f"# TYPE {nimi} {tyyppi}")
+        for nayte, arvo in naytteet[nimi].items():
+            rivit.append(f"{nayte} {float(arvo)!r}")
+    return "\n".join(rivit) + "\n" if rivit else ""
+
+
+def kirjoita() -> None:
+    """Lisää prosessin mittarit mittaritiedostoon ja nollaa ne.
+
+    Ei tee mitään, jos mittarit eivät ole käytössä. Kirjoitusvirhe ei kaada
+    ajoa: mittarit ovat vain seurantaa varten.
+    """
+    if not MITTARIT or _POLKU is None:
+        return
+    omat = _rivit(nollaa=True)
+    if not omat:
+        return
+    try:
+        _POLKU.parent.mkdir(parents=True, exist_ok=True)
+        with open(_POLKU.with_name(_POLKU.name + ".lock"), "w") as lukko:
+            try:
+                import fcntl
+                fcntl.flock(lukko, fcntl.LOCK_EX)
+            except ImportError:  # esim. Windows: ei lukitusta
+                pass
+            try:
+                naytteet = _lue(_POLKU.read_text(encoding="utf-8"))
+            except FileNotFoundError:
+                naytteet = {}
+            for nimi, sarja in omat.items():
+                kohde = naytteet.setdefault(nimi, {})
+                for nayte, arvo in sarja.items():
+                    kohde[nayte] = kohde.get(nayte, 0) + arvo
+            tmp = _POLKU.with_name(_POLKU.name + f".{os.getpid()}.tmp")
+            tmp.write_text(muotoile(naytteet), encoding="utf-8")
+            os.replace(tmp, _POLKU)
+    except OSError:
+        pass
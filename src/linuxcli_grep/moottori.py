@@ -0,0 +1,770 @@
+"""Sisäinen suoritusmoottori."""
+import getopt
+import locale
+import os
+import re
+import time
+from collections import deque
+from functools import lru_cache
+from typing import Any, Callable, Dict, Iterable, Iterator, List, Optional, Tuple
+
+from . import konfiguraatio
+from .komentorivi import TuetumatonKomento, jasenna_putki
+from .riviindeksi import IndeksiSuljettu, rivi_indeksi
+
+
+# Valinnainen puhdas Python -toteutus sallituille tekstityökaluille. Komento
+# jäsennetään putken vaiheiksi, ja jokainen vaihe on generaattori, joka lukee
+# edellisen vaiheen rivejä. Jos komento käyttää jotain, mitä moottori ei
+# tue (tuntematon optio, shellin erikoismerkki, binääritiedosto...), heitetään
+# `TuetumatonKomento` ja `aja_komento` käyttää oikeaa aliprosessia.
+
+class MoottorinAikakatkaisu(Exception):
+    """Sisäisen moottorin suoritus ylitti aikarajan."""
+
+
+def jaa_putken_vaiheet(cmd: str) -> List[List[str]]:
+    """Jäsennä komentorivi putken vaiheiden argv-listoiksi (ks. `komentorivi`).
+
+    Sisäinen moottori ei tue uudelleenohjauksia; niistä heitetään
+    `TuetumatonKomento`, jolloin komento ajetaan aliprosesseina.
+    """
+    vaiheet = jasenna_putki(cmd)
+    if any(v.syote is not None or v.virheet_pois for v in vaiheet):
+        raise TuetumatonKomento("uudelleenohjaus")
+    return [v.argv for v in vaiheet]
+
+
+def _locale_arvo(kategoria: str) -> str:
+    return (
+        os.environ.get("LC_ALL")
+        or os.environ.get(kategoria)
+        or os.environ.get("LANG")
+        or "C"
+    )
+
+
+def _utf8_kaytossa() -> bool:
+    arvo = _locale_arvo("LC_CTYPE").lower().replace('-', '')
+    return "utf8" in arvo
+
+
+@lru_cache(maxsize=1)
+def _lajitteluavain() -> Callable[[str], Any]:
+    """Palauta `sort`-komennon tapaa vastaava vertailuavain.
+
+    C/POSIX-lokaalissa verrataan tavuja. Muuten käytetään lokaalin
+    `strxfrm`-muunnosta ja tasatilanteessa tavuvertailua kuten GNU sort.
+    """
+    arvo = _locale_arvo("LC_COLLATE")
+    if arvo in ("C", "POSIX") or arvo.startswith(("C.", "POSIX.")):
+        return lambda s: s.encode('utf-8', 'surrogateescape')
+    try:
+        locale.setlocale(locale.LC_COLLATE, arvo)
+    except locale.Error:
+        raise TuetumatonKomento(f"lokaali {arvo} ei käytettävissä")
+    return lambda s: (locale.strxfrm(s), s.encode('utf-8', 'surrogateescape'))
+
+
+# --- Lähteet ---
+
+class _Aikaraja:
+    def __init__(self, sekunnit: float):
+        self.loppu = time.monotonic() + sekunnit
+
+    def tarkista(self) -> None:
+        if time.monotonic() > self.loppu:
+            raise MoottorinAikakatkaisu("aikaraja ylittyi")
+
+
+class _TiedostonRivit:
+    """Tiedoston rivit (rivinvaihdot säilyvät) rivi-indeksin kautta.
+
+    `head` ja `tail` käyttävät `indeksi`-attribuuttia hakeakseen vain
+    tarvitsemansa rivit; muut työkalut iteroivat rivit järjestyksessä.
+    """
+
+    def __init__(self, polku: str, aikaraja: _Aikaraja):
+        if not os.path.isfile(polku):
+            raise TuetumatonKomento(f"{polku} ei ole tavallinen tiedosto")
+        self.polku = polku
+        self.aikaraja = aikaraja
+        self.indeksi = rivi_indeksi(polku)
+        self.utf8 = _utf8_kaytossa()
+
+    def valitse(self, rivit: Iterable[memoryview]) -> Iterator[str]:
+        if self.utf8 and self.indeksi.binaarinen:
+            raise TuetumatonKomento(f"{self.polku} on binääritiedosto")
+        koodaus = 'utf-8' if self.utf8 else 'latin-1'
+        try:
+            for n, raaka in enumerate(rivit):
+                if n & 1023 == 0:
+                    self.aikaraja.tarkista()
+                yield str(raaka, koodaus)
+        except IndeksiSuljettu:
+            # Tiedosto muuttui kesken ajon: ajetaan oikealla ohjelmalla
+            raise TuetumatonKomento(f"{self.polku} muuttui kesken ajon")
+
+    def __iter__(self) -> Iterator[str]:
+        return self.valitse(self.indeksi.rivit())
+
+
+def _lahde(tiedostot: List[str], stdin: Iterable[str], aikaraja: _Aikaraja) -> Iterator[Tuple[str, Iterable[str]]]:
+    """Käy läpi syötteet; tyhjä tiedostolista tarkoittaa stdiniä."""
+    if not tiedostot:
+        yield "-", stdin
+        return
+    for t in tiedostot:
+        if t == "-":
+            yield t, stdin
+        elif not os.path.exists(t):
+            # Kuten oikeat työkalut: virheilmoitus stderriin ja jatketaan
+            continue
+        else:
+            yield t, _TiedostonRivit(t, aikaraja)
+
+
+def _optiot(args: List[str], lyhyet: str, pitkat: List[str]) -> Tuple[List[Tuple[str, str]], List[str]]:
+    try:
+        return getopt.gnu_getopt(args, lyhyet, pitkat)
+    except getopt.GetoptError as e:
+        raise TuetumatonKomento(str(e))
+
+
+def _kokonaisluku(arvo: str) -> int:
+    try:
+        return int(arvo)
+    except ValueError:
+        raise TuetumatonKomento(f"luku {arvo!r} ei ole tuettu")
+
+
+def _rivin_sisalto(rivi: str) -> str:
+    return rivi[:-1] if rivi.endswith('\n') else rivi
+
+
+# --- grep: BRE/ERE -> Python-regex ---
+
+_POSIX_LUOKAT_ASCII = {
+    "alpha": "a-zA-Z", "digit": "0-9", "alnum": "a-zA-Z0-9",
+    "upper": "A-Z", "lower": "a-z", "space": r" \t\n\r\f\v",
+    "blank": r" \t", "xdigit": "0-9A-Fa-f", "cntrl": r"\x00-\x1f\x7f",
+    "punct": re.escape("!\"#$%&'()*+,-./:;<=>?@[\\]^_`{|}~"),
+}
+# UTF-8-lokaalissa kirjainluokat kattavat myös ä, ö jne. Python-regexissä
+# niitä ei voi ilmaista hakasulkeiden sisällä, joten ne lisätään vaihtoehtoina.
+_POSIX_LUOKAT_UNICODE = {"alpha": r"[^\W\d_]", "alnum": r"[^\W_]"}
+
+_KENO_ANKKURIT = {'<': r'\b(?=\w)', '>': r'\b(?<=\w)', '`': r'\A', "'": r'\Z'}
+_PAATEHERKAT = ('$', r'\b', r'\B', r'\Z', '(?=', '(?!')
+
+
+def _kaanna_hakasulje(kuvio: str, i: int, utf8: bool) -> Tuple[str, int]:
+    """Käännä hakasulkulauseke alkaen kohdasta `i` (merkin '[' jälkeen)."""
+    n = len(kuvio)
+    negaatio = False
+    if i < n and kuvio[i] == '^':
+        negaatio = True
+        i += 1
+    jasenet: List[str] = []
+    vaihtoehdot: List[str] = []
+    ensimmainen = True
+    while True:
+        if i >= n:
+            raise TuetumatonKomento("pariton '['")
+        c = kuvio[i]
+        if c == ']' and not ensimmainen:
+            i += 1
+            break
+        ensimmainen = False
+        if c == '[' and i + 1 < n and kuvio[i + 1] in ':=.':
+            tyyppi = kuvio[i + 1]
+            loppu = kuvio.find(tyyppi + ']', i + 2)
+            if loppu < 0 or tyyppi != ':':
+                raise TuetumatonKomento("hakasulkulauseke ei tuettu")
+            nimi = kuvio[i + 2:loppu]
+            if utf8 and nimi in _POSIX_LUOKAT_UNICODE:
+                if negaatio:
+                    raise TuetumatonKomento("negatoitu unicode-luokka")
+                vaihtoehdot.append(_POSIX_LUOKAT_UNICODE[nimi])
+            elif nimi in _POSIX_LUOKAT_ASCII and not (utf8 and nimi in ("upper", "lower")):
+                jasenet.append(_POSIX_LUOKAT_ASCII[nimi])
+            else:
+                raise TuetumatonKomento(f"merkkiluokka [:{nimi}:]")
+            i = loppu + 2
+            continue
+        # POSIX-hakasulkeissa kenoviiva on tavallinen merkki
+        if c in '\\[]&~|^':
+            jasenet.append('\\' + c)
+        else:
+            jasenet.append(c)
+        i += 1
+
+    joukko = ''.join(jasenet)
+    if not vaihtoehdot:
+        return ('[^' if negaatio else '[') + joukko + ']', i
+    if joukko:
+        vaihtoehdot.insert(0, '[' + joukko + ']')
+    return '(?:' + '|'.join(vaihtoehdot) + ')', i
+
+
+def _kaanna_regex(kuvio: str, laajennettu: bool, utf8: bool) -> str:
+    """Käännä POSIX BRE/ERE Pythonin regex-syntaksiksi."""
+    tulos: List[str] = []
+    n = len(kuvio)
+    i = 0
+    # Voiko seuraava '*' olla kvanttori (BRE: ei lausekkeen alussa)
+    edellinen_atomi = False
+    edellinen_kvanttori = False
+
+    def atomi(s: str):
+        nonlocal edellinen_atomi, edellinen_kvanttori
+        tulos.append(s)
+        edellinen_atomi = True
+        edellinen_kvanttori = False
+
+    def kvanttori(s: str):
+        nonlocal edellinen_atomi, edellinen_kvanttori
+        if edellinen_kvanttori:
+            # Pythonissa esim. '+?' olisi laiska kvanttori, POSIXissa ei
+            raise TuetumatonKomento("peräkkäiset kvanttorit")
+        tulos.append(s)
+        edellinen_kvanttori = True
+
+    def ryhman_alku(s: str):
+        nonlocal edellinen_atomi, edellinen_kvanttori
+        tulos.append(s)
+        edellinen_atomi = False
+        edellinen_kvanttori = False
+
+    def vali(j: int, sulku: str) -> Tuple[str, int]:
+        loppu = kuvio.find(sulku, j)
+        if loppu < 0:
+            raise TuetumatonKomento("pariton '{'")
+        sisalto = kuvio[j:loppu]
+        if not re.fullmatch(r'\d*(,\d*)?', sisalto) or sisalto in ('', ','):
+            raise TuetumatonKomento("virheellinen toistolauseke")
+        return '{' + sisalto + '}', loppu + len(sulku)
+
+    while i < n:
+        c = kuvio[i]
+        if c == '[':
+            s, i = _kaanna_hakasulje(kuvio, i + 1, utf8)
+            atomi(s)
+            continue
+        if c == '\\':
+            if i + 1 >= n:
+                raise TuetumatonKomento("kenoviiva lopussa")
+            d = kuvio[i + 1]
+            i += 2
+            if not laajennettu and d in '(){}|+?':
+                if d == '(':
+                    ryhman_alku('(')
+                elif d == ')':
+                    atomi(')')
+                elif d == '|':
+                    ryhman_alku('|')
+                elif d == '{':
+                    s, i = vali(i, '\\}')
+                    kvanttori(s)
+                else:
+                    kvanttori(d)
+            elif d in 'wWsS':
+                atomi('\\' + d)
+            elif d in 'bB':
+                tulos.append('\\' + d)
+            elif d in _KENO_ANKKURIT:
+                tulos.append(_KENO_ANKKURIT[d])
+            elif d.isdigit() and d != '0':
+                atomi('\\' + d)
+            elif d.isalnum():
+                raise TuetumatonKomento(f"tuntematon escape \\{d}")
+            else:
+                atomi(re.escape(d))
+            continue
+        i += 1
+        if c == '*':
+            if edellinen_atomi:
+                kvanttori('*')
+            else:
+                atomi(r'\*')
+        elif c == '.':
+            atomi('.')
+        elif c == '^':
+            if laajennettu or not tulos or tulos[-1] in ('(', '|'):
+                tulos.append('^')
+                edellinen_atomi = False
+            else:
+                atomi(r'\^')
+        elif c == '$':
+            if laajennettu or i == n or kuvio.startswith('\\)', i) or kuvio.startswith('\\|', i):
+                tulos.append('$')
+            else:
+                atomi(r'\$')
+        elif laajennettu and c == '(':
+            ryhman_alku('(')
+        elif laajennettu and c == ')':
+            atomi(')')
+        elif laajennettu and c == '|':
+            ryhman_alku('|')
+        elif laajennettu and c in '+?':
+            if not edellinen_atomi:
+                raise TuetumatonKomento("kvanttori ilman atomia")
+            kvanttori(c)
+        elif laajennettu and c == '{':
+            s, i = vali(i, '}')
+            kvanttori(s)
+        else:
+            atomi(re.escape(c))
+    return ''.join(tulos)
+
+
+@lru_cache(maxsize=256)
+def kaanna_grep_kuvio(kuviot: Tuple[str, ...], tila: str, isot_pienet: bool, utf8: bool) -> Tuple["re.Pattern[str]", bool]:
+    """Käännä grep-kuviot yhdeksi regexiksi (tulokset välimuistissa).
+
+    `tila` on 'G' (BRE), 'E' (ERE) tai 'F' (kiinteät merkkijonot).
+    Palauttaa käännetyn regexin ja tiedon siitä, sisältääkö se rivin
+    loppuun sidottuja nollalevyisiä ehtoja (tarvitaan -o:n pisimmän osuman haussa).
+    """
+    osat = []
+    for k in kuviot:
+        if tila == 'F':
+            osat.append(re.escape(k))
+        else:
+            osat.append(_kaanna_regex(k, tila == 'E', utf8))
+    lahde = '|'.join(f'(?:{o})' for o in osat) if len(osat) > 1 else osat[0]
+    liput = 0 if utf8 else re.ASCII
+    if isot_pienet:
+        liput |= re.IGNORECASE
+    try:
+        return re.compile(lahde, liput), any(m in lahde for m in _PAATEHERKAT)
+    except re.error as e:
+        raise TuetumatonKomento(f"regex: {e}")
+
+
+def _sanamerkki(c: str) -> bool:
+    return c == '_' or c.isalnum()
+
+
+def _grep_osumat(kuvio: "re.Pattern[str]", paateherkka: bool, rivi: str, sana: bool) -> Iterator[Tuple[int, int]]:
+    """Etsi ei-tyhjät osumat POSIXin vasemmanpuoleisin-pisin -säännöllä.
+
+    Pisin osuma haetaan rajaamalla hakua `endpos`-arvolla. Jos kuviossa on
+    rivin loppuun sidottuja ehtoja (esim. `$`), rajaus muuttaisi niiden
+    merkityksen, joten silloin käytetään Pythonin oman haun osumaa.
+    """
+    def rajat_ok(a: int, b: int) -> bool:
+        if not sana:
+            return True
+        return (a == 0 or not _sanamerkki(rivi[a - 1])) and (b == len(rivi) or not _sanamerkki(rivi[b]))
+
+    pos = 0
+    n = len(rivi)
+    while pos <= n:
+        m = kuvio.search(rivi, pos)
+        if m is None:
+            return
+        alku = m.start()
+        loppu = None
+        if not paateherkka:
+            for b in range(n, alku, -1):
+                if kuvio.fullmatch(rivi, alku, b) and rajat_ok(alku, b):
+                    loppu = b
+                    break
+        elif m.end() > alku and rajat_ok(alku, m.end()):
+            loppu = m.end()
+        if loppu is None:
+            pos = alku + 1
+            continue
+        yield alku, loppu
+        pos = loppu
+
+
+def _grep_valitsee(kuvio: "re.Pattern[str]", paateherkka: bool, rivi: str, sana: bool, koko_rivi: bool) -> bool:
+    if koko_rivi:
+        return kuvio.fullmatch(rivi) is not None
+    if sana:
+        return next(_grep_osumat(kuvio, paateherkka, rivi, True), None) is not None
+    return kuvio.search(rivi) is not None
+
+
+def _grep_hakemisto(polku: str) -> Iterator[str]:
+    # Sama läpikäyntijärjestys kuin grepin fts:llä (hakemistojärjestys, esijärjestys)
+    try:
+        merkinnat = list(os.scandir(polku))
+    except OSError:
+        return
+    for m in merkinnat:
+        nimi = os.path.join(polku, m.name)
+        if m.is_dir(follow_symlinks=False):
+            yield from _grep_hakemisto(nimi)
+        elif m.is_file(follow_symlinks=False):
+            yield nimi
+
+
+def _grep(args: List[str], stdin: Iterable[str], aikaraja: _Aikaraja) -> Iterator[str]:
+    optiot, operandit = _optiot(args, "EFGivnocwxrRhHe:lqs", [
+        "extended-regexp", "fixed-strings", "basic-regexp", "ignore-case",
+        "invert-match", "line-number", "only-matching", "count",
+        "word-regexp", "line-regexp", "recursive", "dereference-recursive",
+        "no-filename", "with-filename", "regexp=", "files-with-matches",
+        "quiet", "silent", "no-messages",
+    ])
+    tila = 'G'
+    kuviot: List[str] = []
+    asetukset = set()
+    for o, arvo in optiot:
+        if o in ('-E', '--extended-regexp'):
+            tila = 'E'
+        elif o in ('-F', '--fixed-strings'):
+            tila = 'F'
+        elif o in ('-G', '--basic-regexp'):
+            tila = 'G'
+        elif o in ('-e', '--regexp'):
+            kuviot.extend(arvo.split('\n'))
+        else:
+            asetukset.add({
+                '--ignore-case': '-i', '--invert-match': '-v', '--line-number': '-n',
+                '--only-matching': '-o', '--count': '-c', '--word-regexp': '-w',
+                '--line-regexp': '-x', '--recursive': '-r', '--dereference-recursive': '-r',
+                '-R': '-r', '--no-filename': '-h', '--with-filename': '-H',
+                '--files-with-matches': '-l', '--quiet': '-q', '--silent': '-q',
+                '--no-messages': '-s',
+            }.get(o, o))
+    if not kuviot:
+        if not operandit:
+            raise TuetumatonKomento("grep ilman kuviota")
+        kuviot = operandit.pop(0).split('\n')
+
+    utf8 = _utf8_kaytossa()
+    if not utf8:
+        # Tavutilassa myös kuvio käsitellään tavuina (vrt. _TiedostonRivit)
+        kuviot = [os.fsencode(k).decode('latin-1') for k in kuviot]
+    kuvio, paateherkka = kaanna_grep_kuvio(tuple(kuviot), tila, '-i' in asetukset, utf8)
+    kaanteinen = '-v' in asetukset
+    vain_osumat = '-o' in asetukset
+    sana = '-w' in asetukset
+    koko_rivi = '-x' in asetukset
+    if sana and paateherkka:
+        raise TuetumatonKomento("grep -w ja ankkuroitu kuvio")
+
+    tiedostot: List[str] = []
+    if '-r' in asetukset:
+        for op in operandit or ['.']:
+            if os.path.isdir(op):
+                tiedostot.extend(_grep_hakemisto(op))
+            else:
+                tiedostot.append(op)
+        # Ilman operandeja grep -r näyttää polut ilman './'-etuliitettä
+        if not operandit:
+            tiedostot = [t[2:] if t.startswith('./') else t for t in tiedostot]
+    else:
+        # Hakemistot ohitetaan (grep tulostaa vain virheilmoituksen)
+        tiedostot = [op for op in operandit if not os.path.isdir(op)]
+    if (operandit or '-r' in asetukset) and not tiedostot:
+        return
+    nayta_nimi = len(operandit) > 1 or '-r' in asetukset
+    if '-h' in asetukset:
+        nayta_nimi = False
+    if '-H' in asetukset:
+        nayta_nimi = True
+
+    for nimi, rivit in _lahde(tiedostot, stdin, aikaraja):
+        etuliite = ("(standard input)" if nimi == "-" else nimi) + ":" if nayta_nimi else ""
+        laskuri = 0
+        for nro, rivi in enumerate(rivit, start=1):
+            sisalto = _rivin_sisalto(rivi)
+            if vain_osumat and not kaanteinen and not asetukset & {'-c', '-l', '-q'}:
+                if koko_rivi:
+                    osumat = [(0, len(sisalto))] if sisalto and kuvio.fullmatch(sisalto) else []
+                else:
+                    osumat = _grep_osumat(kuvio, paateherkka, sisalto, sana)
+                for a, b in osumat:
+                    nro_osa = f"{nro}:" if '-n' in asetukset else ""
+                    yield f"{etuliite}{nro_osa}{sisalto[a:b]}\n"
+                continue
+            if _grep_valitsee(kuvio, paateherkka, sisalto, sana, koko_rivi) == kaanteinen:
+                continue
+            laskuri += 1
+            if '-q' in asetukset:
+                return
+            if '-l' in asetukset:
+                break
+            if '-c' in asetukset or vain_osumat:
+                continue
+            nro_osa = f"{nro}:" if '-n' in asetukset else ""
+            yield f"{etuliite}{nro_osa}{sisalto}\n"
+        if '-l' in asetukset and laskuri:
+            yield ("(standard input)" if nimi == "-" else nimi) + "\n"
+        elif '-c' in asetukset and '-q' not in asetukset:
+            yield f"{etuliite}{laskuri}\n"
+
+
+# --- Muut työkalut ---
+
+def _wc(args: List[str], stdin: Iterable[str], aikaraja: _Aikaraja) -> Iterator[str]:
+    optiot, tiedostot = _optiot(args, "lwcm", ["lines", "words", "bytes", "chars"])
+    valitut = {{'--lines': '-l', '--words': '-w', '--bytes': '-c', '--chars': '-m'}.get(o, o) for o, _ in optiot}
+    if not valitut:
+        valitut = {'-l', '-w', '-c'}
+    sarakkeet = [s for s in ('-l', '-w', '-m', '-c') if s in valitut]
+
+    utf8 = _utf8_kaytossa()
+    tulokset = []
+    tavallinen_koko = 0
+    vain_tavallisia = bool(tiedostot)
+    for nimi, rivit in _lahde(tiedostot, stdin, aikaraja):
+        if nimi == "-":
+            vain_tavallisia = False
+        else:
+            tavallinen_koko += os.path.getsize(nimi)
+        laskut = {'-l': 0, '-w': 0, '-m': 0, '-c': 0}
+        for rivi in rivit:
+            if rivi.endswith('\n'):
+                laskut['-l'] += 1
+            if utf8:
+                laskut['-w'] += len(rivi.split())
+            else:
+                # C-lokaalissa sanaksi lasketaan vain jakso, jossa on tulostettava merkki
+                laskut['-w'] += sum(1 for sana in rivi.encode('latin-1').split() if _TULOSTETTAVA.search(sana))
+            laskut['-m'] += len(rivi)
+            laskut['-c'] += len(rivi.encode('utf-8' if utf8 else 'latin-1'))
+        tulokset.append((nimi, laskut))
+    if tiedostot and len(tulokset) != len(tiedostot):
+        raise TuetumatonKomento("wc: puuttuva tiedosto")
+
+    # GNU wc: yksi laskuri ja yksi syöte -> ei tasausta; muuten leveys
+    # tavallisten tiedostojen yhteiskoon mukaan, putkelle vähintään 7.
+    if len(sarakkeet) == 1 and len(tulokset) == 1:
+        leveys = 1
+    else:
+        leveys = max(len(str(tavallinen_koko)), 1 if vain_tavallisia else 7)
+
+    def rivi_ulos(laskut: Dict[str, int], nimi: Optional[str]) -> str:
+        luvut = ' '.join(str(laskut[s]).rjust(leveys) for s in sarakkeet)
+        return f"{luvut} {nimi}\n" if nimi else f"{luvut}\n"
+
+    for nimi, laskut in tulokset:
+        yield rivi_ulos(laskut, None if nimi == "-" and not tiedostot else nimi)
+    if len(tulokset) > 1:
+        yhteensa = {s: sum(l[s] for _, l in tulokset) for s in sarakkeet}
+        yield rivi_ulos(yhteensa, "total")
+
+
+_TULOSTETTAVA = re.compile(rb'[\x21-\x7e]')
+_NUMERO_RE = re.compile(r'\s*(-?)(\d*)(?:\.(\d*))?')
+
+
+def _numeroavain(rivi: str) -> Tuple[int, Any]:
+    m = _NUMERO_RE.match(rivi)
+    etumerkki, kokonais, desim = m.group(1), m.group(2), m.group(3) or ""
+    if not kokonais and not desim:
+        return (0, 0)
+    arvo = int(kokonais or "0") + (int(desim) / 10 ** len(desim) if desim else 0)
+    return (0, -arvo) if etumerkki else (0, arvo)
+
+
+def _sort(args: List[str], stdin: Iterable[str], aikaraja: _Aikaraja) -> Iterator[str]:
+    optiot, tiedostot = _optiot(args, "rnuf", ["reverse", "numeric-sort", "unique", "ignore-case"])
+    liput = {{'--reverse': '-r', '--numeric-sort': '-n', '--unique': '-u', '--ignore-case': '-f'}.get(o, o) for o, _ in optiot}
+    perusavain = _lajitteluavain()
+    if '-f' in liput:
+        tekstiavain = lambda s: perusavain(s.upper())
+    else:
+        tekstiavain = perusavain
+
+    if '-n' in liput:
+        vertailuavain = _numeroavain
+    else:
+        vertailuavain = tekstiavain
+
+    rivit = []
+    for _, lahde in _lahde(tiedostot, stdin, aikaraja):
+        rivit.extend(_rivin_sisalto(r) for r in lahde)
+    aikaraja.tarkista()
+
+    if '-u' in liput:
+        # -u: vain avaimen perusteella, ei viimeistä koko rivin vertailua
+        rivit.sort(key=vertailuavain, reverse='-r' in liput)
+        edellinen = object()
+        for r in rivit:
+            k = vertailuavain(r)
+            if k != edellinen:
+                yield r + '\n'
+            edellinen = k
+        return
+
+    if '-n' in liput or '-f' in liput:
+        # Tasatilanteet ratkaistaan koko rivin vertailulla kuten GNU sort
+        rivit.sort(key=lambda r: (vertailuavain(r), perusavain(r)), reverse='-r' in liput)
+    else:
+        rivit.sort(key=vertailuavain, reverse='-r' in liput)
+    for r in rivit:
+        yield r + '\n'
+
+
+def _uniq(args: List[str], stdin: Iterable[str], aikaraja: _Aikaraja) -> Iterator[str]:
+    optiot, tiedostot = _optiot(args, "cdui", ["count", "repeated", "unique", "ignore-case"])
+    liput = {{'--count': '-c', '--repeated': '-d', '--unique': '-u', '--ignore-case': '-i'}.get(o, o) for o, _ in optiot}
+    if len(tiedostot) > 1:
+        raise TuetumatonKomento("uniq: tulostiedosto")
+    avain = (lambda s: s.casefold()) if '-i' in liput else (lambda s: s)
+
+    def tulosta(rivi: str, maara: int) -> Iterator[str]:
+        if '-d' in liput and maara < 2:
+            return
+        if '-u' in liput and maara > 1:
+            return
+        yield (f"{maara:7d} {rivi}\n" if '-c' in liput else rivi + '\n')
+
+    for _, lahde in _lahde(tiedostot, stdin, aikaraja):
+        edellinen = None
+        maara = 0
+        for r in lahde:
+            sisalto = _rivin_sisalto(r)
+            if edellinen is not None and avain(sisalto) == avain(edellinen):
+                maara += 1
+                continue
+            if edellinen is not None:
+                yield from tulosta(edellinen, maara)
+            edellinen, maara = sisalto, 1
+        if edellinen is not None:
+            yield from tulosta(edellinen, maara)
+
+
+def _lukumaara_optio(args: List[str], sallitut: str = r'-\d+') -> List[str]:
+    """Muunna vanha muoto `head -5` / `tail -5` / `tail +5` muotoon `-n 5`."""
+    tulos: List[str] = []
+    for a in args:
+        edellinen = tulos[-1] if tulos else ""
+        if edellinen not in ('-n', '--lines') and re.fullmatch(sallitut, a):
+            tulos.append("-n" + (a if a.startswith('+') else a[1:]))
+        else:
+            tulos.append(a)
+    return tulos
+
+
+def _otsikoilla(tiedostot: List[str], stdin: Iterable[str], aikaraja: _Aikaraja,
+                liput: set, kasittele: Callable[[Iterable[str]], Iterator[str]]) -> Iterator[str]:
+    otsikot = ('-v' in liput) or (len(tiedostot) > 1 and '-q' not in liput)
+    ensimmainen = True
+    for nimi, lahde in _lahde(tiedostot, stdin, aikaraja):
+        if otsikot:
+            yield ("" if ensimmainen else "\n") + f"==> {'standard input' if nimi == '-' else nimi} <==\n"
+        ensimmainen = False
+        yield from kasittele(lahde)
+
+
+def _head(args: List[str], stdin: Iterable[str], aikaraja: _Aikaraja) -> Iterator[str]:
+    optiot, tiedostot = _optiot(_lukumaara_optio(args), "n:qv", ["lines=", "quiet", "silent", "verbose"])
+    maara = 10
+    liput = set()
+    for o, arvo in optiot:
+        if o in ('-n', '--lines'):
+            maara = _kokonaisluku(arvo)
+        else:
+            liput.add({'--quiet': '-q', '--silent': '-q', '--verbose': '-v'}.get(o, o))
+
+    def kasittele(lahde: Iterable[str]) -> Iterator[str]:
+        if isinstance(lahde, _TiedostonRivit):
+            yield from lahde.valitse(lahde.indeksi.alku(maara))
+        elif maara >= 0:
+            for nro, r in enumerate(lahde):
+                if nro >= maara:
+                    break
+                yield r
+        else:
+            puskuri: "deque[str]" = deque()
+            for r in lahde:
+                puskuri.append(r)
+                if len(puskuri) > -maara:
+                    yield puskuri.popleft()
+
+    return _otsikoilla(tiedostot, stdin, aikaraja, liput, kasittele)
+
+
+def _tail(args: List[str], stdin: Iterable[str], aikaraja: _Aikaraja) -> Iterator[str]:
+    muunnetut = _lukumaara_optio(args, r'[-+]\d+')
+    optiot, tiedostot = _optiot(muunnetut, "n:qv", ["lines=", "quiet", "silent", "verbose"])
+    if muunnetut != args and len(tiedostot) > 1:
+        # GNU tail hyväksyy vanhan muodon vain yhden tiedoston kanssa
+        raise TuetumatonKomento("tail: vanha lukumäärämuoto")
+    maara = 10
+    alusta = False
+    liput = set()
+    for o, arvo in optiot:
+        if o in ('-n', '--lines'):
+            alusta = arvo.startswith('+')
+            maara = abs(_kokonaisluku(arvo))
+        else:
+            liput.add({'--quiet': '-q', '--silent': '-q', '--verbose': '-v'}.get(o, o))
+
+    def kasittele(lahde: Iterable[str]) -> Iterator[str]:
+        if isinstance(lahde, _TiedostonRivit):
+            indeksi = lahde.indeksi
+            rivit = indeksi.rivit(max(0, maara - 1)) if alusta else indeksi.loppu(maara)
+            yield from lahde.valitse(rivit)
+            return
+        if alusta:
+            for nro, r in enumerate(lahde, start=1):
+                if nro >= maara:
+                    yield r
+            return
+        if maara == 0:
+            for _ in lahde:
+                pass
+            return
+        yield from deque(lahde, maxlen=maara)
+
+    return _otsikoilla(tiedostot, stdin, aikaraja, liput, kasittele)
+
+
+def _cat(args: List[str], stdin: Iterable[str], aikaraja: _Aikaraja) -> Iterator[str]:
+    optiot, tiedostot = _optiot(args, "n", ["number"])
+    numeroi = bool(optiot)
+    nro = 0
+    for _, lahde in _lahde(tiedostot, stdin, aikaraja):
+        for r in lahde:
+            if numeroi:
+                nro += 1
+                yield f"{nro:6d}\t{r}"
+            else:
+                yield r
+
+
+SISAISET_TYOKALUT: Dict[str, Callable[[List[str], Iterable[str], _Aikaraja], Iterator[str]]] = {
+    "grep": _grep,
+    "wc": _wc,
+    "sort": _sort,
+    "uniq": _uniq,
+    "head": _head,
+    "tail": _tail,
+    "cat": _cat,
+}
+
+
+def _aja_putki_generaattorina(vaiheet: List[List[str]], aikaraja: _Aikaraja) -> Iterator[str]:
+    """Kytke putken vaiheet generaattoreiksi (ei välituloksia muistiin)."""
+    virta: Iterable[str] = iter(())
+    for argv in vaiheet:
+        tyokalu = SISAISET_TYOKALUT.get(argv[0])
+        if tyokalu is None:
+            raise TuetumatonKomento(f"ohjelma {argv[0]} ei ole tuettu")
+        virta = tyokalu(argv[1:], virta, aikaraja)
+    if not _utf8_kaytossa():
+        # Tavutilassa rivit on dekoodattu latin-1:nä; palautetaan samat
+        # merkkijonot kuin aliprosessin tekstitilan dekoodaus antaisi.
+        koodaus = locale.getpreferredencoding(False)
+        virta = (r.encode('latin-1').decode(koodaus, 'replace') for r in virta)
+    return iter(virta)
+
+
+def aja_sisaisesti(cmd: str, aikaraja_s: Optional[float] = None) -> Iterator[str]:
+    """Aja komento sisäisellä moottorilla ja palauta tulosterivien iteraattori.
+
+    Heittää `TuetumatonKomento`-poikkeuksen jo jäsennysvaiheessa tai
+    iteroinnin aikana, jos komentoa ei voida ajaa oikeaa ohjelmaa vastaavasti.
+    """
+    if aikaraja_s is None:
+        aikaraja_s = konfiguraatio.asetukset().timeout_seconds
+    return _aja_putki_generaattorina(jaa_putken_vaiheet(cmd), _Aikaraja(aikaraja_s))
@@ -0,0 +1,136 @@
+"""Interaktiivisen tilan palaute: rajattu esikatselu ja rivierot.
+
+Tulosteita ei jaeta riviluetteloiksi eikä järjestetä. Rivit luetaan
+merkkijonosta tarvittaessa (`rivit`), ja erot lasketaan rivitiivisteillä
+(`vertailu.rivin_tiiviste`) kuten arvioinnissa. Kustakin osasta näytetään
+enintään `feedback_preview_lines` riviä ja kerrotaan, montako jäi
+näyttämättä. Koko ero kootaan vasta, kun opiskelija pyytää sitä
+(`ero`-komento, näytetään sivuttimella).
+"""
+from typing import Callable, FrozenSet, Iterator, List, Optional, Set, Tuple
+
+from .vertailu import rivin_tiiviste, tulosteen_tiivisteet
+
+
+# Muut rivinvaihdot, jotka `str.splitlines()` tunnistaa
+_MUUT_RIVINVAIHDOT = "\r\x0b\x0c\x1c\x1d\x1e\x85\u2028\u2029"
+
+
+def _vain_rivinvaihdot(teksti: str) -> bool:
+    return not any(c in teksti for c in _MUUT_RIVINVAIHDOT)
+
+
+def rivit(teksti: str) -> Iterator[str]:
+    """Tulosteen rivit kuten `splitlines()`, mutta kopioimatta koko tulostetta listaksi."""
+    if not _vain_rivinvaihdot(teksti):
+        yield from teksti.splitlines()
+        return
+    alku = 0
+    n = len(teksti)
+    while alku < n:
+        loppu = teksti.find("\n", alku)
+        if loppu < 0:
+            yield teksti[alku:]
+            return
+        yield teksti[alku:loppu]
+        alku = loppu + 1
+
+
+def esikatselu(teksti: str, maksimi: int) -> Tuple[List[str], int]:
+    """Tulosteen `maksimi` ensimmäistä riviä ja näyttämättä jääneiden rivien määrä."""
+    naytetyt: List[str] = []
+    kaikki = rivit(teksti)
+    for rivi in kaikki:
+        if len(naytetyt) == maksimi:
+            if _vain_rivinvaihdot(teksti):
+                # Loput rivit lasketaan lukematta niitä
+                alku = sum(len(r) + 1 for r in naytetyt)
+                return naytetyt, teksti.count("\n", alku, len(teksti) - 1) + 1
+            return naytetyt, 1 + sum(1 for _ in kaikki)
+        naytetyt.append(rivi)
+    return naytetyt, 0
+
+
+class Erot:
+    """Opiskelijan ja oikean tulosteen rivierot joukkoina (rivijärjestys ei vaikuta).
+
+    Määrät lasketaan rivitiivisteistä heti; erojen rivit haetaan
+    tulosteista vasta pyydettäessä ja alkuperäisessä järjestyksessä.
+    """
+
+    def __init__(self, oikea: str, oma: str, viite: Optional[FrozenSet[bytes]] = None):
+        self.oikea = oikea
+        self.oma = oma
+        self._viite = tulosteen_tiivisteet(oikea) if viite is None else viite
+        self._omat = frozenset(rivin_tiiviste(r) for r in rivit(oma))
+        self.vain_oikeassa = len(self._viite - self._omat)
+        self.vain_omassa = len(self._omat - self._viite)
+
+    @property
+    def sama(self) -> bool:
+        return not self.vain_oikeassa and not self.vain_omassa
+
+    @staticmethod
+    def _puuttuvat(teksti: str, muut: FrozenSet[bytes], maksimi: Optional[int]) -> Iterator[str]:
+        nahdyt: Set[bytes] = set()
+        for rivi in rivit(teksti):
+            if maksimi is not None and len(nahdyt) >= maksimi:
+                return
+            t = rivin_tiiviste(rivi)
+            if t not in muut and t not in nahdyt:
+                nahdyt.add(t)
+                yield rivi
+
+    def vain_oikeassa_rivit(self, maksimi: Optional[int] = None) -> Iterator[str]:
+        return self._puuttuvat(self.oikea, self._omat, maksimi)
+
+    def vain_omassa_rivit(self, maksimi: Optional[int] = None) -> Iterator[str]:
+        return self._puuttuvat(self.oma, self._viite, maksimi)
+
+    def koko_ero(self) -> str:
+        """Koko ero ja molemmat tulosteet tekstinä (sivutinta varten)."""
+        osat = [f"Rivejä vain oikeassa tuloksessa: {self.vain_oikeassa}"]
+        osat += [f"+ {r}" for r in self.vain_oikeassa_rivit()]
+        osat.append(f"Rivejä vain sinun tuloksessasi: {self.vain_omassa}")
+        osat += [f"- {r}" for r in self.vain_omassa_rivit()]
+        osat += ["", "— Oikea vastaus —", self.oikea, "", "— Sinun vastaus —", self.oma]
+        return "\n".join(osat) + "\n"
+
+
+def tulosta_esikatselu(otsikko: str, teksti: str, maksimi: int,
+                       tulosta: Callable[[str], None] = print) -> bool:
+    """Tulosta otsikko ja enintään `maksimi` riviä; True, jos rivejä jäi näyttämättä."""
+    naytetyt, loput = esikatselu(teksti, maksimi)
+    tulosta(otsikko)
+    for rivi in naytetyt:
+        tulosta(rivi)
+    if loput:
+        tulosta(f"… +{loput} riviä lisää")
+    return bool(loput)
+
+
+def tulosta_erot(erot: Erot, maksimi: int, tulosta: Callable[[str], None] = print) -> bool:
+    """Tulosta enintään `maksimi` eroriviä kumpaankin suuntaan; True, jos rivejä jäi näyttämättä."""
+    rajattu = False
+    if erot.vain_oikeassa:
+        tulosta("Rivejä vain oikeassa tuloksessa:")
+        for r in erot.vain_oikeassa_rivit(maksimi):
+            tulosta(f"+ {r}")
+        if erot.vain_oikeassa > maksimi:
+            tulosta(f"… +{erot.vain_oikeassa - maksimi} riviä lisää vain oikeassa tuloksessa")
+            rajattu = True
+    if erot.vain_omassa:
+        tulosta("Rivejä vain sinun tuloksessasi:")
+        for r in erot.vain_omassa_rivit(maksimi):
+            tulosta(f"- {r}")
+        if erot.vain_omassa > maksimi:
+            tulosta(f"… +{erot.vain_omassa - maksimi} riviä lisää vain sinun tuloksessasi")
+            rajattu = True
+    return rajattu
+
+
+def nayta_sivuttimella(teksti: str) -> None:
+    """Näytä teksti sivuttimella ($PAGER / less); ilman päätettä tulostetaan sellaisenaan."""
+    # pydoc tuodaan vasta tarvittaessa, jotta interaktiivinen tila käynnistyy nopeasti
+    import pydoc
+    pydoc.pager(teksti)
@@ -0,0 +1,360 @@
+"""Arviointipalvelin (`linuxcli-grep serve`).
+
+Pitkäikäinen prosessi, joka kuuntelee paikallista Unix-sokettia ja pitää
+jäsennetyt tehtävät, viitetulosteiden välimuistin ja datatiedostojen
+sormenjäljet muistissa. Protokolla on JSON-rivejä: yksi pyyntö ja yksi
+vastaus per rivi.
+
+    {"op": "grade", "task": 3, "cmd": "grep ...", "client": "s1234", "set": "grep"}
+      -> {"ok": true, "student_output": "...", "reference_output": "..."}
+    {"op": "stats"} -> {"ok": true, "stats": {...}}
+    {"op": "metrics"} -> {"ok": true, "metrics": "<Prometheus-tekstimuoto>"}
+    {"op": "ping"}  -> {"ok": true}
+
+Arviointipyynnöt ajetaan enintään `daemon_concurrency` kerrallaan. Jonossa
+olevat pyynnöt jaetaan asiakkaiden kesken vuorotellen (round robin), joten
+yksi paljon pyyntöjä lähettävä asiakas ei viivästytä muita.
+
+Palvelin arvioi sen tehtäväsarjan tehtäviä, joka on valittu käynnistettäessä
+(`linuxcli-grep serve --set awk`). Pyyntö toisen sarjan tehtävästä ("set")
+hylätään, jolloin asiakas arvioi paikallisesti.
+
+Soketti on oletuksena vain palvelimen käyttäjän käytettävissä (tila 0600).
+Jaetulla laboratoriopalvelimella tilaksi voi asettaa esim. 0660 ja ryhmäksi
+opiskelijoiden ryhmän (`daemon_socket_mode`, `daemon_socket_group`); muille
+kuin omistajalle ja ryhmälle oikeuksia ei anneta. Komennot saavat lukea vain
+`data/`-hakemiston tiedostoja. Jos asiakas katkaisee
+yhteyden, sen jonossa oleva työ perutaan ja käynnissä olevan opiskelijan
+komennon prosessiryhmä tapetaan.
+"""
+import asyncio
+import json
+import os
+import signal
+import sys
+import time
+from collections import OrderedDict, deque
+from concurrent.futures import ThreadPoolExecutor
+from pathlib import Path
+from typing import Any, Deque, Dict, List, Optional, Tuple
+
+from . import mittarit
+from .asiakas import DATAN_ULKOPUOLELLA
+from .hiekkalaatikko import Peruutus, peruttavissa
+from .komentorivi import Vaihe, jasenna_putki
+from .konfiguraatio import asetukset
+from .suoritus import aja_komento, turvallinen_komento
+from .tehtavasarjat import avaa_tehtavat
+from .tehtavat import tehtavan_odotettu
+from .valimuisti import aja_oikea_komento, kirjoita_valimuistit, viite_valimuisti
+
+_MAKSIMI_PYYNTO = 64 * 1024
+_DATA = "data"
+# Soketin sallitut oikeudet: luku ja kirjoitus omistajalle ja ryhmälle
+_SOKETIN_OIKEUDET = 0o660
+
+
+def _ryhman_gid(ryhma: str) -> int:
+    """Ryhmän nimi tai numeerinen gid -> gid."""
+    if ryhma.isdigit():
+        return int(ryhma)
+    # grp tuodaan vasta tarvittaessa (vain Unix)
+    import grp
+    try:
+        return grp.getgrnam(ryhma).gr_gid
+    except KeyError:
+        raise ValueError(f"tuntematon ryhmä: {ryhma}") from None
+
+
+def _aseta_soketin_oikeudet(soketti: Path, tila: int, gid: Optional[int] = None) -> None:
+    """Vaihda soketin ryhmä (jos annettu) ja tila.
+
+    Ryhmä vaihdetaan ennen tilaa, jotta ryhmäoikeudet eivät ole hetkeäkään
+    palvelimen käyttäjän oletusryhmällä.
+    """
+    if gid is not None:
+        os.chown(soketti, -1, gid)
+    os.chmod(soketti, tila)
+
+
+def _tiedostot_hakemistossa(vaiheet: List[Vaihe], juuri: str) -> bool:
+    """Tarkista, että jokainen olemassa olevaan polkuun viittaava sana on `juuri`-hakemistossa.
+
+    Optioista (`-f/etc/passwd`, `--file=...`) tarkistetaan myös jokainen
+    loppuosa, koska polku voi olla kiinni optiossa.
+    """
+    ehdokkaat: List[str] = []
+    for vaihe in vaiheet:
+        if vaihe.syote is not None:
+            ehdokkaat.append(vaihe.syote)
+        for sana in vaihe.argv[1:]:
+            ehdokkaat.append(sana)
+            if sana.startswith("-"):
+                ehdokkaat.extend(sana[k:] for k in range(1, len(sana)))
+    for ehdokas in ehdokkaat:
+        if not os.path.exists(ehdokas):
+            continue
+        polku = os.path.realpath(ehdokas)
+        if polku != juuri and not polku.startswith(juuri + os.sep):
+            return False
+    return True
+
+
+class Viivetilasto:
+    """Viimeisimpien pyyntöjen viiveet (jonotus ja kokonaisaika) prosenttipisteinä."""
+
+    def __init__(self, ikkuna: int = 1000):
+        self.pyyntoja = 0
+        self.virheita = 0
+        self._kokonais: Deque[float] = deque(maxlen=ikkuna)
+        self._jonossa: Deque[float] = deque(maxlen=ikkuna)
+
+    def kirjaa(self, jonossa_s: float, kokonais_s: float) -> None:
+        self.pyyntoja += 1
+        self._jonossa.append(jonossa_s)
+        self._kokonais.append(kokonais_s)
+
+    @staticmethod
+    def _prosenttipisteet(arvot: Deque[float]) -> Dict[str, float]:
+        if not arvot:
+            return {}
+        jarjestetty = sorted(arvot)
+
+        def p(q: float) -> float:
+            return round(jarjestetty[min(len(jarjestetty) - 1, int(q * len(jarjestetty)))] * 1000, 3)
+        return {"p50": p(0.50), "p95": p(0.95), "p99": p(0.99), "max": round(jarjestetty[-1] * 1000, 3)}
+
+    def raportti(self) -> Dict[str, Any]:
+        return {
+            "requests": self.pyyntoja,
+            "errors": self.virheita,
+            "latency_ms": self._prosenttipisteet(self._kokonais),
+            "queue_ms": self._prosenttipisteet(self._jonossa),
+        }
+
+
+class ReiluJono:
+    """Asiakaskohtaiset FIFO-jonot, joista otetaan töitä vuorotellen."""
+
+    def __init__(self, maksimi: int):
+        self.maksimi = maksimi
+        self._jonot: "OrderedDict[str, Deque[Any]]" = OrderedDict()
+        self._koko = 0
+        self._ehto = asyncio.Condition()
+
+    def __len__(self) -> int:
+        return self._koko
+
+    async def lisaa(self, asiakas: str, tyo: Any) -> bool:
+        """Lisää työ jonoon; palauttaa False, jos jono on täynnä."""
+        async with self._ehto:
+            if self._koko >= self.maksimi:
+                return False
+            self._jonot.setdefault(asiakas, deque()).append(tyo)
+            self._koko += 1
+            self._ehto.notify()
+            return True
+
+    async def seuraava(self) -> Any:
+        async with self._ehto:
+            await self._ehto.wait_for(lambda: self._koko > 0)
+            asiakas, jono = self._jonot.popitem(last=False)
+            tyo = jono.popleft()
+            if jono:
+                # Asiakas siirtyy vuorojonon loppuun
+                self._jonot[asiakas] = jono
+            self._koko -= 1
+            return tyo
+
+
+class Palvelin:
+    def __init__(self, soketti: Path, rinnakkaisuus: int, jonon_maksimi: int,
+                 soketin_tila: int = 0o600, soketin_ryhma: str = ""):
+        if soketin_tila & ~_SOKETIN_OIKEUDET:
+            raise ValueError(f"soketin tila {soketin_tila:04o} sallii muutakin kuin "
+                             f"omistajan ja ryhmän luvun ja kirjoituksen ({_SOKETIN_OIKEUDET:04o})")
+        self.soketti = soketti
+        self.soketin_tila = soketin_tila
+        self._soketin_gid = _ryhman_gid(soketin_ryhma) if soketin_ryhma else None
+        self.rinnakkaisuus = max(1, rinnakkaisuus)
+        self.sarja = asetukset().tehtavasarja
+        self.tehtavat = avaa_tehtavat()
+        self.tilasto = Viivetilasto()
+        self.kaynnissa = 0
+        self._jonon_maksimi = jonon_maksimi
+        self._pool = ThreadPoolExecutor(max_workers=self.rinnakkaisuus)
+        self._seuraava_asiakas = 0
+        self._data = os.path.realpath(_DATA)
+
+    # --- Pyyntöjen käsittely ---
+
+    def _arvioi(self, i: int, cmd: str, peruutus: Peruutus) -> Dict[str, Any]:
+        # Vain opiskelijan komento perutaan; keskeytettyä viiteajoa ei saa
+        # tallentaa välimuistiin
+        oma = peruttavissa(peruutus, aja_komento, cmd)
+        if peruutus.peruttu:
+            return {"ok": False, "error": "peruttu"}
+        return {
+            "ok": True,
+            "student_output": oma,
+            "reference_output": aja_oikea_komento(self.tehtavat[i][1], tehtavan_odotettu(self.tehtavat, i)),
+        }
+
+    def _tarkista(self, pyynto: Dict[str, Any]) -> Tuple[int, str]:
+        i, cmd = pyynto.get("task"), pyynto.get("cmd")
+        if pyynto.get("set", self.sarja) != self.sarja:
+            raise ValueError("eri tehtäväsarja")
+        if not isinstance(i, int) or not 0 <= i < len(self.tehtavat):
+            raise ValueError("tuntematon tehtävä")
+        # Sama jäsennys kuin ajossa: ei shellin ketjutusta tai korvauksia
+        if not isinstance(cmd, str) or not turvallinen_komento(cmd):
+            raise ValueError("komento ei ole sallittu")
+        if not _tiedostot_hakemistossa(jasenna_putki(cmd), self._data):
+            raise ValueError(DATAN_ULKOPUOLELLA)
+        return i, cmd
+
+    async def _kasittele(self, pyynto: Dict[str, Any], asiakas: str) -> Dict[str, Any]:
+        op = pyynto.get("op")
+        if op == "ping":
+            return {"ok": True}
+        if op == "stats":
+            return {"ok": True, "stats": self.tilastot()}
+        if op == "metrics":
+            return {"ok": True, "metrics": mittarit.muotoile()}
+        if op != "grade":
+            return {"ok": False, "error": f"tuntematon operaatio: {op}"}
+
+        alku = time.perf_counter()
+        try:
+            i, cmd = self._tarkista(pyynto)
+        except ValueError as e:
+            self.tilasto.virheita += 1
+            return {"ok": False, "error": str(e)}
+        valmis: "asyncio.Future[Dict[str, Any]]" = asyncio.get_running_loop().create_future()
+        if not await self._jono.lisaa(str(pyynto.get("client") or asiakas), (alku, i, cmd, valmis)):
+            self.tilasto.virheita += 1
+            return {"ok": False, "error": "jono täynnä"}
+        return await valmis
+
+    async def _tyontekija(self) -> None:
+        loop = asyncio.get_running_loop()
+        while True:
+            alku, i, cmd, valmis = await self._jono.seuraava()
+            if valmis.cancelled():
+                continue  # asiakas katkaisi yhteyden
+            jonossa = time.perf_counter() - alku
+            peruutus = Peruutus()
+            # Asiakas katkaisi yhteyden kesken arvioinnin: tapa opiskelijan komento
+            valmis.add_done_callback(lambda f, p=peruutus: f.cancelled() and p.peru())
+            self.kaynnissa += 1
+            try:
+                vastaus = await loop.run_in_executor(self._pool, self._arvioi, i, cmd, peruutus)
+            except Exception as e:
+                self.tilasto.virheita += 1
+                vastaus = {"ok": False, "error": str(e)}
+            finally:
+                self.kaynnissa -= 1
+            self.tilasto.kirjaa(jonossa, time.perf_counter() - alku)
+            if not valmis.done():
+                valmis.set_result(vastaus)
+
+    async def _yhteys(self, lukija: asyncio.StreamReader, kirjoittaja: asyncio.StreamWriter) -> None:
+        self._seuraava_asiakas += 1
+        asiakas = f"yhteys-{self._seuraava_asiakas}"
+        # Seuraavaa riviä luetaan jo pyynnön käsittelyn aikana, jotta yhteyden
+        # katkeaminen huomataan ja asiakkaan työ perutaan
+        seuraava = asyncio.ensure_future(lukija.readline())
+        kasittely: Optional["asyncio.Future[Dict[str, Any]]"] = None
+        try:
+            while True:
+                rivi = await seuraava
+                if not rivi:
+                    break
+                seuraava = asyncio.ensure_future(lukija.readline())
+                try:
+                    pyynto = json.loads(rivi)
+                    if not isinstance(pyynto, dict):
+                        raise ValueError
+                except ValueError:
+                    vastaus: Dict[str, Any] = {"ok": False, "error": "virheellinen pyyntö"}
+                else:
+                    kasittely = asyncio.ensure_future(self._kasittele(pyynto, asiakas))
+                    await asyncio.wait({kasittely, seuraava}, return_when=asyncio.FIRST_COMPLETED)
+                    if not kasittely.done() and (seuraava.exception() is not None or not seuraava.result()):
+                        break  # yhteys katkesi (tai liian pitkä rivi): työ perutaan alla
+                    vastaus = await kasittely
+                    kasittely = None
+                kirjoittaja.write(json.dumps(vastaus, ensure_ascii=False).encode('utf-8') + b"\n")
+                await kirjoittaja.drain()
+        except (ConnectionError, ValueError):
+            pass  # ValueError: liian pitkä rivi
+        finally:
+            if kasittely is not None:
+                kasittely.cancel()
+            seuraava.cancel()
+            kirjoittaja.close()
+
+    def tilastot(self) -> Dict[str, Any]:
+        return {
+            **self.tilasto.raportti(),
+            "active": self.kaynnissa,
+            "queued": len(self._jono),
+            "concurrency": self.rinnakkaisuus,
+            "task_set": self.sarja,
+            "tasks": len(self.tehtavat),
+            "reference_cache": viite_valimuisti().tilasto(),
+        }
+
+    # --- Käynnistys ---
+
+    async def aja(self) -> None:
+        self._jono = ReiluJono(self._jonon_maksimi)
+        self.soketti.parent.mkdir(parents=True, exist_ok=True)
+        if self.soketti.exists():
+            self.soketti.unlink()  # edellisen ajon jäänne
+        # Soketti luodaan suoraan tilassa 0600, ja ryhmälle annetaan oikeudet
+        # vasta ryhmän vaihdon jälkeen: muut käyttäjät eivät voi yhdistää välissä
+        umask = os.umask(0o177)
+        try:
+            palvelin = await asyncio.start_unix_server(self._yhteys, path=str(self.soketti),
+                                                       limit=_MAKSIMI_PYYNTO)
+        finally:
+            os.umask(umask)
+        _aseta_soketin_oikeudet(self.soketti, self.soketin_tila, self._soketin_gid)
+        tyontekijat = [asyncio.create_task(self._tyontekija()) for _ in range(self.rinnakkaisuus)]
+        loppu = asyncio.Event()
+        loop = asyncio.get_running_loop()
+        for s in (signal.SIGINT, signal.SIGTERM):
+            loop.add_signal_handler(s, loppu.set)
+        print(f"🛰️  Kuunnellaan {self.soketti} ({self.rinnakkaisuus} rinnakkaista arviointia, "
+              f"sarja {self.sarja}: {len(self.tehtavat)} tehtävää)", flush=True)
+        try:
+            async with palvelin:
+                await loppu.wait()
+        finally:
+            for t in tyontekijat:
+                t.cancel()
+            self._pool.shutdown(wait=False, cancel_futures=True)
+            try:
+                self.soketti.unlink()
+            except FileNotFoundError:
+                pass
+            kirjoita_valimuistit()
+            mittarit.kirjoita()
+        print("🛑 Palvelin pysäytetty.")
+
+
+def serve_mode(soketti: Optional[str] = None, jobs: Optional[int] = None) -> None:
+    a = asetukset()
+    try:
+        palvelin = Palvelin(
+            Path(soketti or a.palvelin_soketti),
+            jobs or a.palvelin_rinnakkaisuus or (os.cpu_count() or 1),
+            a.palvelin_jonon_maksimi,
+            a.palvelin_soketin_tila,
+            a.palvelin_soketin_ryhma,
+        )
+    except ValueError as e:
+        print(f"❌ {e}")
+        sys.exit(2)
+    asyncio.run(palvelin.aja())
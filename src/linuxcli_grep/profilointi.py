@@ -0,0 +1,110 @@
+"""`--profile`-mittaukset komentojen ajoista."""
+import contextlib
+import threading
+import time
+from typing import Any, Dict, List, Optional, Tuple
+
+from . import mittarit
+
+
+# `--profile`: jokaisesta komennon ajosta kirjataan kesto, lapsiprosessien
+# CPU-aika ja muistihuippu (getrusage(RUSAGE_CHILDREN) ennen ja jälkeen),
+# tulosteen koko sekä aikakatkaisu. Kirjaukset ryhmitellään sen tehtävän
+# alle, jota säie parhaillaan käsittelee (`profiloi_tehtava`).
+
+PROFILOINTI = False
+_profiilit: Dict[int, List[Dict[str, Any]]] = {}
+_profiili_konteksti = threading.local()
+_profiili_lukko = threading.Lock()
+
+
+def _lasten_kaytto():
+    try:
+        import resource
+    except ImportError:  # esim. Windows
+        return None
+    return resource.getrusage(resource.RUSAGE_CHILDREN)
+
+
+@contextlib.contextmanager
+def profiloi_tehtava(i: int):
+    """Kohdista tämän säikeen komentoajojen kirjaukset tehtävälle `i`."""
+    edellinen = getattr(_profiili_konteksti, "tehtava", None)
+    _profiili_konteksti.tehtava = i
+    try:
+        yield
+    finally:
+        _profiili_konteksti.tehtava = edellinen
+
+
+@contextlib.contextmanager
+def profiloi_ajo(rooli: str, cmd: str):
+    """Mittaa yksi komennon ajo; kutsuja täydentää tulosteen tiedot sanakirjaan.
+
+    Kirjaa ajon myös käyttömittareihin (`mittarit`), jos ne ovat käytössä.
+    """
+    mittaus: Dict[str, Any] = {
+        "role": rooli,
+        "cmd": cmd,
+        "stdout_bytes": 0,
+        "stdout_lines": 0,
+        "timed_out": False,
+    }
+    if not PROFILOINTI and not mittarit.MITTARIT:
+        yield mittaus
+        return
+    ennen = _lasten_kaytto() if PROFILOINTI else None
+    alku = time.perf_counter()
+    try:
+        yield mittaus
+    finally:
+        kesto = time.perf_counter() - alku
+        # Välimuistista saadut tulokset eivät ole ajoja
+        if mittarit.MITTARIT and not mittaus.get("cached"):
+            mittarit.kirjaa_ajo(mittaus, kesto)
+        if PROFILOINTI:
+            _kirjaa_profiili(mittaus, kesto, ennen)
+
+
+def _kirjaa_profiili(mittaus: Dict[str, Any], kesto: float, ennen) -> None:
+    mittaus["wall_s"] = round(kesto, 6)
+    jalkeen = _lasten_kaytto()
+    if ennen is not None and jalkeen is not None:
+        mittaus["user_cpu_s"] = round(jalkeen.ru_utime - ennen.ru_utime, 6)
+        mittaus["sys_cpu_s"] = round(jalkeen.ru_stime - ennen.ru_stime, 6)
+        # ru_maxrss on lapsiprosessien suurin muistihuippu tähän mennessä (kt)
+        mittaus["maxrss_kb"] = jalkeen.ru_maxrss
+        mittaus["maxrss_delta_kb"] = jalkeen.ru_maxrss - ennen.ru_maxrss
+    tehtava = getattr(_profiili_konteksti, "tehtava", None)
+    with _profiili_lukko:
+        _profiilit.setdefault(tehtava, []).append(mittaus)
+
+
+def tehtavan_profiili(i: int) -> Optional[Dict[str, Any]]:
+    ajot = _profiilit.get(i)
+    if not ajot:
+        return None
+    return {"wall_s": round(sum(a.get("wall_s", 0) for a in ajot), 6), "calls": ajot}
+
+
+def viimeisimmat_ajot(i: int, n: int) -> List[Dict[str, Any]]:
+    """Tehtävän `i` `n` viimeisintä profiloitua ajoa (uusin viimeisenä)."""
+    with _profiili_lukko:
+        return list(_profiilit.get(i, [])[-n:]) if n > 0 else []
+
+
+def tulosta_hitaimmat(tehtavat: List[Tuple[str, str]], n: int = 5) -> None:
+    """Tulosta yhteenveto hitaimmista tehtävistä."""
+    kestot = sorted(
+        ((p["wall_s"], i) for i in _profiilit if i is not None and (p := tehtavan_profiili(i))),
+        reverse=True,
+    )
+    if not kestot:
+        return
+    print("⏱️  Hitaimmat tehtävät:")
+    for kesto, i in kestot[:n]:
+        ajot = _profiilit[i]
+        cpu = sum(a.get("user_cpu_s", 0) + a.get("sys_cpu_s", 0) for a in ajot)
+        aikakatkaisut = sum(1 for a in ajot if a["timed_out"])
+        lisa = f", {aikakatkaisut} aikakatkaisua" if aikakatkaisut else ""
+        print(f"   {kesto * 1000:8.1f} ms  (CPU {cpu * 1000:.1f} ms{lisa})  {i + 1}. {tehtavat[i][0]}")
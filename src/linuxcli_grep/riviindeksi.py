@@ -0,0 +1,228 @@
+"""Muistikartoitettu rivisiirtymäindeksi datatiedostoille.
+
+Jokainen datatiedosto avataan kerran ja kartoitetaan muistiin (`mmap`);
+rivien alkukohdat lasketaan kerran ja tallennetaan välimuistihakemistoon.
+Indeksin avulla rivit, alku (`head`) ja loppu (`tail`) saadaan suoraan
+siirtymistä ilman koko tiedoston lukemista, ja rivit luetaan kopioimatta
+muistinäkyminä (`memoryview`) kartoitetusta tiedostosta.
+
+Indeksi rakennetaan uudelleen automaattisesti, kun tiedoston sormenjälki
+(koko, mtime ja i-solmu) muuttuu. Avoimia indeksejä pidetään enintään
+`line_index_max_open` kappaletta (LRU); poistettu tai korvattu indeksi
+suljetaan heti, tai viimeisen siitä luetun rivin vapautuessa, jos rivejä
+on vielä käytössä. Indeksitiedostot tallennetaan
+`cache_dir`-hakemistoon eikä datatiedostojen viereen, jotta esim.
+`grep -R ./data/*` ei näe niitä.
+"""
+import codecs
+import hashlib
+import mmap
+import os
+import struct
+import threading
+from array import array
+from collections import OrderedDict
+from pathlib import Path
+from typing import Iterator, Optional, Tuple
+
+from .konfiguraatio import asetukset
+
+# Otsake: taika, versio, liput, koko, mtime_ns, i-solmu, rivien määrä.
+# Otsaketta seuraa (rivit + 1) kappaletta u64-siirtymiä (viimeinen = koko).
+_INDEKSI_TAIKA = b"LCRI"
+_INDEKSI_VERSIO = 1
+_OTSAKE = struct.Struct("=4sHHQqQQ")
+
+# Lippubitit: tiedostossa on NUL-tavu / tiedosto ei ole kelvollista UTF-8:aa
+NUL_TAVU = 1
+EI_UTF8 = 2
+
+
+def _sormenjalki(st: os.stat_result) -> Tuple[int, int, int]:
+    return st.st_size, st.st_mtime_ns, st.st_ino
+
+
+class IndeksiSuljettu(Exception):
+    """Indeksi on suljettu (tiedosto muuttui tai indeksi poistui välimuistista)."""
+
+
+class RiviIndeksi:
+    """Yhden tiedoston muistikartta ja rivien alkusiirtymät."""
+
+    def __init__(self, polku: str, sormenjalki: Tuple[int, int, int],
+                 data, siirtymat, liput: int, indeksikartta: Optional[mmap.mmap] = None):
+        self.polku = polku
+        self.sormenjalki = sormenjalki
+        self._data = data              # mmap (tai b"" tyhjälle tiedostolle)
+        self._siirtymat = siirtymat    # memoryview('Q') tai array('Q')
+        self._indeksikartta = indeksikartta  # tallennetun indeksin mmap, jos siirtymät ovat siinä
+        self._rivit = len(siirtymat) - 1
+        self.liput = liput
+        self._suljettu = False
+        self._lukko = threading.Lock()
+
+    @property
+    def suljettu(self) -> bool:
+        return self._suljettu
+
+    def _nakyma(self) -> memoryview:
+        with self._lukko:
+            if self._suljettu:
+                raise IndeksiSuljettu(self.polku)
+            return memoryview(self._data)
+
+    def sulje(self) -> bool:
+        """Sulje muistikartat; False, jos rivejä on vielä käytössä.
+
+        Käytössä olevaa karttaa ei voi sulkea; se vapautuu, kun viimeinen
+        siitä luettu rivi (ja indeksiolio) vapautuu.
+        """
+        with self._lukko:
+            if self._suljettu:
+                return True
+            if isinstance(self._data, mmap.mmap):
+                try:
+                    self._data.close()
+                except BufferError:
+                    return False
+            self._suljettu = True
+            if isinstance(self._siirtymat, memoryview):
+                try:
+                    self._siirtymat.release()
+                except BufferError:
+                    return True
+            if self._indeksikartta is not None:
+                self._indeksikartta.close()
+            return True
+
+    @property
+    def binaarinen(self) -> bool:
+        """Tiedostossa on NUL-tavuja tai se ei ole kelvollista UTF-8:aa."""
+        return self.liput != 0
+
+    def __len__(self) -> int:
+        return self._rivit
+
+    def rivi(self, i: int) -> memoryview:
+        """Rivi `i` (0-pohjainen) rivinvaihtoineen, kopioimatta."""
+        return self._nakyma()[self._siirtymat[i]:self._siirtymat[i + 1]]
+
+    def rivit(self, alku: int = 0, loppu: Optional[int] = None) -> Iterator[memoryview]:
+        """Rivit väliltä [alku, loppu) muistinäkyminä (kuten `range`)."""
+        nakyma = self._nakyma()
+        alku, loppu, _ = slice(alku, loppu).indices(len(self))
+        siirtymat = self._siirtymat
+        for i in range(alku, loppu):
+            yield nakyma[siirtymat[i]:siirtymat[i + 1]]
+
+    def alku(self, n: int) -> Iterator[memoryview]:
+        """Ensimmäiset `n` riviä (`head -n N`); negatiivinen: kaikki paitsi viimeiset."""
+        return self.rivit(0, n if n >= 0 else max(0, len(self) + n))
+
+    def loppu(self, n: int) -> Iterator[memoryview]:
+        """Viimeiset `n` riviä (`tail -n N`)."""
+        return self.rivit(max(0, len(self) - n))
+
+
+def _indeksitiedosto(polku: str) -> Path:
+    nimi = hashlib.sha256(polku.encode('utf-8', 'surrogateescape')).hexdigest()[:32]
+    return asetukset().valimuisti_hakemisto / "riviindeksi" / f"{nimi}.idx"
+
+
+def _rakenna(data) -> Tuple[array, int]:
+    siirtymat = array('Q', [0])
+    koko = len(data)
+    kohta = data.find(b'\n')
+    while kohta != -1:
+        siirtymat.append(kohta + 1)
+        kohta = data.find(b'\n', kohta + 1)
+    if siirtymat[-1] != koko:
+        siirtymat.append(koko)
+
+    liput = NUL_TAVU if data.find(b'\0') != -1 else 0
+    dekooderi = codecs.getincrementaldecoder('utf-8')()
+    try:
+        for alku in range(0, koko, 1 << 20):
+            dekooderi.decode(data[alku:alku + (1 << 20)])
+        dekooderi.decode(b'', final=True)
+    except UnicodeDecodeError:
+        liput |= EI_UTF8
+    return siirtymat, liput
+
+
+def _lue_tallennettu(idx: Path, sormenjalki: Tuple[int, int, int]):
+    """Palauta (siirtymät, liput, kartta) tallennetusta indeksistä, jos se on ajan tasalla."""
+    try:
+        with open(idx, 'rb') as f:
+            kartta = mmap.mmap(f.fileno(), 0, access=mmap.ACCESS_READ)
+    except (OSError, ValueError):
+        return None
+    try:
+        taika, versio, liput, koko, mtime_ns, inode, rivit = _OTSAKE.unpack_from(kartta, 0)
+        if (taika, versio) != (_INDEKSI_TAIKA, _INDEKSI_VERSIO):
+            raise ValueError("tuntematon indeksi")
+        if (koko, mtime_ns, inode) != sormenjalki:
+            raise ValueError("vanhentunut indeksi")
+        if len(kartta) != _OTSAKE.size + (rivit + 1) * 8:
+            raise ValueError("katkennut indeksi")
+    except (ValueError, struct.error):
+        kartta.close()
+        return None
+    return memoryview(kartta)[_OTSAKE.size:].cast('Q'), liput, kartta
+
+
+def _tallenna(idx: Path, sormenjalki: Tuple[int, int, int], siirtymat: array, liput: int) -> None:
+    try:
+        idx.parent.mkdir(parents=True, exist_ok=True)
+        tmp = idx.with_name(idx.name + f".{os.getpid()}.tmp")
+        with open(tmp, 'wb') as f:
+            f.write(_OTSAKE.pack(_INDEKSI_TAIKA, _INDEKSI_VERSIO, liput, *sormenjalki, len(siirtymat) - 1))
+            siirtymat.tofile(f)
+        os.replace(tmp, idx)
+    except OSError:
+        # Indeksi on vain nopeutus; se voidaan rakentaa uudelleen
+        pass
+
+
+def _avaa(polku: str, st: os.stat_result) -> RiviIndeksi:
+    sormenjalki = _sormenjalki(st)
+    with open(polku, 'rb') as f:
+        data = mmap.mmap(f.fileno(), 0, access=mmap.ACCESS_READ) if st.st_size else b""
+    idx = _indeksitiedosto(polku)
+    tallennettu = _lue_tallennettu(idx, sormenjalki)
+    kartta = None
+    if tallennettu is None:
+        siirtymat, liput = _rakenna(data)
+        _tallenna(idx, sormenjalki, siirtymat, liput)
+    else:
+        siirtymat, liput, kartta = tallennettu
+    return RiviIndeksi(polku, sormenjalki, data, siirtymat, liput, kartta)
+
+
+# realpath -> indeksi, vähiten äskettäin käytetty ensin
+_AVOIMET: "OrderedDict[str, RiviIndeksi]" = OrderedDict()
+_AVOIMET_LUKKO = threading.Lock()
+
+
+def rivi_indeksi(polku: str) -> RiviIndeksi:
+    """Palauta tiedoston jaettu indeksi; avaa tai rakentaa sen tarvittaessa.
+
+    Heittää `OSError`-poikkeuksen, jos tiedostoa ei voi lukea.
+    """
+    avain = os.path.realpath(polku)
+    st = os.stat(avain)
+    with _AVOIMET_LUKKO:
+        indeksi = _AVOIMET.get(avain)
+        if indeksi is not None and indeksi.sormenjalki == _sormenjalki(st):
+            _AVOIMET.move_to_end(avain)
+            return indeksi
+        if indeksi is not None:
+            # Tiedosto muuttui: vanha kartta suljetaan (tai vapautuu käytön päätyttyä)
+            indeksi.sulje()
+        indeksi = _AVOIMET[avain] = _avaa(avain, st)
+        _AVOIMET.move_to_end(avain)
+        while len(_AVOIMET) > asetukset().riviindeksi_avoimet:
+            _, vanha = _AVOIMET.popitem(last=False)
+            vanha.sulje()
+        return indeksi
+
@@ -0,0 +1,90 @@
+"""Opiskelijan ja oikeiden komentojen tarkistus ja ajo."""
+import locale
+from typing import Any, Dict
+
+from . import mittarit
+from .hiekkalaatikko import AIKARAJA, AjonTulos, aja_rajoitetusti, aja_rajoitetusti_async
+from .komentorivi import TuetumatonKomento, jasenna_putki
+from .konfiguraatio import asetukset
+from .profilointi import profiloi_ajo
+
+
+def turvallinen_komento(cmd: str) -> bool:
+    """Tarkista, että komento käyttää vain sallittuja ohjelmia.
+
+    Sallitaan putkitetut komennot (esim. "grep ... | wc -l") sekä `< tiedosto`
+    ja `2>/dev/null`. Tarkistus käyttää samaa jäsennystä kuin ajo
+    (`komentorivi.jasenna_putki`), joten ketjutus (`;`, `&&`), korvaukset ja
+    muut uudelleenohjaukset hylätään, ja jokaisen vaiheen ohjelman on oltava
+    sallittujen listalla.
+    """
+    try:
+        vaiheet = jasenna_putki(cmd)
+    except TuetumatonKomento:
+        if mittarit.MITTARIT:
+            mittarit.kasvata("linuxcli_rejected_commands_total", reason="jasennys")
+        return False
+    sallitut = asetukset().sallitut_komennot
+    if all(v.argv[0] in sallitut for v in vaiheet):
+        return True
+    if mittarit.MITTARIT:
+        mittarit.kasvata("linuxcli_rejected_commands_total", reason="ohjelma")
+    return False
+
+
+def aja_komento(cmd, rooli: str = "student"):
+    with profiloi_ajo(rooli, cmd) as mittaus:
+        tulos = _aja_komento(cmd, mittaus)
+        mittaus["stdout_lines"] = len(tulos.splitlines())
+        return tulos
+
+
+def _aja_komento(cmd: str, mittaus: Dict[str, Any]) -> str:
+    if asetukset().suoritusmoottori == "inprocess":
+        from .moottori import MoottorinAikakatkaisu, TuetumatonKomento, aja_sisaisesti
+        try:
+            raaka = ''.join(aja_sisaisesti(cmd))
+            mittaus["engine"] = "inprocess"
+            mittaus["stdout_bytes"] = len(raaka.encode('utf-8', 'surrogateescape'))
+            return raaka.strip()
+        except TuetumatonKomento:
+            pass  # ajetaan oikealla ohjelmalla alla
+        except MoottorinAikakatkaisu as e:
+            mittaus["timed_out"] = True
+            return f"(virhe: {e})"
+    try:
+        tulos = aja_rajoitetusti(cmd)
+    except Exception as e:
+        return f"(virhe: {e})"
+    return _tulos_tekstiksi(tulos, mittaus)
+
+
+def _tulos_tekstiksi(tulos: AjonTulos, mittaus: Dict[str, Any]) -> str:
+    mittaus["stdout_bytes"] = len(tulos.stdout)
+    if tulos.raja:
+        mittaus["limit"] = tulos.raja
+        mittaus["timed_out"] = tulos.raja == AIKARAJA
+        return f"(virhe: raja ylittyi: {tulos.raja})"
+    try:
+        # Sama dekoodaus kuin subprocess.run(..., text=True)
+        stdout = tulos.stdout.decode(locale.getpreferredencoding(False))
+    except UnicodeDecodeError as e:
+        return f"(virhe: {e})"
+    # Palauta stdout ilman loppurivejä
+    return stdout.replace('\r\n', '\n').replace('\r', '\n').strip()
+
+
+async def aja_komento_async(cmd: str, rooli: str = "student") -> str:
+    """Kuten `aja_komento`, mutta asyncio-aliprosessina (perutettavissa)."""
+    if asetukset().suoritusmoottori == "inprocess":
+        import asyncio
+        # Sisäinen moottori on synkroninen; ajetaan säikeessä
+        return await asyncio.to_thread(aja_komento, cmd, rooli)
+    with profiloi_ajo(rooli, cmd) as mittaus:
+        try:
+            tulos = await aja_rajoitetusti_async(cmd)
+        except (OSError, TuetumatonKomento) as e:
+            return f"(virhe: {e})"
+        teksti = _tulos_tekstiksi(tulos, mittaus)
+        mittaus["stdout_lines"] = len(teksti.splitlines())
+        return teksti
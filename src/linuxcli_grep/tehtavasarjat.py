@@ -0,0 +1,122 @@
+"""Tehtäväsarjojen rekisteri (esim. grep, awk, sed).
+
+Sarjat määritellään konfiguraation `task_sets`-kentässä tunnisteen mukaan:
+
+    "task_sets": {
+      "awk": {"tasks_file": "data/tasks/awk-tehtavat.txt",
+              "allowed_commands": ["awk", "sort"], "timeout_seconds": 5,
+              "data": ["data/users.csv"]}
+    }
+
+Puuttuvat kentät periytyvät konfiguraation ylätason arvoista. Jos
+`task_sets` puuttuu, ainoa sarja on `default_task_set` ylätason arvoilla.
+
+Rekisteri ei lue tehtävätiedostoja: sarjan kuvaus luodaan vasta, kun sitä
+pyydetään, ja sen tehtävät jäsennetään (tai nippu avataan) vasta
+`tehtavat()`-kutsulla ja pidetään muistissa. Sarjan valinta ei siis
+kallistu sarjojen määrän kasvaessa.
+
+`valitse()` asettaa valitun sarjan tehtävätiedoston, sallitut komennot,
+aikarajan ja tulostiedoston asetuksiin, joten muu ohjelma käyttää niitä
+kuten ennenkin. Oletussarjan tila on tila.json:n ylätasolla kuten
+ennenkin; muiden sarjojen tehtävien avaimet ovat muotoa `<sarja>:<numero>`
+(ks. `tila.tehtavan_avain`).
+"""
+from pathlib import Path
+from typing import Any, Dict, List, Optional, Sequence, Tuple
+
+from .konfiguraatio import asetukset
+from .tehtavat import lue_tehtavat
+
+
+class TuntematonSarja(KeyError):
+    """Konfiguraatiossa ei ole pyydettyä tehtäväsarjaa."""
+
+
+class TehtavaSarja:
+    def __init__(self, tunniste: str, maaritys: Dict[str, Any], oletukset: Dict[str, Any], oletussarja: bool):
+        self.tunniste = tunniste
+        self.tiedosto: str = maaritys.get("tasks_file", oletukset["tehtavat_tiedosto"])
+        self.sallitut_komennot: Tuple[str, ...] = tuple(
+            maaritys.get("allowed_commands", oletukset.get("allowed_commands", [])))
+        self.aikaraja_s = int(maaritys.get("timeout_seconds", oletukset.get("timeout_seconds", 3)))
+        self.data: List[str] = list(maaritys.get("data", []))
+        # Oletussarjan tulokset kirjoitetaan samaan paikkaan kuin ennenkin
+        oletustulos = Path(oletukset["results_file"])
+        if not oletussarja:
+            oletustulos = oletustulos.with_name(f"{oletustulos.stem}-{tunniste}{oletustulos.suffix}")
+        self.tulostiedosto: str = maaritys.get("results_file", str(oletustulos))
+        self.tila_etuliite = "" if oletussarja else f"{tunniste}:"
+        self._tehtavat: Optional[Sequence] = None
+
+    def tehtavat(self) -> Sequence:
+        """Sarjan tehtävät; jäsennetään ensimmäisellä kutsulla."""
+        if self._tehtavat is None:
+            self._tehtavat = lue_tehtavat(self.tiedosto)
+        return self._tehtavat
+
+    def puuttuvat_datat(self) -> List[str]:
+        return [p for p in self.data if not Path(p).exists()]
+
+
+class Rekisteri:
+    def __init__(self, config: Dict[str, Any]):
+        self._config = config
+        self.oletus: str = config.get("default_task_set", "grep")
+        self._maaritykset: Dict[str, Dict[str, Any]] = config.get("task_sets") or {self.oletus: {}}
+        self._sarjat: Dict[str, TehtavaSarja] = {}
+
+    def tunnisteet(self) -> List[str]:
+        return list(self._maaritykset)
+
+    def sarja(self, tunniste: Optional[str] = None) -> TehtavaSarja:
+        tunniste = tunniste or self.oletus
+        sarja = self._sarjat.get(tunniste)
+        if sarja is None:
+            maaritys = self._maaritykset.get(tunniste)
+            if maaritys is None:
+                raise TuntematonSarja(tunniste)
+            sarja = self._sarjat[tunniste] = TehtavaSarja(
+                tunniste, maaritys, self._config, tunniste == self.oletus)
+        return sarja
+
+
+_REKISTERI: Optional[Rekisteri] = None
+_VALITTU: Optional[TehtavaSarja] = None
+
+
+def rekisteri() -> Rekisteri:
+    global _REKISTERI
+    if _REKISTERI is None:
+        _REKISTERI = Rekisteri(asetukset().config)
+    return _REKISTERI
+
+
+def valitse(tunniste: Optional[str] = None) -> TehtavaSarja:
+    """Valitse sarja (oletus: `default_task_set`) ja päivitä asetukset sen mukaan."""
+    global _VALITTU
+    sarja = rekisteri().sarja(tunniste)
+    a = asetukset()
+    a.tehtavasarja = sarja.tunniste
+    a.tehtavat_tiedosto = sarja.tiedosto
+    a.sallitut_komennot = sarja.sallitut_komennot
+    a.timeout_seconds = sarja.aikaraja_s
+    a.results_file = sarja.tulostiedosto
+    a.tila_etuliite = sarja.tila_etuliite
+    _VALITTU = sarja
+    return sarja
+
+
+def valittu() -> Optional[TehtavaSarja]:
+    return _VALITTU
+
+
+def avaa_tehtavat() -> Sequence:
+    """Valitun sarjan tehtävät (jäsennetään kerran).
+
+    Jos sarjaa ei ole valittu (esim. työkalut, jotka muuttavat asetuksia
+    itse), tehtävät luetaan asetusten `tehtavat_tiedosto`-tiedostosta.
+    """
+    if _VALITTU is None:
+        return lue_tehtavat(asetukset().tehtavat_tiedosto)
+    return _VALITTU.tehtavat()
@@ -0,0 +1,244 @@
+"""Tehtävätiedoston jäsennys ja käännetty tehtävänippu."""
+import base64
+import hashlib
+import json
+import mmap
+import os
+import struct
+from collections.abc import Callable, Sequence
+from pathlib import Path
+from typing import Any, Dict, List, Optional, Tuple
+
+
+def jasenna_tehtavat(teksti: str) -> List[Tuple[str, str]]:
+    """Jäsennä tehtävätiedoston (dekoodattu) sisältö.
+
+    Tehtäväformaatti: kuvaus aloitetaan merkillä '#' ja seuraava
+    ei-tyhjä rivi on oikea komento. Kommenttirivit alkavat '---' ja ohitetaan.
+    Palauttaa listan `(kuvaus, oikea_komento)` -tupleja.
+    """
+    lines = teksti.splitlines()
+    tehtavat: List[Tuple[str, str]] = []
+
+    i = 0
+    n = len(lines)
+    while i < n:
+        line = lines[i].strip()
+        if not line:
+            i += 1
+            continue
+
+        # Ohita kommenttirivit jotka alkavat '---'
+        if line.startswith('---'):
+            i += 1
+            continue
+
+        # Uusi muoto: kuvaus-rivi alkaa '#'
+        if line.startswith('#'):
+            kuvaus = line.lstrip('#').strip()
+            # etsi seuraava ei-tyhjä rivi komennoksi
+            j = i + 1
+            while j < n and not lines[j].strip():
+                j += 1
+            oikea = lines[j].strip() if j < n else ""
+            tehtavat.append((kuvaus, oikea))
+            i = j + 1
+            continue
+
+        # Muoto: kuvaus on jo käsitelty yllä (#-rivinä); muuten ohitetaan
+        i += 1
+
+    return tehtavat
+
+
+def dekoodaa_tehtavat(raw: str) -> str:
+    # Yritä dekoodata base64:lla, mutta jos epäonnistuu, käytä raakatekstiä
+    try:
+        return base64.b64decode(raw).decode('utf-8')
+    except Exception:
+        return raw
+
+
+def lue_tehtavat(tiedosto: str) -> Sequence:
+    """Lue tehtävät tiedostosta.
+
+    Tiedosto voi olla base64-enkoodattu tai tavallinen tekstitiedosto.
+    Jos vieressä on ajantasainen käännetty nippu (`tehtavat.txt.bundle`),
+    tehtävät luetaan siitä tarvittaessa yksi kerrallaan ilman jäsennystä.
+    Palauttaa sekvenssin `(kuvaus, oikea_komento)` -tupleja.
+    """
+    p = Path(tiedosto)
+    if not p.exists():
+        return []
+
+    nippu = TehtavaNippu.avaa(nipun_polku(p), p)
+    if nippu is not None:
+        return nippu
+
+    return jasenna_tehtavat(dekoodaa_tehtavat(p.read_text(encoding='utf-8')))
+
+
+# Tiedostomuoto (pienet tavut ensin):
+#   otsake:  taika b"LCGB", versio (u16), varattu (u16),
+#            lähdetiedoston sha256 (32 t), lähdetiedoston koko (u64),
+#            tehtävien määrä N (u32), tietueosan sha256 (32 t),
+#            lähdetiedoston mtime_ns (i64, versiosta 3 alkaen)
+#   indeksi: N+1 kappaletta u64-siirtymiä tietueosan alusta
+#   tietueet: base64-koodattu JSON-lista [kuvaus, oikea, odotettu] per tehtävä
+# Tietueet on koodattu kuten .enc-tiedostokin, jotta vastaukset eivät näy
+# suoraan esim. grepillä. `odotettu` on oikean komennon käännösaikana
+# laskettu tuloste ja sen sormenjälki (ks. `valimuisti.laske_odotettu`) tai
+# null; versiossa 1 tietueessa on vain kuvaus ja oikea komento. Nippua
+# itseään lukevien komentojen tulosteet on laskettu valmiista nipusta.
+# Avattaessa lähdetiedosto tiivistetään vain, jos sen koko tai mtime_ns
+# poikkeaa otsakkeeseen tallennetusta (versiot 1-2 tiivistetään aina).
+
+NIPPU_TAIKA = b"LCGB"
+NIPPU_VERSIO = 3
+_NIPPU_VERSIOT = (1, 2, 3)
+_NIPPU_OTSAKE = struct.Struct("<4sHH32sQI32s")
+_NIPPU_OTSAKE_V3 = struct.Struct("<4sHH32sQI32sq")
+_NIPPU_SIIRTYMA = struct.Struct("<Q")
+
+
+def nipun_polku(tehtavatiedosto: Path) -> Path:
+    """`tehtavat.txt.enc` ja `tehtavat.txt` -> `tehtavat.txt.bundle`."""
+    p = Path(tehtavatiedosto)
+    if p.suffix == ".enc":
+        p = p.with_suffix("")
+    return p.with_name(p.name + ".bundle")
+
+
+def _sha256_tiedosto(polku: Path) -> bytes:
+    h = hashlib.sha256()
+    with open(polku, 'rb') as f:
+        for lohko in iter(lambda: f.read(1 << 16), b''):
+            h.update(lohko)
+    return h.digest()
+
+
+def kirjoita_nippu(lahde: Path, kohde: Optional[Path] = None,
+                   odotetut: Optional[Callable[[List[Tuple[str, str]]], List[Optional[Dict[str, Any]]]]] = None) -> Path:
+    """Jäsennä tehtävätiedosto ja kirjoita siitä käännetty nippu.
+
+    `odotetut` saa jäsennetyt tehtävät ja palauttaa kullekin odotetun
+    tulosteen tietueen (tai None); ne tallennetaan nippuun.
+    """
+    lahde = Path(lahde)
+    kohde = Path(kohde) if kohde else nipun_polku(lahde)
+    raaka = lahde.read_bytes()
+    lahde_mtime = lahde.stat().st_mtime_ns
+    tehtavat = jasenna_tehtavat(dekoodaa_tehtavat(raaka.decode('utf-8')))
+    odotettu = odotetut(tehtavat) if odotetut is not None else [None] * len(tehtavat)
+
+    tietueet = [
+        base64.b64encode(json.dumps([kuvaus, oikea, o], ensure_ascii=False).encode('utf-8'))
+        for (kuvaus, oikea), o in zip(tehtavat, odotettu)
+    ]
+    siirtymat = [0]
+    for t in tietueet:
+        siirtymat.append(siirtymat[-1] + len(t))
+    data = b"".join(tietueet)
+
+    otsake = _NIPPU_OTSAKE_V3.pack(
+        NIPPU_TAIKA, NIPPU_VERSIO, 0,
+        hashlib.sha256(raaka).digest(), len(raaka),
+        len(tehtavat), hashlib.sha256(data).digest(), lahde_mtime,
+    )
+    indeksi = b"".join(_NIPPU_SIIRTYMA.pack(s) for s in siirtymat)
+    tmp = kohde.with_name(kohde.name + ".tmp")
+    tmp.write_bytes(otsake + indeksi + data)
+    os.replace(tmp, kohde)
+    return kohde
+
+
+class TehtavaNippu(Sequence):
+    """Muistikartoitettu, laiskasti dekoodattava tehtävänippu.
+
+    Avaaminen lukee vain otsakkeen; yksittäinen tehtävä dekoodataan vasta
+    kun sitä pyydetään (siirtymäindeksin kautta).
+    """
+
+    def __init__(self, kartta: mmap.mmap, maara: int, lahde_sha256: bytes,
+                 otsakkeen_koko: int = _NIPPU_OTSAKE_V3.size, polku: Optional[Path] = None):
+        self.polku = polku
+        self._kartta = kartta
+        self._maara = maara
+        self._indeksi_alku = otsakkeen_koko
+        self._data_alku = self._indeksi_alku + (maara + 1) * _NIPPU_SIIRTYMA.size
+        self._valimuisti: Dict[int, Tuple[str, str]] = {}
+        self._odotetut: Dict[int, Optional[Dict[str, Any]]] = {}
+        self.lahde_sha256 = lahde_sha256.hex()
+
+    @classmethod
+    def avaa(cls, polku: Path, lahde: Path) -> Optional["TehtavaNippu"]:
+        """Avaa nippu, jos se on olemassa ja vastaa lähdetiedostoa; muuten None."""
+        try:
+            with open(polku, 'rb') as f:
+                kartta = mmap.mmap(f.fileno(), 0, access=mmap.ACCESS_READ)
+        except (OSError, ValueError):
+            return None
+        try:
+            taika, versio, _, lahde_sha, lahde_koko, maara, _ = _NIPPU_OTSAKE.unpack_from(kartta, 0)
+            if taika != NIPPU_TAIKA or versio not in _NIPPU_VERSIOT:
+                raise ValueError("tuntematon nippu")
+            otsake = _NIPPU_OTSAKE_V3 if versio >= 3 else _NIPPU_OTSAKE
+            lahde_mtime = _NIPPU_OTSAKE_V3.unpack_from(kartta, 0)[-1] if versio >= 3 else None
+            tiedot = lahde.stat()
+            if tiedot.st_size != lahde_koko:
+                raise ValueError("nippu ei vastaa lähdetiedostoa")
+            # Sama koko ja mtime_ns: lähde on sama kuin käännettäessä
+            if tiedot.st_mtime_ns != lahde_mtime and _sha256_tiedosto(lahde) != lahde_sha:
+                raise ValueError("nippu ei vastaa lähdetiedostoa")
+            data_alku = otsake.size + (maara + 1) * _NIPPU_SIIRTYMA.size
+            (loppu,) = _NIPPU_SIIRTYMA.unpack_from(kartta, data_alku - _NIPPU_SIIRTYMA.size)
+            if data_alku + loppu != len(kartta):
+                raise ValueError("katkennut nippu")
+        except (ValueError, struct.error, OSError):
+            kartta.close()
+            return None
+        return cls(kartta, maara, lahde_sha, otsake.size, Path(polku))
+
+    def __len__(self) -> int:
+        return self._maara
+
+    def __getitem__(self, i):
+        if isinstance(i, slice):
+            return [self[j] for j in range(*i.indices(self._maara))]
+        if i < 0:
+            i += self._maara
+        if not 0 <= i < self._maara:
+            raise IndexError(i)
+        tehtava = self._valimuisti.get(i)
+        if tehtava is None:
+            tehtava = self._lue(i)
+        return tehtava
+
+    def odotettu(self, i: int) -> Optional[Dict[str, Any]]:
+        """Tehtävän `i` nippuun tallennettu odotettu tuloste; None, jos sitä ei ole.
+
+        Nippua itseään lukevan komennon tuloste (tietueen "nippu") kelpaa
+        vain tästä samasta nipusta.
+        """
+        if i not in self._valimuisti:
+            self[i]  # dekoodaa tietueen
+        odotettu = self._odotetut.get(i)
+        if odotettu and "nippu" in odotettu and (
+            self.polku is None or os.path.abspath(odotettu["nippu"]) != os.path.abspath(self.polku)
+        ):
+            return None
+        return odotettu
+
+    def _lue(self, i: int) -> Tuple[str, str]:
+        kohta = self._indeksi_alku + i * _NIPPU_SIIRTYMA.size
+        alku, loppu = struct.unpack_from("<QQ", self._kartta, kohta)
+        raaka = self._kartta[self._data_alku + alku:self._data_alku + loppu]
+        tietue = json.loads(base64.b64decode(raaka).decode('utf-8'))
+        tehtava = self._valimuisti[i] = (tietue[0], tietue[1])
+        self._odotetut[i] = tietue[2] if len(tietue) > 2 else None
+        return tehtava
+
+
+def tehtavan_odotettu(tehtavat: Sequence, i: int) -> Optional[Dict[str, Any]]:
+    """Tehtävän `i` käännösaikainen odotettu tuloste, jos tehtävät on luettu nipusta."""
+    return tehtavat.odotettu(i) if isinstance(tehtavat, TehtavaNippu) else None
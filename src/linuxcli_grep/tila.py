@@ -0,0 +1,184 @@
+"""Opiskelijan tilan (tila.json + journal) ja results.json-tiedoston käsittely."""
+import json
+import os
+from pathlib import Path
+from typing import Any, Dict, Optional
+
+from .konfiguraatio import asetukset
+
+
+# Tila tallennetaan kahteen tiedostoon: `tila.json` on tilannevedos (sama
+# muoto kuin ennenkin) ja `tila.json.journal` sisältää vedoksen jälkeiset
+# muutokset, yksi JSON-rivi per muutos. Jokainen vastaus maksaa siis yhden
+# lyhyen lisäyksen eikä koko tiedoston uudelleenkirjoitusta. Journal
+# tiivistetään vedokseen `state_compact_every` muutoksen välein sekä
+# session lopussa; vedos kirjoitetaan atomisesti (väliaikaistiedosto + rename).
+
+_journal_rivit = 0
+
+
+def tehtavan_avain(i: int) -> str:
+    """Tehtävän `i` avain tila.json:ssa valitussa tehtäväsarjassa."""
+    return f"{asetukset().tila_etuliite}{i}"
+
+
+def journal_polku(polku: Path) -> Path:
+    return polku.with_name(polku.name + ".journal")
+
+
+def lataa_tila(polku: Optional[Path] = None):
+    global _journal_rivit
+    p = Path(polku or asetukset().tila_tiedosto)
+    tila: Dict[str, Any] = {}
+    if p.exists():
+        try:
+            tila = json.loads(p.read_text(encoding='utf-8'))
+        except Exception:
+            tila = {}
+        if not isinstance(tila, dict):
+            tila = {}
+
+    # Toista vedoksen jälkeiset muutokset. Kesken jäänyt rivi (esim.
+    # kaatuminen kirjoituksen aikana) ja muut kuin {"k": ..., "v": ...}
+    # -tietueet ohitetaan.
+    rivit = 0
+    j = journal_polku(p)
+    if j.exists():
+        try:
+            with open(j, encoding='utf-8') as f:
+                for rivi in f:
+                    try:
+                        muutos = json.loads(rivi)
+                    except ValueError:
+                        continue
+                    if not isinstance(muutos, dict) or not isinstance(muutos.get("k"), str) or "v" not in muutos:
+                        continue
+                    tila[muutos["k"]] = muutos["v"]
+                    rivit += 1
+        except OSError:
+            pass
+    if polku is None:
+        _journal_rivit = rivit
+    return tila
+
+
+def _kirjoita_atomisesti(p: Path, sisalto: str) -> None:
+    tmp = p.with_name(p.name + ".tmp")
+    with open(tmp, 'w', encoding='utf-8') as f:
+        f.write(sisalto)
+        if asetukset().tila_fsync:
+            f.flush()
+            os.fsync(f.fileno())
+    os.replace(tmp, p)
+    if asetukset().tila_fsync and hasattr(os, "O_DIRECTORY"):
+        fd = os.open(p.parent, os.O_DIRECTORY)
+        try:
+            os.fsync(fd)
+        finally:
+            os.close(fd)
+
+
+def tallenna_tila(tila):
+    """Kirjoita koko tila vedokseksi ja tyhjennä journal."""
+    global _journal_rivit
+    p = Path(asetukset().tila_tiedosto)
+    p.parent.mkdir(parents=True, exist_ok=True)
+    _kirjoita_atomisesti(p, json.dumps(tila, ensure_ascii=False, indent=2))
+    # Journal poistetaan vasta kun vedos on paikallaan
+    try:
+        os.remove(journal_polku(p))
+    except FileNotFoundError:
+        pass
+    _journal_rivit = 0
+
+
+def tiivista_journal(tila: Dict[str, Any]) -> bool:
+    """Kirjoita tila vedokseksi, jos journalissa on muutoksia; True, jos kirjoitettiin.
+
+    Kutsutaan aina session lopussa (myös Ctrl-C:llä ja syötteen loppuessa)
+    ja ennen arviointia, jotta tila.json on yksin ajan tasalla: journal ei
+    ole versionhallinnassa, joten sinne jääneet vastaukset eivät päätyisi
+    palautukseen.
+    """
+    if _journal_rivit == 0 and not journal_polku(Path(asetukset().tila_tiedosto)).exists():
+        return False
+    tallenna_tila(tila)
+    return True
+
+
+def kirjaa_tila(tila: Dict[str, Any], avain: str) -> None:
+    """Lisää yhden avaimen muutos journaliin; tiivistä tarvittaessa."""
+    global _journal_rivit
+    p = Path(asetukset().tila_tiedosto)
+    if _journal_rivit + 1 >= asetukset().tila_tiivistysvali or not p.exists():
+        tallenna_tila(tila)
+        return
+    rivi = json.dumps({"k": avain, "v": tila.get(avain)}, ensure_ascii=False, separators=(',', ':'))
+    with open(journal_polku(p), 'a+b') as f:
+        # Kesken jäänyt edellinen rivi päätetään, jotta tämä tietue ei liity siihen
+        alku = b""
+        if f.seek(0, os.SEEK_END):
+            f.seek(-1, os.SEEK_END)
+            if f.read(1) != b"\n":
+                alku = b"\n"
+        f.write(alku + rivi.encode('utf-8') + b"\n")
+        if asetukset().tila_fsync:
+            f.flush()
+            os.fsync(f.fileno())
+    _journal_rivit += 1
+
+
+def paivita_results_opiskelijatiedot(opiskelijatiedot: Dict[str, str]) -> None:
+    """Kirjoita nimi ja opiskelijanumero results.json-tiedostoon."""
+    p = Path(asetukset().results_file)
+    p.parent.mkdir(parents=True, exist_ok=True)
+
+    nykyinen: Dict[str, Any] = {}
+    if p.exists():
+        try:
+            nykyinen = json.loads(p.read_text(encoding='utf-8'))
+            if not isinstance(nykyinen, dict):
+                nykyinen = {}
+        except Exception:
+            nykyinen = {}
+
+    nykyinen["nimi"] = opiskelijatiedot.get("nimi", "")
+    nykyinen["opiskelijanumero"] = opiskelijatiedot.get("opiskelijanumero", "")
+    p.write_text(json.dumps(nykyinen, ensure_ascii=False, indent=2), encoding='utf-8')
+
+
+def varmista_opiskelijatiedot(tila: Dict[str, Any], kysy_kayttajalta: bool = False) -> Dict[str, Any]:
+    """Varmista, että tilassa on opiskelijan nimi ja opiskelijanumero."""
+    nimi = tila.get("nimi")
+    opiskelijanumero = tila.get("opiskelijanumero")
+
+    if not kysy_kayttajalta:
+        opiskelijatiedot = {
+            "nimi": nimi or "",
+            "opiskelijanumero": opiskelijanumero or ""
+        }
+        paivita_results_opiskelijatiedot(opiskelijatiedot)
+        return opiskelijatiedot
+
+    if not nimi:
+        while True:
+            nimi = input("👤 Anna nimesi: ").strip()
+            if nimi:
+                tila["nimi"] = nimi
+                break
+            print("⚠️  Nimi ei voi olla tyhjä.")
+
+    if not opiskelijanumero:
+        while True:
+            opiskelijanumero = input("🆔 Anna opiskelijanumerosi: ").strip()
+            if opiskelijanumero:
+                tila["opiskelijanumero"] = opiskelijanumero
+                break
+            print("⚠️  Opiskelijanumero ei voi olla tyhjä.")
+
+    opiskelijatiedot = {
+        "nimi": tila.get("nimi", ""),
+        "opiskelijanumero": tila.get("opiskelijanumero", "")
+    }
+    paivita_results_opiskelijatiedot(opiskelijatiedot)
+    return opiskelijatiedot
@@ -0,0 +1,446 @@
+"""Levylle tallennetut välimuistit: viitetulosteet ja vertailujen tuomiot.
+
+Lisäksi tehtävänippuun käännösaikana tallennetut odotetut tulosteet
+(`laske_odotettu`), joiden ansiosta oikeaa komentoa ei tarvitse ajaa
+lainkaan, kun data on ennallaan.
+"""
+import hashlib
+import json
+import os
+import threading
+from collections import OrderedDict
+from pathlib import Path
+from typing import Any, Callable, Dict, FrozenSet, List, Optional, Tuple
+
+from . import mittarit, profilointi
+from .komentorivi import TuetumatonKomento, Vaihe, jasenna_putki
+from .konfiguraatio import asetukset
+from .profilointi import profiloi_ajo
+from .suoritus import aja_komento, aja_komento_async
+from .vertailu import VERTAILUN_VERSIO, VertailunTulos, joukon_tiiviste, tulosteen_tiivisteet, vertaa_virtana
+
+
+# Sisällön tiivisteet muistissa avaimella (polku, koko, mtime), jotta samaa
+# tiedostoa ei tarvitse lukea uudelleen saman ajon aikana.
+_TIIVISTEET: Dict[Tuple[str, int, int], str] = {}
+
+
+def tiedoston_sormenjalki(polku: Path) -> Dict[str, Any]:
+    """Palauta tiedoston sormenjälki: koko, mtime ja sisällön sha256."""
+    st = polku.stat()
+    avain = (str(polku), st.st_size, st.st_mtime_ns)
+    tiiviste = _TIIVISTEET.get(avain)
+    if tiiviste is None:
+        h = hashlib.sha256()
+        with open(polku, 'rb') as f:
+            for lohko in iter(lambda: f.read(1 << 16), b''):
+                h.update(lohko)
+        tiiviste = h.hexdigest()
+        _TIIVISTEET[avain] = tiiviste
+    return {"koko": st.st_size, "mtime_ns": st.st_mtime_ns, "sha256": tiiviste}
+
+
+def komennon_tiedostot(cmd: str) -> List[Path]:
+    """Päättele komentoriviltä tiedostot, joita komento lukee.
+
+    Komento jäsennetään kuten ajossa (`komentorivi.jasenna_putki`, joka myös
+    laajentaa glob-kuviot, esim. `./data/*`). Jokainen argumentti, joka ei
+    ole optio, ja `<`-syöte otetaan mukaan, jos se on olemassa oleva
+    tiedosto; hakemistoista (esim. `grep -R`) mukaan otetaan kaikki niiden
+    tiedostot.
+    """
+    try:
+        return _vaiheiden_tiedostot(jasenna_putki(cmd))
+    except TuetumatonKomento:
+        return []
+
+
+def _vaiheiden_tiedostot(vaiheet: List[Vaihe]) -> List[Path]:
+    tiedostot = set()
+    for vaihe in vaiheet:
+        sanat = vaihe.argv[1:] + ([vaihe.syote] if vaihe.syote is not None else [])
+        for sana in sanat:
+            if not sana or sana.startswith('-'):
+                continue
+            p = Path(sana)
+            if p.is_file():
+                tiedostot.add(p)
+            elif p.is_dir():
+                tiedostot.update(q for q in p.rglob('*') if q.is_file())
+    return sorted(tiedostot)
+
+
+def _sormenjaljet(tiedostot: List[Path]) -> List[Any]:
+    return [[str(p), tiedoston_sormenjalki(p)] for p in tiedostot]
+
+
+def _koko(arvo: Any) -> int:
+    """Merkinnän koko tavuina välimuistitiedostossa."""
+    return len(json.dumps(arvo, ensure_ascii=False).encode('utf-8', 'surrogateescape'))
+
+
+class LevyValimuisti:
+    """Levylle JSON-tiedostoon tallennettu LRU-välimuisti.
+
+    Merkintöjen määrä on rajattu `maksimi`-arvoon ja niiden yhteiskoko
+    `maksimi_tavut`-arvoon (None = ei rajaa); vanhin käyttämätön merkintä
+    poistetaan ensin, eikä rajaa suurempaa merkintää tallenneta lainkaan.
+    Tiedosto kirjoitetaan jokaisen tallennuksen jälkeen, tai
+    `viivastetty`-tilassa vasta `kirjoita()`-kutsulla.
+    """
+
+    nimi = "levy"   # mittareiden `cache`-nimiö
+
+    def __init__(self, polku: Path, maksimi: int = 512, viivastetty: bool = False,
+                 maksimi_tavut: Optional[int] = None):
+        self.polku = polku
+        self.maksimi = max(1, maksimi)
+        self.maksimi_tavut = maksimi_tavut
+        self.viivastetty = viivastetty
+        self.osumat = 0
+        self.ohitukset = 0
+        self._lukko = threading.Lock()
+        self._merkinnat: "OrderedDict[str, Any]" = OrderedDict()
+        self._koot: Dict[str, int] = {}
+        self._tavut = 0
+        self._muuttunut = False
+        if polku.exists():
+            try:
+                data = json.loads(polku.read_text(encoding='utf-8'))
+                for avain, arvo in data.get("merkinnat", {}).items():
+                    self._lisaa(avain, arvo)
+            except Exception:
+                self._merkinnat.clear()
+                self._koot.clear()
+                self._tavut = 0
+            self._rajaa()
+
+    def hae(self, avain: str, kelpaa: Optional[Callable[[Any], bool]] = None) -> Optional[Any]:
+        """Hae merkintä; `kelpaa` voi hylätä vanhentuneen merkinnän (ohitus)."""
+        with self._lukko:
+            tulos = self._merkinnat.get(avain)
+            if tulos is None or (kelpaa is not None and not kelpaa(tulos)):
+                self.ohitukset += 1
+                if mittarit.MITTARIT:
+                    mittarit.kasvata("linuxcli_cache_lookups_total", cache=self.nimi, result="miss")
+                return None
+            self._merkinnat.move_to_end(avain)
+            self.osumat += 1
+            if mittarit.MITTARIT:
+                mittarit.kasvata("linuxcli_cache_lookups_total", cache=self.nimi, result="hit")
+            return tulos
+
+    def _lisaa(self, avain: str, tulos: Any) -> None:
+        self._poista(avain)
+        koko = _koko(tulos)
+        self._merkinnat[avain] = tulos
+        self._koot[avain] = koko
+        self._tavut += koko
+
+    def _poista(self, avain: str) -> None:
+        if avain in self._merkinnat:
+            del self._merkinnat[avain]
+            self._tavut -= self._koot.pop(avain)
+
+    def _rajaa(self) -> None:
+        while self._merkinnat and (
+            len(self._merkinnat) > self.maksimi
+            or (self.maksimi_tavut is not None and self._tavut > self.maksimi_tavut)
+        ):
+            self._poista(next(iter(self._merkinnat)))
+
+    def tallenna(self, avain: str, tulos: Any) -> None:
+        with self._lukko:
+            self._lisaa(avain, tulos)
+            if self.maksimi_tavut is not None and self._koot[avain] > self.maksimi_tavut:
+                # Liian suuri merkintä syrjäyttäisi koko välimuistin
+                self._poista(avain)
+            self._rajaa()
+            self._muuttunut = True
+            if not self.viivastetty:
+                self._kirjoita()
+
+    def kirjoita(self) -> None:
+        """Kirjoita viivästetyt muutokset levylle."""
+        with self._lukko:
+            if self._muuttunut:
+                self._kirjoita()
+
+    def _kirjoita(self) -> None:
+        try:
+            self.polku.parent.mkdir(parents=True, exist_ok=True)
+            tmp = self.polku.with_suffix(self.polku.suffix + ".tmp")
+            tmp.write_text(
+                json.dumps({"versio": 1, "merkinnat": self._merkinnat}, ensure_ascii=False),
+                encoding='utf-8',
+            )
+            os.replace(tmp, self.polku)
+            self._muuttunut = False
+        except OSError:
+            # Välimuisti on vain nopeutus; kirjoitusvirhe ei saa kaataa arviointia
+            pass
+
+    def tilasto(self) -> str:
+        return f"{self.osumat} osumaa, {self.ohitukset} ohitusta"
+
+    def __len__(self) -> int:
+        return len(self._merkinnat)
+
+    @property
+    def tavut(self) -> int:
+        return self._tavut
+
+
+class ViiteValimuisti(LevyValimuisti):
+    """Oikeiden komentojen tulosteiden välimuisti.
+
+    Avain muodostetaan komennon tekstistä ja kaikkien komennon lukemien
+    tiedostojen sormenjäljistä, joten datatiedoston muuttuminen mitätöi
+    merkinnän automaattisesti.
+    """
+
+    nimi = "reference"
+
+    @staticmethod
+    def avain(cmd: str) -> str:
+        raaka = json.dumps([cmd, _sormenjaljet(komennon_tiedostot(cmd))], ensure_ascii=False, sort_keys=True)
+        return hashlib.sha256(raaka.encode('utf-8')).hexdigest()
+
+
+class TuomioValimuisti(LevyValimuisti):
+    """Opiskelijoiden yhteinen välimuisti vertailujen tuomioille.
+
+    Avain muodostetaan tehtäväsarjasta, tehtävän numerosta, opiskelijan
+    komennon kanonisesta argv-muodosta (välilyönnit ja lainausmerkit eivät
+    vaikuta), komennon lukemien tiedostojen sormenjäljistä sekä vertailun
+    versiosta ja asetuksista. Merkintään tallennetaan viitetulosteen
+    rivijoukon tiiviste, ja merkintä kelpaa vain saman viitetulosteen
+    kanssa: tehtävän oikean komennon tai sen datan muuttuminen mitätöi sen.
+    """
+
+    nimi = "verdict"
+
+    @staticmethod
+    def avain(i: int, cmd: str) -> Optional[str]:
+        """Tuomion avain; None, jos komentoa ei voi jäsentää."""
+        try:
+            vaiheet = jasenna_putki(cmd)
+        except TuetumatonKomento:
+            return None
+        a = asetukset()
+        raaka = json.dumps(
+            [a.tehtavasarja, i, [list(v) for v in vaiheet], _sormenjaljet(_vaiheiden_tiedostot(vaiheet)),
+             a.suoritusmoottori, a.maksimi_tuloste, VERTAILUN_VERSIO],
+            ensure_ascii=False, sort_keys=True,
+        )
+        return hashlib.sha256(raaka.encode('utf-8')).hexdigest()
+
+    def hae_tuomio(self, avain: str, viite: FrozenSet[bytes]) -> Optional[Dict[str, Any]]:
+        """Palauta {"sama": bool, "syy": str}, jos tuomio on annettu samaa viitettä vastaan."""
+        viite_tiiviste = joukon_tiiviste(viite)
+        return self.hae(avain, lambda m: m.get("viite") == viite_tiiviste)
+
+    def tallenna_tuomio(self, avain: str, viite: FrozenSet[bytes], sama: bool, syy: str = "") -> None:
+        self.tallenna(avain, {"viite": joukon_tiiviste(viite), "sama": sama, "syy": syy})
+
+
+_VIITE_VALIMUISTI: Optional[ViiteValimuisti] = None
+
+
+_TUOMIO_VALIMUISTI: Optional[TuomioValimuisti] = None
+
+
+def viite_valimuisti() -> ViiteValimuisti:
+    global _VIITE_VALIMUISTI
+    if _VIITE_VALIMUISTI is None:
+        # Kirjoitetaan kerralla ajon lopussa (`kirjoita_valimuistit`), ei jokaisen ohituksen jälkeen
+        a = asetukset()
+        _VIITE_VALIMUISTI = ViiteValimuisti(
+            a.valimuisti_hakemisto / "viitetulokset.json", a.viite_valimuisti_koko,
+            viivastetty=True, maksimi_tavut=a.viite_valimuisti_tavut,
+        )
+    return _VIITE_VALIMUISTI
+
+
+def tuomio_valimuisti() -> TuomioValimuisti:
+    global _TUOMIO_VALIMUISTI
+    if _TUOMIO_VALIMUISTI is None:
+        # Tuomioita tallennetaan paljon (esim. eräarvioinnissa): kirjoitetaan kerralla
+        _TUOMIO_VALIMUISTI = TuomioValimuisti(
+            asetukset().valimuisti_hakemisto / "tuomiot.json", asetukset().tuomio_valimuisti_koko,
+            viivastetty=True,
+        )
+    return _TUOMIO_VALIMUISTI
+
+
+def kirjoita_valimuistit() -> None:
+    """Kirjoita avattujen välimuistien viivästetyt muutokset levylle."""
+    for valimuisti in (_VIITE_VALIMUISTI, _TUOMIO_VALIMUISTI):
+        if valimuisti is not None:
+            valimuisti.kirjoita()
+
+
+def tuomion_avain(i: int, cmd: str) -> Optional[str]:
+    try:
+        return tuomio_valimuisti().avain(i, cmd)
+    except OSError:
+        return None
+
+
+def _viite_avain(valimuisti: ViiteValimuisti, cmd: str) -> Optional[str]:
+    try:
+        return valimuisti.avain(cmd)
+    except OSError:
+        return None
+
+
+def _datan_sormenjaljet(cmd: str, ohita: Optional[str] = None) -> List[Any]:
+    # Ilman mtimeä: checkout tai kopiointi ei saa mitätöidä odotettua tulostetta.
+    # `ohita` on tehtävänippu, jota komento lukee (ks. `laske_odotettu`).
+    ohitettava = os.path.abspath(ohita) if ohita is not None else None
+    jaljet = []
+    for p in komennon_tiedostot(cmd):
+        if ohitettava is not None and os.path.abspath(p) == ohitettava:
+            continue
+        s = tiedoston_sormenjalki(p)
+        jaljet.append([str(p), s["koko"], s["sha256"]])
+    return jaljet
+
+
+# Kasvatetaan, jos sormenjäljen sisältö muuttuu: vanhat validoinnit ajetaan uudelleen
+_VALIDOINTI_VERSIO = 1
+
+
+def validoinnin_sormenjalki(student_cmd: str, oikea: str) -> Optional[str]:
+    """Tiiviste kaikesta, mistä tehtävän validointi riippuu.
+
+    Mukana ovat opiskelijan ja oikea komento sekä kummankin lukemien
+    tiedostojen koot ja sisältöjen tiivisteet (ilman mtimeä, kuten
+    `laske_odotettu`). None, jos tiedostoja ei voi lukea.
+    """
+    try:
+        raaka = json.dumps([_VALIDOINTI_VERSIO, student_cmd, oikea, _datan_sormenjaljet(student_cmd),
+                            _datan_sormenjaljet(oikea)], ensure_ascii=False)
+    except OSError:
+        return None
+    return hashlib.sha256(raaka.encode('utf-8')).hexdigest()
+
+
+def laske_odotettu(cmd: str, nippu: Optional[str] = None) -> Dict[str, Any]:
+    """Aja oikea komento ja palauta tehtävänippuun tallennettava tietue.
+
+    Tietueessa on kanoninen tuloste, sen rivijoukon tiiviste, rivien määrä
+    ja komennon lukemien datatiedostojen sormenjäljet. Jos ajo epäonnistuu
+    (esim. aikakatkaisu), tietueessa on vain "virhe".
+
+    Jos komento lukee nippua `nippu` itseään (esim. `grep -R ... ./data/*`),
+    nippu jätetään sormenjäljistä pois ja tietueeseen merkitään "nippu".
+    Tällainen tietue kelpaa vain, kun tuloste on laskettu valmiista
+    nipusta (ks. `tools/manage_tasks.py`).
+    """
+    data = _datan_sormenjaljet(cmd, nippu)
+    lukee_nippua = nippu is not None and len(data) != len(komennon_tiedostot(cmd))
+    tuloste = aja_komento(cmd, rooli="reference")
+    if tuloste.startswith("(virhe:"):
+        return {"virhe": tuloste}
+    tietue = {
+        "tuloste": tuloste,
+        "tiiviste": joukon_tiiviste(tulosteen_tiivisteet(tuloste)),
+        "rivit": len(tuloste.splitlines()),
+        "data": data,
+    }
+    if lukee_nippua:
+        tietue["nippu"] = nippu
+    return tietue
+
+
+def odotettu_tuloste(odotettu: Optional[Dict[str, Any]], cmd: str) -> Optional[str]:
+    """Käännösaikana tallennettu tuloste, jos se on yhä voimassa; muuten None.
+
+    Tuloste kelpaa, kun komennon lukemat datatiedostot ovat samat ja
+    sisällöltään ennallaan ja tallennettu tuloste vastaa tiivistettään.
+    """
+    if not odotettu or "tuloste" not in odotettu:
+        return None
+    try:
+        if odotettu.get("data") != _datan_sormenjaljet(cmd, odotettu.get("nippu")):
+            return None
+    except OSError:
+        return None
+    tuloste = odotettu["tuloste"]
+    if joukon_tiiviste(tulosteen_tiivisteet(tuloste)) != odotettu.get("tiiviste"):
+        return None
+    return tuloste
+
+
+def aja_oikea_komento(cmd: str, odotettu: Optional[Dict[str, Any]] = None) -> str:
+    """Aja oikea (viite)komento käyttäen levylle tallennettua välimuistia.
+
+    Jos `odotettu` (tehtävänipun tietue) on voimassa, komentoa ei ajeta.
+    Virheellisiä ajoja (esim. aikakatkaisu) ei tallenneta välimuistiin.
+    """
+    tulos = odotettu_tuloste(odotettu, cmd)
+    if mittarit.MITTARIT and odotettu is not None:
+        mittarit.kasvata("linuxcli_cache_lookups_total", cache="bundle",
+                         result="miss" if tulos is None else "hit")
+    if tulos is not None:
+        if profilointi.PROFILOINTI:
+            with profiloi_ajo("reference", cmd) as mittaus:
+                mittaus.update(cached=True, stdout_lines=len(tulos.splitlines()))
+        return tulos
+    valimuisti = viite_valimuisti()
+    avain = _viite_avain(valimuisti, cmd)
+    if avain is None:
+        return aja_komento(cmd, rooli="reference")
+
+    tulos = valimuisti.hae(avain)
+    if tulos is None:
+        tulos = aja_komento(cmd, rooli="reference")
+        if not tulos.startswith("(virhe:"):
+            valimuisti.tallenna(avain, tulos)
+    elif profilointi.PROFILOINTI:
+        with profiloi_ajo("reference", cmd) as mittaus:
+            mittaus.update(cached=True, stdout_lines=len(tulos.splitlines()))
+    return tulos
+
+
+async def aja_oikea_komento_async(cmd: str) -> str:
+    """Kuten `aja_oikea_komento`, mutta perutettavissa (esihakua varten).
+
+    Perutun ajon tulosta ei tallenneta välimuistiin.
+    """
+    valimuisti = viite_valimuisti()
+    avain = _viite_avain(valimuisti, cmd)
+    tulos = valimuisti.hae(avain) if avain is not None else None
+    if tulos is None:
+        tulos = await aja_komento_async(cmd, rooli="reference")
+        if avain is not None and not tulos.startswith("(virhe:"):
+            valimuisti.tallenna(avain, tulos)
+    return tulos
+
+
+# Vain nämä tuomiot riippuvat pelkästään komennosta ja datasta (ei esim.
+# aikarajasta tai koneen kuormasta), joten vain ne tallennetaan.
+_TALLENNETTAVAT_SYYT = ("", "ylimääräinen rivi", "rivejä puuttuu")
+
+
+def vertaa_tuomiolla(i: int, cmd: str, viite: FrozenSet[bytes]) -> VertailunTulos:
+    """`vertaa_virtana` opiskelijoiden yhteisen tuomiovälimuistin kautta.
+
+    Tyhjää viitetulostetta vastaan ei käytetä välimuistia: interaktiivinen
+    tila hylkää tyhjän tulosteen aina.
+    """
+    avain = tuomion_avain(i, cmd) if viite else None
+    if avain is None:
+        return vertaa_virtana(cmd, viite)
+    valimuisti = tuomio_valimuisti()
+    tuomio = valimuisti.hae_tuomio(avain, viite)
+    if tuomio is not None:
+        if profilointi.PROFILOINTI:
+            with profiloi_ajo("student", cmd) as mittaus:
+                mittaus.update(cached=True)
+        return VertailunTulos(tuomio["sama"], tuomio["syy"])
+    tulos = vertaa_virtana(cmd, viite)
+    if tulos.raja is None and tulos.syy in _TALLENNETTAVAT_SYYT:
+        valimuisti.tallenna_tuomio(avain, viite, tulos.sama, tulos.syy)
+    return tulos
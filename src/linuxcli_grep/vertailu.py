@@ -0,0 +1,179 @@
+"""Opiskelijan tulosteen virtaava vertailu viitetulosteeseen."""
+import hashlib
+import io
+import locale
+from typing import Any, Dict, FrozenSet, Iterable, Iterator, List, NamedTuple, Optional, Set
+
+from .hiekkalaatikko import AIKARAJA, TULOSTE, Ajo
+from .konfiguraatio import asetukset
+from .profilointi import profiloi_ajo
+
+
+# Opiskelijan komennon tulostetta ei kerätä muistiin: rivit tiivistetään
+# sitä mukaa kuin niitä luetaan, ja ajo lopetetaan heti, kun tuloste ei
+# voi enää vastata oikeaa tulostetta. Tuomio on sama kuin vertailussa
+# `set(a.strip().splitlines()) == set(b.strip().splitlines())`.
+
+# Vertailusäännön versio; kasvatetaan, kun tuomio voi muuttua samoilla
+# tulosteilla. Se on tuomiovälimuistin avaimessa, joten vanhat tuomiot mitätöityvät.
+VERTAILUN_VERSIO = 1
+
+def rivin_tiiviste(rivi: str) -> bytes:
+    return hashlib.blake2b(rivi.encode('utf-8', 'surrogateescape'), digest_size=16).digest()
+
+
+def tulosteen_tiivisteet(tuloste: str) -> FrozenSet[bytes]:
+    """Palauta (jo strip()-käsitellyn) tulosteen rivien tiivistejoukko."""
+    return frozenset(rivin_tiiviste(r) for r in tuloste.splitlines()) if tuloste else frozenset()
+
+
+def joukon_tiiviste(tiivisteet: FrozenSet[bytes]) -> str:
+    """Rivitiivistejoukon tiiviste (järjestyksestä riippumaton)."""
+    return hashlib.sha256(b"".join(sorted(tiivisteet))).hexdigest()
+
+
+# Rivinvaihdot, jotka `str.splitlines()` tunnistaa
+_RIVINVAIHDOT = "\n\r\x0b\x0c\x1c\x1d\x1e\x85\u2028\u2029"
+
+
+def _rivit(palat: Iterable[str]) -> Iterator[str]:
+    """Tuota samat rivit kuin `"".join(palat).splitlines()`.
+
+    Palan lopussa oleva keskeneräinen rivi (myös pelkkä "\\r", jota voi
+    seurata "\\n") yhdistetään seuraavaan palaan, joten palojen rajat voivat
+    olla missä tahansa.
+    """
+    kesken = ""
+    for pala in palat:
+        if kesken:
+            pala = kesken + pala
+            kesken = ""
+        if not pala:
+            continue
+        rivit = pala.splitlines(True)
+        viimeinen = rivit[-1]
+        if viimeinen[-1] not in _RIVINVAIHDOT or viimeinen[-1] == "\r":
+            kesken = rivit.pop()
+        for rivi in rivit:
+            yield rivi[:-2] if rivi.endswith("\r\n") else rivi[:-1]
+    if kesken:
+        yield from kesken.splitlines()
+
+
+def stripatut_rivit(palat: Iterable[str]) -> Iterator[str]:
+    """Tuota samat rivit kuin `"".join(palat).strip().splitlines()`.
+
+    Alun tyhjät rivit ohitetaan ja ensimmäisestä rivistä poistetaan
+    alkutyhjät. Viimeistä sisältöriviä ja sen perässä olevia tyhjiä rivejä
+    pidätetään, kunnes tiedetään, onko tuloste loppunut.
+    """
+    alkanut = False
+    pidatetty: Optional[str] = None
+    tyhjat: List[str] = []
+    for rivi in _rivit(palat):
+        if not alkanut:
+            if not rivi.strip():
+                continue
+            rivi = rivi.lstrip()
+            alkanut = True
+        if not rivi.strip():
+            tyhjat.append(rivi)
+            continue
+        if pidatetty is not None:
+            yield pidatetty
+        yield from tyhjat
+        tyhjat.clear()
+        pidatetty = rivi
+    if pidatetty is not None:
+        yield pidatetty.rstrip()
+
+
+class VertailunTulos(NamedTuple):
+    sama: bool
+    syy: str = ""
+    tavut: int = 0
+    rivit: int = 0
+    raja: Optional[str] = None     # hiekkalaatikon ylittynyt raja, ks. hiekkalaatikko
+
+
+def _aliprosessin_palat(ajo: Ajo) -> Iterator[str]:
+    # Sama dekoodaus kuin subprocess.run(..., text=True): universaalit rivinvaihdot
+    yield from io.TextIOWrapper(ajo.stdout, encoding=locale.getpreferredencoding(False))
+
+
+def vertaa_virtana(cmd: str, viite: FrozenSet[bytes], maksimi_tavut: Optional[int] = None) -> VertailunTulos:
+    """Aja `cmd` ja vertaa sen tulostetta viitetulosteen tiivisteisiin.
+
+    Ajo keskeytetään heti, kun tulosteessa on rivi, jota ei ole viitteessä,
+    tai kun tulosteen koko ylittää `maksimi_tavut`.
+    """
+    if maksimi_tavut is None:
+        maksimi_tavut = asetukset().maksimi_tuloste
+    with profiloi_ajo("student", cmd) as mittaus:
+        tulos = _vertaa_virtana(cmd, viite, maksimi_tavut, mittaus)
+        mittaus.update(stdout_bytes=tulos.tavut, stdout_lines=tulos.rivit,
+                       timed_out=tulos.syy == "aikakatkaisu")
+        if tulos.raja:
+            mittaus["limit"] = tulos.raja
+        return tulos
+
+
+def _vertaa_virtana(cmd: str, viite: FrozenSet[bytes], maksimi_tavut: int, mittaus: Dict[str, Any]) -> VertailunTulos:
+    if asetukset().suoritusmoottori == "inprocess":
+        from .moottori import MoottorinAikakatkaisu, TuetumatonKomento, aja_sisaisesti
+        try:
+            tulos = _vertaa_rivit(aja_sisaisesti(cmd), viite, maksimi_tavut)
+            mittaus["engine"] = "inprocess"
+            return tulos
+        except TuetumatonKomento:
+            pass  # ajetaan oikealla ohjelmalla alla
+        except MoottorinAikakatkaisu:
+            return VertailunTulos(False, "aikakatkaisu", raja=AIKARAJA)
+
+    try:
+        ajo = Ajo(cmd, asetukset().timeout_seconds)
+    except Exception:
+        return VertailunTulos(False, "virhe")
+    try:
+        tulos = _vertaa_rivit(_aliprosessin_palat(ajo), viite, maksimi_tavut)
+    except UnicodeDecodeError:
+        tulos = VertailunTulos(False, "virhe")
+    finally:
+        # Tappaa koko prosessiryhmän, jos vertailu lopetettiin kesken
+        ajo.lopeta()
+    if tulos.syy == "tuloste liian suuri":
+        return tulos._replace(raja=TULOSTE)
+    raja = ajo.raja()
+    if raja == AIKARAJA:
+        # Ajastin tappoi prosessin: tuloste jäi kesken
+        return tulos._replace(sama=False, syy="aikakatkaisu", raja=raja)
+    if raja:
+        return tulos._replace(sama=False, syy="raja ylittyi", raja=raja)
+    return tulos
+
+
+def _vertaa_rivit(palat: Iterable[str], viite: FrozenSet[bytes], maksimi_tavut: int) -> VertailunTulos:
+    nahdyt: Set[bytes] = set()
+    tavut = 0
+    rivit = 0
+
+    def mitattu() -> Iterator[str]:
+        nonlocal tavut
+        for pala in palat:
+            tavut += len(pala.encode('utf-8', 'surrogateescape'))
+            if tavut > maksimi_tavut:
+                raise OverflowError
+            yield pala
+
+    try:
+        for rivi in stripatut_rivit(mitattu()):
+            rivit += 1
+            t = rivin_tiiviste(rivi)
+            if t not in viite:
+                return VertailunTulos(False, "ylimääräinen rivi", tavut, rivit)
+            nahdyt.add(t)
+    except OverflowError:
+        return VertailunTulos(False, "tuloste liian suuri", tavut, rivit)
+    if len(nahdyt) != len(viite):
+        return VertailunTulos(False, "rivejä puuttuu", tavut, rivit)
+    return VertailunTulos(True, "", tavut, rivit)
@@ -0,0 +1,41 @@
+"""Testien yhteiset apuvälineet: paketti src-hakemistosta ja ajonaikaiset asetukset."""
+import sys
+from pathlib import Path
+
+import pytest
+
+JUURI = Path(__file__).resolve().parent.parent
+sys.path.insert(0, str(JUURI / "src"))
+
+from linuxcli_grep import konfiguraatio, tehtavasarjat, valimuisti  # noqa: E402
+
+
+@pytest.fixture
+def juuri(monkeypatch):
+    """Aja testi repositorion juuressa (data/ ja configs/ suhteellisina polkuina)."""
+    monkeypatch.chdir(JUURI)
+    return JUURI
+
+
+@pytest.fixture
+def asetukset(monkeypatch, tmp_path, juuri):
+    """Tuoreet asetukset, joiden tila- ja tulostiedostot ovat väliaikaishakemistossa."""
+    a = konfiguraatio.Asetukset(konfiguraatio.load_config(konfiguraatio.CONFIG_PATH))
+    a.tila_tiedosto = str(tmp_path / "tila.json")
+    a.results_file = str(tmp_path / "results.json")
+    a.valimuisti_hakemisto = tmp_path / "cache"
+    monkeypatch.setattr(konfiguraatio, "_ASETUKSET", a)
+    # Välimuistit avataan uudelleen testin välimuistihakemistosta
+    monkeypatch.setattr(valimuisti, "_VIITE_VALIMUISTI", None)
+    monkeypatch.setattr(valimuisti, "_TUOMIO_VALIMUISTI", None)
+    return a
+
+
+@pytest.fixture
+def komentorivi(monkeypatch, tmp_path, asetukset):
+    """Asetukset `cli.main`-ajoille: sarjan valinta ei ohjaa tuloksia repositorioon."""
+    asetukset.config = dict(asetukset.config, results_file=str(tmp_path / "results.json"),
+                            tila_tiedosto=asetukset.tila_tiedosto)
+    monkeypatch.setattr(tehtavasarjat, "_REKISTERI", None)
+    monkeypatch.setattr(tehtavasarjat, "_VALITTU", None)
+    return asetukset
@@ -0,0 +1,184 @@
+"""--check: täysi ja inkrementaalinen validointi antavat saman tuloksen."""
+import json
+from pathlib import Path
+
+import pytest
+
+from linuxcli_grep import arviointi
+from linuxcli_grep.arviointi import check_mode
+from linuxcli_grep.tehtavasarjat import avaa_tehtavat
+from linuxcli_grep.tila import lataa_tila, tallenna_tila, tehtavan_avain
+from linuxcli_grep.valimuisti import validoinnin_sormenjalki
+
+
+@pytest.fixture
+def tehtavat(asetukset):
+    return avaa_tehtavat()
+
+
+def _check(asetukset, **kwargs):
+    with pytest.raises(SystemExit):
+        check_mode(jobs=2, **kwargs)
+    return json.loads(Path(asetukset.results_file).read_text(encoding="utf-8"))
+
+
+def _tila(tehtavat, vastaukset):
+    tila = {"nimi": "Testi", "opiskelijanumero": "1"}
+    for i, cmd in vastaukset.items():
+        tila[tehtavan_avain(i)] = {"status": "oikein", "student_cmd": cmd}
+    return tila
+
+
+def test_inkrementaalinen_vastaa_taytta(asetukset, tehtavat, capsys):
+    vaara = tehtavat[0][1]
+    tallenna_tila(_tila(tehtavat, {0: tehtavat[0][1], 1: tehtavat[1][1], 2: tehtavat[2][1], 3: vaara}))
+    taysi = _check(asetukset)
+    assert [t["status"] for t in taysi["per_task"][:4]] == ["oikein", "oikein", "oikein", "väärin"]
+    # Pelkkä --check ei tallenna sormenjälkiä
+    assert not any("validoitu" in lataa_tila()[tehtavan_avain(i)] for i in range(3))
+
+    assert _check(asetukset, inkrementaalinen=True) == taysi
+    tila = lataa_tila()
+    assert all("validoitu" in tila[tehtavan_avain(i)] for i in range(3))
+
+    capsys.readouterr()
+    assert _check(asetukset, inkrementaalinen=True) == taysi
+    assert "3 tehtävää ennallaan" in capsys.readouterr().out
+    assert lataa_tila() == tila
+
+    # Muutettu komento validoidaan, vaikka vanha sormenjälki jäi tilaan
+    tila[tehtavan_avain(1)]["student_cmd"] = vaara
+    tila[tehtavan_avain(1)]["status"] = "oikein"
+    tallenna_tila(tila)
+    inkrementaalinen = _check(asetukset, inkrementaalinen=True)
+    assert inkrementaalinen["per_task"][1]["status"] == "väärin"
+    tallenna_tila(tila)
+    assert _check(asetukset) == inkrementaalinen
+
+
+def test_check_ei_kirjoita_tilaa_turhaan(asetukset, tehtavat):
+    tallenna_tila(_tila(tehtavat, {0: tehtavat[0][1], 1: tehtavat[1][1]}))
+    tiedosto = Path(asetukset.tila_tiedosto)
+    ennen = tiedosto.read_bytes()
+    _check(asetukset)
+    assert tiedosto.read_bytes() == ennen
+
+
+def test_check_ei_luota_tilan_sormenjalkeen(asetukset, tehtavat):
+    vaara, oikea = tehtavat[1][1], tehtavat[0][1]
+    tila = _tila(tehtavat, {0: vaara})
+    tila[tehtavan_avain(0)]["validoitu"] = validoinnin_sormenjalki(vaara, oikea)
+    tallenna_tila(tila)
+
+    tulos = _check(asetukset)
+    assert tulos["score"] == 0
+    assert tulos["per_task"][0]["status"] == "väärin"
+    assert "validoitu" not in lataa_tila()[tehtavan_avain(0)]
+
+
+def test_jobs_ei_muuta_tulosta(komentorivi, tehtavat, monkeypatch):
+    from linuxcli_grep import cli, valimuisti
+
+    vastaukset = {i: oikea for i, (_, oikea) in enumerate(tehtavat) if i % 3}
+    vastaukset.update({i: tehtavat[0][1] for i in range(3, len(tehtavat), 4)})
+    tulokset = []
+    for jobs in ("1", "6"):
+        # Tyhjät välimuistit: kummallakin kerralla kaikki komennot ajetaan
+        monkeypatch.setattr(valimuisti, "_VIITE_VALIMUISTI", None)
+        monkeypatch.setattr(valimuisti, "_TUOMIO_VALIMUISTI", None)
+        komentorivi.valimuisti_hakemisto = komentorivi.valimuisti_hakemisto.with_name(f"cache-{jobs}")
+        tallenna_tila(_tila(tehtavat, vastaukset))
+        with pytest.raises(SystemExit) as poistuminen:
+            cli.main(["--check", "--jobs", jobs])
+        tulokset.append((poistuminen.value.code,
+                         json.loads(Path(komentorivi.results_file).read_text(encoding="utf-8"))))
+
+    assert tulokset[0] == tulokset[1]
+    koodi, tulos = tulokset[0]
+    assert koodi == 1
+    assert [t["id"] for t in tulos["per_task"]] == list(range(len(tehtavat)))
+    odotettu = sum(1 for i, cmd in vastaukset.items() if cmd == tehtavat[i][1])
+    assert tulos["score"] == odotettu
+
+
+def test_eraarviointi_vastaa_yksittaisia(komentorivi, tehtavat, tmp_path, monkeypatch):
+    from linuxcli_grep import cli, valimuisti
+
+    viiteajot = []
+    aja = valimuisti.aja_komento
+
+    def laskettu(cmd, *args, rooli="student", **kwargs):
+        if rooli == "reference":
+            viiteajot.append(cmd)
+        return aja(cmd, *args, rooli=rooli, **kwargs)
+
+    monkeypatch.setattr(valimuisti, "aja_komento", laskettu)
+    # Ilman käännettyä nippua: oikeat komennot ajetaan
+    monkeypatch.setattr(arviointi, "tehtavan_odotettu", lambda *_: None)
+    palautukset = tmp_path / "palautukset"
+    (palautukset / "s4" / "configs").mkdir(parents=True)
+    vastaukset = {
+        "s1": {i: oikea for i, (_, oikea) in enumerate(tehtavat)},
+        "s2": {0: tehtavat[0][1], 1: tehtavat[0][1]},
+        "s3": {},
+    }
+    for opiskelija, v in vastaukset.items():
+        (palautukset / f"{opiskelija}.json").write_text(json.dumps(_tila(tehtavat, v)), encoding="utf-8")
+    (palautukset / "s4" / "configs" / "tila.json").write_text(
+        json.dumps(_tila(tehtavat, {2: tehtavat[2][1]})), encoding="utf-8")
+    komentorivi.tila_tiedosto = "configs/tila.json"
+    ulos = tmp_path / "batch"
+
+    cli.main(["--batch", str(palautukset), "--batch-output", str(ulos), "--jobs", "4"])
+
+    yhteenveto = json.loads((ulos / "yhteenveto.json").read_text(encoding="utf-8"))
+    pisteet = {o["opiskelija"]: o["score"] for o in yhteenveto["opiskelijat"]}
+    assert pisteet == {"s1": len(tehtavat), "s2": 1, "s3": 0, "s4": 1}
+    s2 = json.loads((ulos / "s2.json").read_text(encoding="utf-8"))
+    assert [t["status"] for t in s2["per_task"][:3]] == ["oikein", "väärin", "ei_vastattu"]
+    # Kukin oikea komento ajetaan enintään kerran kaikille opiskelijoille
+    assert viiteajot and len(viiteajot) == len(set(viiteajot))
+    # Palautuksia ei muokata
+    assert json.loads((palautukset / "s2.json").read_text(encoding="utf-8"))["1"]["status"] == "oikein"
+
+
+def test_tuore_checkout_ei_aja_oikeita_komentoja(juuri, tmp_path, monkeypatch):
+    import shutil
+    import subprocess
+
+    from linuxcli_grep import konfiguraatio, tehtavasarjat, valimuisti
+
+    try:
+        tiedostot = subprocess.run(["git", "ls-files", "-z"], cwd=juuri, capture_output=True,
+                                   check=True).stdout.decode("utf-8").split("\0")
+    except (OSError, subprocess.CalledProcessError):
+        pytest.skip("git ei ole käytettävissä")
+    checkout = tmp_path / "checkout"
+    for nimi in filter(None, tiedostot):
+        if (juuri / nimi).is_file():
+            (checkout / nimi).parent.mkdir(parents=True, exist_ok=True)
+            shutil.copy(juuri / nimi, checkout / nimi)   # uudet mtimet kuten checkoutissa
+    monkeypatch.chdir(checkout)
+    a = konfiguraatio.Asetukset(konfiguraatio.load_config(konfiguraatio.CONFIG_PATH))
+    a.valimuisti_hakemisto = tmp_path / "cache"
+    a.results_file = str(tmp_path / "results.json")
+    monkeypatch.setattr(konfiguraatio, "_ASETUKSET", a)
+    monkeypatch.setattr(tehtavasarjat, "_REKISTERI", None)
+    monkeypatch.setattr(tehtavasarjat, "_VALITTU", None)
+    monkeypatch.setattr(valimuisti, "_VIITE_VALIMUISTI", None)
+    monkeypatch.setattr(valimuisti, "_TUOMIO_VALIMUISTI", None)
+    viiteajot = []
+    aja = valimuisti.aja_komento
+
+    def laskettu(cmd, *args, rooli="student", **kwargs):
+        if rooli == "reference":
+            viiteajot.append(cmd)
+        return aja(cmd, *args, rooli=rooli, **kwargs)
+
+    monkeypatch.setattr(valimuisti, "aja_komento", laskettu)
+    tehtavat = avaa_tehtavat()
+    tallenna_tila(_tila(tehtavat, {i: oikea for i, (_, oikea) in enumerate(tehtavat)}))
+
+    tulos = _check(a)
+    assert tulos["score"] == len(tehtavat)
+    assert viiteajot == []
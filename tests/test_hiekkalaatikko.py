@@ -0,0 +1,80 @@
+"""Rajoitettu ajo: rajat asetetaan jokaiselle vaiheelle ja putken vaiheet ovat samassa prosessiryhmässä."""
+import os
+
+import pytest
+
+from linuxcli_grep import hiekkalaatikko
+from linuxcli_grep.hiekkalaatikko import Ajo, Peruutus, aja_rajoitetusti, peruttavissa
+from linuxcli_grep.komentorivi import Vaihe
+
+pytestmark = pytest.mark.skipif(not os.path.exists("/proc/self/limits"), reason="vaatii /proc-tiedostojärjestelmän")
+
+
+def _rajat(tulos):
+    """Kunkin vaiheen /proc/self/limits-taulukko."""
+    taulukot = []
+    for r in tulos.stdout.decode().splitlines():
+        if r.startswith("Limit "):
+            taulukot.append({})
+        else:
+            taulukot[-1][r[:26].strip()] = r[26:].split()[:2]
+    return taulukot
+
+
+@pytest.mark.parametrize("prlimit", [True, False], ids=["prlimit", "preexec"])
+def test_rajat_asetetaan(asetukset, monkeypatch, prlimit):
+    if not prlimit:
+        monkeypatch.setattr(hiekkalaatikko, "_prlimit", lambda: None)
+    elif hiekkalaatikko._prlimit() is None:
+        pytest.skip("prlimit puuttuu")
+    asetukset.raja_cpu_s = 7
+    asetukset.raja_tiedostokoko_mt = 3
+
+    vaiheet = [Vaihe(["cat", "/proc/self/limits"]), Vaihe(["cat", "-", "/proc/self/limits"])]
+    taulukot = _rajat(aja_rajoitetusti(vaiheet))
+    assert len(taulukot) == 2
+    for rajat in taulukot:
+        assert rajat["Max cpu time"] == ["7", "8"]
+        assert rajat["Max file size"] == [str(3 << 20)] * 2
+
+
+def test_ilman_prlimitia_ei_kaaretta(asetukset, monkeypatch):
+    monkeypatch.setattr(hiekkalaatikko, "_prlimit", lambda: None)
+    asetukset.raja_cpu_s = 7
+    rajat = hiekkalaatikko._rlimit_rajat()
+    assert hiekkalaatikko._rajoitettu_argv(["grep", "x"], rajat) == ["grep", "x"]
+    assert hiekkalaatikko._rajojen_asetus(rajat) is not None
+
+
+def test_ilman_rajoja_ei_kaaretta(asetukset):
+    asetukset.raja_cpu_s = asetukset.raja_muisti_mt = asetukset.raja_tiedostokoko_mt = 0
+    assert hiekkalaatikko._rajoitettu_argv(["grep", "x"], hiekkalaatikko._rlimit_rajat()) == ["grep", "x"]
+
+
+def test_puuttuva_ohjelma(asetukset):
+    with pytest.raises(FileNotFoundError):
+        aja_rajoitetusti([Vaihe(["ei-tallaista-ohjelmaa"])])
+
+
+@pytest.mark.skipif(not hiekkalaatikko._YHTEINEN_RYHMA, reason="process_group vaatii Python 3.11:n")
+def test_vaiheet_samassa_ryhmassa(asetukset):
+    # /proc/self/stat: 5. kenttä on prosessiryhmä
+    vaiheet = [Vaihe(["cat", "/proc/self/stat"]), Vaihe(["cat", "-", "/proc/self/stat"])]
+    rivit = aja_rajoitetusti(vaiheet).stdout.decode().splitlines()
+    ryhmat = {r.rsplit(")", 1)[1].split()[2] for r in rivit}
+    assert len(ryhmat) == 1 and ryhmat != {str(os.getpgrp())}
+
+
+def test_korjattua_ryhmaa_ei_tapeta(asetukset, monkeypatch):
+    tapetut = []
+    killpg = os.killpg
+    monkeypatch.setattr(os, "killpg", lambda pid, sig: (tapetut.append(pid), killpg(pid, sig)))
+    peruutus = Peruutus()
+    ajo = peruttavissa(peruutus, Ajo, "echo x", 5)
+    ajo.stdout.read()
+    ajo.lopeta()
+    tapetut.clear()
+
+    peruutus.peru()
+    ajo.tapa()
+    assert tapetut == []
@@ -0,0 +1,29 @@
+"""Käynnistysbudjetti: sama `python -X importtime` -mittaus kuin tools/startup_budget.py.
+
+Testi tarkistaa vain deterministiset rajat (moduulien määrä ja kielletyt
+moduulit); aikabudjetti tarkistetaan työkalulla, koska se riippuu koneesta.
+"""
+import os
+import subprocess
+import sys
+
+import pytest
+
+from conftest import JUURI
+
+sys.path.insert(0, str(JUURI / "tools"))
+
+import startup_budget  # noqa: E402
+
+
+@pytest.mark.parametrize("tila", sorted(startup_budget.TILAT))
+def test_tuontipolku_pysyy_budjetissa(tila):
+    moduulit, kielletyt = startup_budget.TILAT[tila]
+    _, tuodut = startup_budget.mittaa(moduulit)
+    assert len(tuodut) <= startup_budget.MODUULIBUDJETIT[tila], sorted(tuodut)
+    assert not tuodut & set(kielletyt)
+
+
+def test_paketin_tuonti_ei_lue_konfiguraatiota():
+    env = dict(os.environ, PYTHONPATH=str(startup_budget.SRC))
+    assert subprocess.run([sys.executable, "-c", startup_budget.SIVUVAIKUTUKSETON], env=env).returncode == 0
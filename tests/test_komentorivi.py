@@ -0,0 +1,92 @@
+"""Komentorivin jäsennys: samat argumentit kuin /bin/sh:lla, shellin syntaksi hylätään."""
+import shutil
+import subprocess
+
+import pytest
+
+from linuxcli_grep.komentorivi import TuetumatonKomento, Vaihe, jasenna_putki
+
+# Vastauksia, jotka aiempi sh-pohjainen ajo hyväksyi ja ajoi
+SH_ARGUMENTIT = [
+    "grep Error data/log.txt",
+    "grep Error$ data/log.txt",
+    "grep ^Error$ data/log.txt",
+    "grep -E [0-9]{3} data/log.txt",
+    "grep -E '^[0-9]{1,3}' data/log.txt",
+    'grep -E "^.{3}$" data/log.txt',
+    'grep "a\\$" data/log.txt',
+    "grep $ data/log.txt",
+    "grep a$ data/log.txt",
+    "grep 'it''s' data/kirja.txt",
+    'grep -i "the end" data/kirja.txt',
+    "grep a\\ b data/kirja.txt",
+    "grep a~b data/kirja.txt",
+    "grep C# data/kirja.txt",
+    "grep x } data/kirja.txt",
+    "grep {x} data/kirja.txt",
+    "grep ! data/kirja.txt",
+    "grep -c x data/*.txt",
+    "grep -c x 'data/*.txt'",
+    "grep -c x data/[ak]*.txt",
+    "grep -c x data/ei-osumia-*.txt",
+    "grep -e -x -- data/log.txt",
+]
+
+
+def _sh_argumentit(cmd: str) -> list:
+    ohjelma, _, loput = cmd.partition(" ")
+    tulos = subprocess.run(["sh", "-c", "printf '%s\\0' " + loput], capture_output=True, check=True)
+    return tulos.stdout.decode("utf-8").split("\0")[:-1]
+
+
+@pytest.mark.skipif(shutil.which("sh") is None, reason="vaatii /bin/sh:n")
+@pytest.mark.parametrize("cmd", SH_ARGUMENTIT)
+def test_argumentit_kuten_sh(juuri, cmd):
+    vaiheet = jasenna_putki(cmd)
+    assert len(vaiheet) == 1
+    assert vaiheet[0].argv == [cmd.partition(" ")[0]] + _sh_argumentit(cmd)
+
+
+def test_putket_ja_ohjaukset(juuri):
+    assert jasenna_putki("grep -i error data/log.txt | sort | uniq -c | sort -nr | head -3") == [
+        Vaihe(["grep", "-i", "error", "data/log.txt"]), Vaihe(["sort"]), Vaihe(["uniq", "-c"]),
+        Vaihe(["sort", "-nr"]), Vaihe(["head", "-3"]),
+    ]
+    assert jasenna_putki("wc -l < data/log.txt") == [Vaihe(["wc", "-l"], syote="data/log.txt")]
+    assert jasenna_putki("grep x data/ei-ole 2>/dev/null|wc -l") == [
+        Vaihe(["grep", "x", "data/ei-ole"], virheet_pois=True), Vaihe(["wc", "-l"]),
+    ]
+
+
+@pytest.mark.parametrize("cmd", [
+    "grep x data/log.txt; cat /etc/passwd",
+    "grep x data/log.txt && id",
+    "grep x data/log.txt || id",
+    "grep x data/log.txt &",
+    "grep `id` data/log.txt",
+    "grep $(id) data/log.txt",
+    'grep "$(id)" data/log.txt',
+    "grep ${HOME} data/log.txt",
+    "grep $HOME data/log.txt",
+    'grep "$HOME" data/log.txt',
+    "grep $1 data/log.txt",
+    "grep $? data/log.txt",
+    "grep $'\\x41' data/log.txt",
+    "cat ~/.ssh/id_rsa",
+    "grep x --file=~/salaisuus data/log.txt",
+    "grep x data/log.txt #kommentti",
+    "grep {a,b} data/log.txt",
+    "grep x data/{log,kirja}.txt",
+    "grep x data/log{1..3}.txt",
+    "grep x data/log.txt > /tmp/x",
+    "grep x data/log.txt >> /tmp/x",
+    "grep x data/log.txt 2> /tmp/x",
+    "grep x <<EOF",
+    "(grep x data/log.txt)",
+    "grep 'x data/log.txt",
+    "grep x data/log.txt |",
+    "grep x \\\ndata/log.txt",
+])
+def test_shellin_syntaksi_hylataan(cmd):
+    with pytest.raises(TuetumatonKomento):
+        jasenna_putki(cmd)
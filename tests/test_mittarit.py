@@ -0,0 +1,67 @@
+"""Käyttömittarit: Prometheus-tekstimuoto luetaan takaisin ja ajojen arvot summataan."""
+import pytest
+
+from linuxcli_grep import mittarit
+
+
+@pytest.fixture
+def tiedosto(tmp_path, monkeypatch):
+    monkeypatch.setattr(mittarit, "_laskurit", {})
+    monkeypatch.setattr(mittarit, "_histogrammit", {})
+    monkeypatch.setattr(mittarit, "MITTARIT", False)
+    monkeypatch.setattr(mittarit, "_POLKU", None)
+    polku = tmp_path / "mittarit" / "linuxcli.prom"
+    mittarit.ota_kayttoon(polku)
+    return polku
+
+
+def _ajo():
+    """Yhden prosessin mittarit, myös erikoismerkkejä sisältävä nimiö."""
+    mittarit.kasvata("linuxcli_commands_total", command="grep", role="student")
+    mittarit.kasvata("linuxcli_rejected_commands_total")
+    mittarit.kasvata("linuxcli_cache_lookups_total", cache='viite "a b"\\c\n', result="hit")
+    for kesto in (0.003, 0.2, 20.0):
+        mittarit.havainnoi("linuxcli_command_duration_seconds", kesto, command="grep", role="student")
+
+
+def test_tekstimuoto_palautuu(tiedosto):
+    _ajo()
+    naytteet = mittarit._rivit()
+    teksti = mittarit.muotoile(naytteet)
+    assert "# TYPE linuxcli_command_duration_seconds histogram" in teksti
+    assert mittarit._lue(teksti) == naytteet
+    assert mittarit.muotoile(mittarit._lue(teksti)) == teksti
+
+
+def test_kirjoitus_summaa_aiemmat_arvot(tiedosto):
+    _ajo()
+    yksi = mittarit._rivit()
+    mittarit.kirjoita()
+    assert mittarit._rivit() == {}          # prosessin mittarit nollattiin
+    _ajo()
+    mittarit.kirjoita()
+
+    luettu = mittarit._lue(tiedosto.read_text(encoding="utf-8"))
+    assert luettu == {nimi: {n: 2 * a for n, a in sarja.items()} for nimi, sarja in yksi.items()}
+    kesto = luettu["linuxcli_command_duration_seconds"]
+    nimiot = 'command="grep",role="student"'
+    assert kesto[f'linuxcli_command_duration_seconds_bucket{{{nimiot},le="0.005"}}'] == 2
+    assert kesto[f'linuxcli_command_duration_seconds_bucket{{{nimiot},le="0.25"}}'] == 4
+    assert kesto[f'linuxcli_command_duration_seconds_bucket{{{nimiot},le="+Inf"}}'] == 6
+    assert kesto[f"linuxcli_command_duration_seconds_count{{{nimiot}}}"] == 6
+    assert kesto[f"linuxcli_command_duration_seconds_sum{{{nimiot}}}"] == pytest.approx(2 * 20.203)
+
+
+def test_lue_ohittaa_kommentit_ja_virheelliset_rivit():
+    teksti = ("# HELP linuxcli_verdicts_total x\n"
+              "linuxcli_verdicts_total{mode=\"check\"} 3.0\n"
+              "\n"
+              "rikki_rivi ei-luku\n")
+    assert mittarit._lue(teksti) == {"linuxcli_verdicts_total": {'linuxcli_verdicts_total{mode="check"}': 3.0}}
+
+
+def test_pois_kaytosta_ei_kirjoiteta(tiedosto, monkeypatch):
+    monkeypatch.setattr(mittarit, "MITTARIT", False)
+    _ajo()
+    mittarit.kirjoita()
+    assert not tiedosto.exists()
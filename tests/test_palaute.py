@@ -0,0 +1,63 @@
+"""Interaktiivinen palaute: esikatselun rivimäärät ja rivierot vastaavat `splitlines()`-joukkoja."""
+import random
+
+import pytest
+
+from linuxcli_grep.palaute import Erot, esikatselu, rivit, tulosta_erot, tulosta_esikatselu
+
+ESIMERKIT = ["", "a", "a\n", "a\nb", "a\nb\n", "a\n\nb\n\n", "\n\n", "a\r\nb\rc\n", "a\x0bb c", "ä\nö\n"]
+
+
+def _satunnainen(r):
+    return "".join(r.choice("ab\n\n\r ") for _ in range(r.randrange(25)))
+
+
+@pytest.mark.parametrize("teksti", ESIMERKIT)
+def test_rivit_vastaa_splitlines(teksti):
+    assert list(rivit(teksti)) == teksti.splitlines()
+
+
+def test_esikatselu_ja_loput():
+    r = random.Random(3)
+    for teksti in ESIMERKIT + [_satunnainen(r) for _ in range(500)]:
+        kaikki = teksti.splitlines()
+        for maksimi in range(0, 6):
+            assert esikatselu(teksti, maksimi) == (kaikki[:maksimi], max(0, len(kaikki) - maksimi)), \
+                (teksti, maksimi)
+
+
+def test_tulosta_esikatselu_kertoo_loput():
+    tulostetut = []
+    assert tulosta_esikatselu("otsikko", "1\n2\n3\n4\n", 2, tulostetut.append)
+    assert tulostetut == ["otsikko", "1", "2", "… +2 riviä lisää"]
+    assert not tulosta_esikatselu("otsikko", "1\n2\n", 2, [].append)
+
+
+def test_erot_vastaa_joukkoja():
+    r = random.Random(5)
+    tulosteet = ESIMERKIT + [_satunnainen(r) for _ in range(60)]
+    for oikea in tulosteet:
+        oikea = oikea.strip()      # viitetuloste on strip()-käsitelty kuten arvioinnissa
+        for oma in tulosteet:
+            erot = Erot(oikea, oma)
+            a, b = set(oikea.splitlines()), set(oma.splitlines())
+            assert (erot.vain_oikeassa, erot.vain_omassa, erot.sama) == (len(a - b), len(b - a), a == b)
+            assert set(erot.vain_oikeassa_rivit()) == a - b
+            assert set(erot.vain_omassa_rivit()) == b - a
+
+
+def test_erorivit_jarjestyksessa_ja_rajattuna():
+    erot = Erot("x\na\nb\nc\nd", "d\nb\nb\ny\nz\ny")
+    assert (erot.vain_oikeassa, erot.vain_omassa) == (3, 2)
+    assert list(erot.vain_oikeassa_rivit()) == ["x", "a", "c"]
+    assert list(erot.vain_oikeassa_rivit(2)) == ["x", "a"]
+    assert list(erot.vain_omassa_rivit()) == ["y", "z"]
+
+    tulostetut = []
+    assert tulosta_erot(erot, 2, tulostetut.append)
+    assert tulostetut == [
+        "Rivejä vain oikeassa tuloksessa:", "+ x", "+ a",
+        "… +1 riviä lisää vain oikeassa tuloksessa",
+        "Rivejä vain sinun tuloksessasi:", "- y", "- z",
+    ]
+    assert "Rivejä vain oikeassa tuloksessa: 3\n+ x\n+ a\n+ c\n" in erot.koko_ero()
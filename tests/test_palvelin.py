@@ -0,0 +1,118 @@
+"""Arviointipalvelin: soketin oikeudet (myös jaettu soketti), data/-rajaus ja perutut työt."""
+import os
+import socket
+import stat
+import subprocess
+import sys
+import time
+
+import pytest
+
+from linuxcli_grep.asiakas import DATAN_ULKOPUOLELLA, PalvelinAsiakas, PalvelinVirhe
+from linuxcli_grep.komentorivi import jasenna_putki
+from linuxcli_grep.palvelin import Palvelin, _aseta_soketin_oikeudet, _ryhman_gid, _tiedostot_hakemistossa
+
+pytestmark = pytest.mark.skipif(not hasattr(socket, "AF_UNIX"), reason="vaatii Unix-soketit")
+
+
+@pytest.mark.parametrize("cmd, sallittu", [
+    ("grep Error data/log.txt", True),
+    ("grep -c 'GET /index' data/log.txt | wc -l", True),
+    ("cat data/*.txt", True),
+    ("grep -r Error data", True),
+    ("wc -l < data/log.txt", True),
+    ("cat /etc/passwd", False),
+    ("grep root -f/etc/passwd data/log.txt", False),
+    ("grep --file=/etc/hostname data/log.txt", False),
+    ("cat data/../configs/config.json", False),
+    ("wc -l < configs/config.json", False),
+    ("grep -r x .", False),
+])
+def test_tiedostot_data_hakemistossa(juuri, cmd, sallittu):
+    assert _tiedostot_hakemistossa(jasenna_putki(cmd), os.path.realpath("data")) is sallittu
+
+
+@pytest.fixture
+def palvelin(juuri, tmp_path):
+    soketti = tmp_path / "palvelin.sock"
+    proc = subprocess.Popen([sys.executable, "harjoitus.py", "serve", "--socket", str(soketti), "--jobs", "1"],
+                            stdout=subprocess.DEVNULL, stderr=subprocess.DEVNULL)
+    try:
+        for _ in range(200):
+            if soketti.exists():
+                break
+            time.sleep(0.05)
+        else:
+            pytest.fail("palvelin ei käynnistynyt")
+        yield soketti
+    finally:
+        proc.terminate()
+        proc.wait(10)
+
+
+def _prosessit(komento: str):
+    loydetyt = []
+    for pid in filter(str.isdigit, os.listdir("/proc")):
+        try:
+            with open(f"/proc/{pid}/cmdline", "rb") as f:
+                if komento.encode() in f.read().replace(b"\0", b" "):
+                    loydetyt.append(pid)
+        except OSError:
+            pass
+    return loydetyt
+
+
+def test_soketti_vain_omistajalle(palvelin):
+    assert stat.S_IMODE(os.stat(palvelin).st_mode) == 0o600
+
+
+def test_datan_ulkopuoliset_tiedostot_hylataan(palvelin):
+    asiakas = PalvelinAsiakas.yhdista(palvelin)
+    try:
+        with pytest.raises(PalvelinVirhe, match=DATAN_ULKOPUOLELLA):
+            asiakas.arvioi(0, "cat /etc/passwd")
+        oma, _ = asiakas.arvioi(0, "grep -c Error data/log.txt")
+        assert oma.strip().isdigit()
+    finally:
+        asiakas.sulje()
+
+
+@pytest.mark.skipif(not os.path.isdir("/proc"), reason="vaatii /proc-tiedostojärjestelmän")
+def test_katkaistu_yhteys_tappaa_komennon(palvelin):
+    merkki = "tail -f -n 0 data/log.txt data/users.csv"
+    asiakas = PalvelinAsiakas.yhdista(palvelin)
+    asiakas._soketti.sendall(b'{"op": "grade", "task": 0, "cmd": "%s"}\n' % merkki.encode())
+    for _ in range(100):
+        if _prosessit(merkki):
+            break
+        time.sleep(0.02)
+    else:
+        pytest.fail("komento ei käynnistynyt")
+    asiakas.sulje()
+    # Ilman perumista tail -f jatkaisi aikarajaan (timeout_seconds, 3 s) asti
+    for _ in range(100):
+        if not _prosessit(merkki):
+            break
+        time.sleep(0.02)
+    assert not _prosessit(merkki)
+
+
+def test_jaetun_soketin_tila_ja_ryhma(tmp_path):
+    soketti = tmp_path / "jaettu.sock"
+    s = socket.socket(socket.AF_UNIX)
+    try:
+        s.bind(str(soketti))
+        _aseta_soketin_oikeudet(soketti, 0o660, _ryhman_gid(str(os.getgid())))
+        tiedot = os.stat(soketti)
+        assert stat.S_IMODE(tiedot.st_mode) == 0o660 and tiedot.st_gid == os.getgid()
+    finally:
+        s.close()
+
+
+@pytest.mark.parametrize("tila, ryhma, virhe", [
+    (0o666, "", "sallii muutakin"),
+    (0o640, "ei-tallaista-ryhmaa", "tuntematon ryhmä"),
+])
+def test_virheelliset_soketin_oikeudet(juuri, asetukset, tila, ryhma, virhe):
+    with pytest.raises(ValueError, match=virhe):
+        Palvelin(asetukset.palvelin_soketti, 1, 1, tila, ryhma)
@@ -0,0 +1,24 @@
+"""Profiloinnin julkinen rajapinta."""
+import pytest
+
+from linuxcli_grep import profilointi
+from linuxcli_grep.profilointi import profiloi_ajo, profiloi_tehtava, tehtavan_profiili, viimeisimmat_ajot
+
+
+@pytest.fixture(autouse=True)
+def _profilointi(monkeypatch):
+    monkeypatch.setattr(profilointi, "PROFILOINTI", True)
+    monkeypatch.setattr(profilointi, "_profiilit", {})
+
+
+def test_viimeisimmat_ajot():
+    with profiloi_tehtava(3):
+        for rooli in ("reference", "student", "student"):
+            with profiloi_ajo(rooli, "grep x data/log.txt") as mittaus:
+                mittaus.update(cached=rooli == "reference")
+
+    ajot = viimeisimmat_ajot(3, 2)
+    assert [a["role"] for a in ajot] == ["student", "student"]
+    assert all("wall_s" in a for a in ajot)
+    assert len(tehtavan_profiili(3)["calls"]) == 3
+    assert viimeisimmat_ajot(3, 0) == [] and viimeisimmat_ajot(4, 2) == []
@@ -0,0 +1,92 @@
+"""Tulostietokanta: tuonti, uusimmat tulokset ja yksittäisten tiedostojen tunnisteet."""
+import json
+import os
+import subprocess
+import sys
+from datetime import datetime
+
+import pytest
+
+from conftest import JUURI
+
+sys.path.insert(0, str(JUURI / "tools"))
+
+import results_store as rs  # noqa: E402
+import summarize_autograding_results as s  # noqa: E402
+
+
+def _tulos(polku, pisteet, per_task, **kentat):
+    polku.write_text(json.dumps({"score": pisteet, "total": len(per_task), "per_task": per_task, **kentat}),
+                     encoding="utf-8")
+    return polku
+
+
+@pytest.fixture
+def kanta(tmp_path):
+    conn = rs.open_store(tmp_path / "tulokset.sqlite")
+    yield conn
+    conn.close()
+
+
+def test_tuonti_vastaa_hakemiston_yhteenvetoa(kanta, tmp_path):
+    h = tmp_path / "results"
+    h.mkdir()
+    for n in range(12):
+        _tulos(h / f"s{n % 4}-2024-01-{n + 1:02d}T10-00-00.json", n % 3, [
+            {"status": "oikein"},
+            {"status": "väärin", "student_cmd": f"grep x{n}"},
+        ])
+    (h / "rikki-2024-01-01T10-00-00.json").write_text("{", encoding="utf-8")
+
+    assert rs.import_dir(kanta, h) == (12, 0)
+    assert rs.import_dir(kanta, h) == (0, 13)
+    sarakkeet, uusimmat, _ = s.collect_columns_incremental(h, tmp_path / "manifest.json")
+    assert list(rs.latest_rows(kanta)) == [sarakkeet.row(i) for i in uusimmat]
+
+
+def test_uudelleen_tuonti_korvaa(kanta, tmp_path):
+    polku = _tulos(tmp_path / "s1-2024-01-01T10-00-00.json", 0, [{"status": "väärin"}])
+    rs.ingest_file(kanta, polku)
+    _tulos(polku, 1, [{"status": "oikein"}])
+    rs.ingest_file(kanta, polku)
+    [rivi] = rs.latest_rows(kanta)
+    assert (rivi.score, kanta.execute("SELECT count(*) FROM results").fetchone()[0]) == (1, 1)
+
+
+def test_ingest_aikaleima_tiedoston_mtimesta(kanta, tmp_path):
+    a = _tulos(tmp_path / "a.json", 0, [{"status": "väärin"}])
+    b = _tulos(tmp_path / "b.json", 1, [{"status": "oikein"}])
+    os.utime(a, (1_700_000_000, 1_700_000_000))
+    os.utime(b, (1_700_000_060, 1_700_000_060))
+
+    varatut = set()
+    rivit = [rs.ingest_file(kanta, p, "s1", reserved=varatut) for p in (a, b)]
+    assert [r.source_file for r in rivit] == ["s1-2023-11-14T22-13-20.json", "s1-2023-11-14T22-14-20.json"]
+    assert kanta.execute("SELECT count(*) FROM results").fetchone()[0] == 2
+    [uusin] = rs.latest_rows(kanta)
+    assert uusin.score == 1
+
+
+def test_ingest_hylkaa_saman_tunnisteen(kanta, tmp_path):
+    aika = datetime(2024, 1, 1, 10)
+    a = _tulos(tmp_path / "a.json", 1, [{"status": "oikein"}])
+    b = _tulos(tmp_path / "b.json", 0, [{"status": "väärin"}])
+    varatut = set()
+    rs.ingest_file(kanta, a, "s1", aika, varatut)
+    with pytest.raises(rs.DuplicateSourceError):
+        rs.ingest_file(kanta, b, "s1", aika, varatut)
+    [rivi] = rs.latest_rows(kanta)
+    assert rivi.score == 1
+
+
+def test_ingest_opiskelijanumerosta(kanta, tmp_path):
+    polku = _tulos(tmp_path / "results.json", 1, [{"status": "oikein"}], opiskelijanumero="S 1234")
+    assert rs.ingest_file(kanta, polku).student == "s-1234"
+    assert rs.ingest_file(kanta, _tulos(tmp_path / "x.json", 1, [{"status": "oikein"}])) is None
+
+
+def test_tuonti_toimii_tools_hakemiston_ulkopuolelta(tmp_path):
+    koodi = ("import importlib.util\n"
+             f"spec = importlib.util.spec_from_file_location('rs', {str(JUURI / 'tools' / 'results_store.py')!r})\n"
+             "spec.loader.exec_module(importlib.util.module_from_spec(spec))\n")
+    subprocess.run([sys.executable, "-I", "-c", koodi], cwd=tmp_path, check=True)
@@ -0,0 +1,59 @@
+"""Rivi-indeksin välimuisti: rajattu määrä avoimia karttoja ja korvattujen sulkeminen."""
+import os
+
+import pytest
+
+from linuxcli_grep import riviindeksi
+from linuxcli_grep.riviindeksi import IndeksiSuljettu, rivi_indeksi
+
+
+@pytest.fixture(autouse=True)
+def _tyhja_valimuisti(monkeypatch, asetukset):
+    monkeypatch.setattr(riviindeksi, "_AVOIMET", riviindeksi.OrderedDict())
+
+
+def _tiedosto(tmp_path, nimi, teksti):
+    p = tmp_path / nimi
+    p.write_text(teksti, encoding="utf-8")
+    return str(p)
+
+
+def test_rivit_kuten_splitlines(tmp_path):
+    teksti = "eka\ntoka\n\nneljäs"
+    indeksi = rivi_indeksi(_tiedosto(tmp_path, "a.txt", teksti))
+    rivit = [bytes(r).decode("utf-8") for r in indeksi.rivit()]
+    assert [r.rstrip("\n") for r in rivit] == teksti.splitlines()
+    assert [bytes(r) for r in indeksi.loppu(2)] == [b"\n", "neljäs".encode("utf-8")]
+
+
+def test_avoimien_maara_on_rajattu(tmp_path, asetukset):
+    asetukset.riviindeksi_avoimet = 2
+    indeksit = [rivi_indeksi(_tiedosto(tmp_path, f"{i}.txt", f"rivi {i}\n")) for i in range(3)]
+
+    assert len(riviindeksi._AVOIMET) == 2
+    assert indeksit[0].suljettu
+    assert not indeksit[1].suljettu and not indeksit[2].suljettu
+    with pytest.raises(IndeksiSuljettu):
+        list(indeksit[0].rivit())
+
+
+def test_muuttunut_tiedosto_sulkee_vanhan_indeksin(tmp_path):
+    polku = _tiedosto(tmp_path, "a.txt", "vanha\n")
+    vanha = rivi_indeksi(polku)
+    with open(polku, "a", encoding="utf-8") as f:
+        f.write("uusi\n")
+    st = os.stat(polku)
+    os.utime(polku, ns=(st.st_atime_ns, st.st_mtime_ns + 10**9))
+
+    uusi = rivi_indeksi(polku)
+    assert uusi is not vanha and vanha.suljettu
+    assert [bytes(r) for r in uusi.rivit()] == [b"vanha\n", b"uusi\n"]
+
+
+def test_kaytossa_olevaa_karttaa_ei_suljeta(tmp_path):
+    indeksi = rivi_indeksi(_tiedosto(tmp_path, "a.txt", "rivi\n"))
+    rivi = indeksi.rivi(0)
+    assert indeksi.sulje() is False
+    assert bytes(rivi) == b"rivi\n"
+    rivi.release()
+    assert indeksi.sulje() is True
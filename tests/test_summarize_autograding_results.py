@@ -0,0 +1,108 @@
+"""Yhteenvetotyökalun manifesti: rivi kerrallaan luettava sarakemuoto."""
+import json
+import sys
+
+import pytest
+
+from conftest import JUURI
+
+sys.path.insert(0, str(JUURI / "tools"))
+
+import summarize_autograding_results as s  # noqa: E402
+
+
+def _tulos(hakemisto, nimi, pisteet, per_task):
+    (hakemisto / nimi).write_text(json.dumps({"score": pisteet, "total": len(per_task), "per_task": per_task}),
+                                  encoding="utf-8")
+
+
+@pytest.fixture
+def tulokset(tmp_path):
+    h = tmp_path / "results"
+    h.mkdir()
+    for n in range(30):
+        _tulos(h, f"s{n % 7}-2024-01-{n % 28 + 1:02d}T1{n // 28}-00-00.json", n % 3, [
+            {"status": "oikein"},
+            {"status": "väärin", "student_cmd": f"grep x{n % 4}"},
+            {"status": "ei_vastattu"},
+        ])
+    (h / "rikki-2024-01-01T10-00-00.json").write_text("{", encoding="utf-8")
+    return h
+
+
+def _sarakkeet(c):
+    return ([getattr(c, x) for x in c.STRING_COLUMNS] + [bytes(c.status)]
+            + [getattr(c, x).tolist() for x in c.INT_COLUMNS])
+
+
+def test_manifesti_palautuu_palasina(tulokset, tmp_path, monkeypatch):
+    monkeypatch.setattr(s, "MANIFEST_CHUNK", 4)
+    manifesti = tmp_path / "manifest.json"
+    sarakkeet, uusimmat, jasennetty = s.collect_columns_incremental(tulokset, manifesti)
+    assert jasennetty == 31
+    s.save_manifest(manifesti, sarakkeet, uusimmat)
+    rivit = manifesti.read_text(encoding="utf-8").splitlines()
+    assert json.loads(rivit[0]) == {"version": s.MANIFEST_VERSION, "byteorder": sys.byteorder}
+    assert len(rivit) > 10
+
+    ladattu = s.load_manifest(manifesti)
+    assert _sarakkeet(ladattu) == _sarakkeet(sarakkeet)
+
+    toinen, toiset_uusimmat, jasennetty = s.collect_columns_incremental(tulokset, manifesti)
+    assert jasennetty == 0
+    assert [toinen.row(i) for i in toiset_uusimmat] == [sarakkeet.row(i) for i in uusimmat]
+
+
+@pytest.mark.parametrize("sisalto", [
+    "",
+    '{"version": 2, "files": {}}',
+    '{"version": 3, "byteorder": "%s"}\n["names", ["a.json"]]\n' % sys.byteorder,
+    '{"version": 3, "byteorder": "%s"}\n["tuntematon", []]\n' % sys.byteorder,
+    '{"version": 3, "byteorder": "%s"}\n["size", "eibase64!"]\n' % sys.byteorder,
+    '{"version": 3, "byteorder": "%s"}\n{' % sys.byteorder,
+])
+def test_virheellinen_manifesti_on_tyhja(tmp_path, sisalto):
+    manifesti = tmp_path / "manifest.json"
+    manifesti.write_text(sisalto, encoding="utf-8")
+    assert len(s.load_manifest(manifesti)) == 0
+
+
+def test_vaarat_komennot_vain_uusimmista(tmp_path):
+    h = tmp_path / "results"
+    h.mkdir()
+    _tulos(h, "a-2024-01-01T10-00-00.json", 0, [{"status": "väärin", "student_cmd": "grep vanha"}])
+    _tulos(h, "a-2024-01-02T10-00-00.json", 1, [{"status": "oikein"}])
+    _tulos(h, "b-2024-01-01T10-00-00.json", 0, [{"status": "väärin", "student_cmd": "grep uusi"}])
+    sarakkeet, uusimmat, _ = s.collect_columns_incremental(h, tmp_path / "manifest.json")
+    [tilasto] = s.task_stats(sarakkeet, uusimmat)
+    assert (tilasto.students, tilasto.passed, tilasto.answered) == (2, 1, 2)
+    assert {sarakkeet.commands[c]: n for c, n in tilasto.wrong.items()} == {"grep uusi": 1}
+
+
+def test_hakemiston_jarjestys_ei_vaikuta(tmp_path, monkeypatch):
+    h = tmp_path / "results"
+    h.mkdir()
+    # Samat ajat ja kirjainkoosta riippumatta sama nimi: vain tiedostonimi ratkaisee
+    for nimi, pisteet in (("A", 1), ("a", 0), ("b", 1)):
+        _tulos(h, f"{nimi}-2024-01-01T10-00-00.json", pisteet, [{"status": "oikein"}])
+    scandir = s.os.scandir
+
+    class Kaannetty:
+        def __init__(self, polku):
+            self._it = scandir(polku)
+
+        def __enter__(self):
+            return reversed(list(self._it.__enter__()))
+
+        def __exit__(self, *exc):
+            return self._it.__exit__(*exc)
+
+    tulokset = []
+    for jarjestys in (scandir, Kaannetty):
+        monkeypatch.setattr(s.os, "scandir", jarjestys)
+        manifesti = tmp_path / f"manifest-{len(tulokset)}.json"
+        sarakkeet, uusimmat, _ = s.collect_columns_incremental(h, manifesti)
+        tulokset.append(([sarakkeet.row(i) for i in uusimmat], manifesti.read_bytes()))
+    assert tulokset[0] == tulokset[1]
+    assert [r.source_file for r in tulokset[0][0]] == [
+        "A-2024-01-01T10-00-00.json", "a-2024-01-01T10-00-00.json", "b-2024-01-01T10-00-00.json"]
@@ -0,0 +1,65 @@
+"""Tehtäväsarjat: listaus, valinta komentoriviltä, nimiavaruudet ja laiska jäsennys."""
+import json
+from pathlib import Path
+
+import pytest
+
+from linuxcli_grep import cli, tehtavasarjat
+from linuxcli_grep.tila import lataa_tila, tallenna_tila
+
+
+def test_sets_listaa_sarjat(komentorivi, capsys):
+    cli.main(["sets"])
+    rivit = capsys.readouterr().out.splitlines()
+    assert [r.split(":")[0] for r in rivit] == ["grep (oletus)", "awk", "sed"]
+    assert "sallitut: awk sort" in rivit[1]
+
+
+def test_tuntematon_sarja(komentorivi, capsys):
+    with pytest.raises(SystemExit) as poistuminen:
+        cli.main(["--set", "ei-tallaista", "--check"])
+    assert poistuminen.value.code == 2
+    assert "Tuntematon tehtäväsarja: ei-tallaista (sarjat: grep, awk, sed)" in capsys.readouterr().out
+
+
+def test_check_toisella_sarjalla(komentorivi, tmp_path):
+    awk = tehtavasarjat.rekisteri().sarja("awk").tehtavat()
+    grep = tehtavasarjat.rekisteri().sarja("grep").tehtavat()
+    tila = {
+        "nimi": "Testi", "opiskelijanumero": "1",
+        # Oletussarjan avaimet ilman etuliitettä; sama numero ei sekoitu awk-sarjaan
+        "0": {"status": "oikein", "student_cmd": grep[0][1]},
+        "awk:0": {"status": "oikein", "student_cmd": awk[0][1]},
+        "awk:1": {"status": "oikein", "student_cmd": awk[0][1]},
+        "awk:2": {"status": "väärin", "student_cmd": awk[2][1]},
+    }
+    tallenna_tila(tila)
+
+    with pytest.raises(SystemExit) as poistuminen:
+        cli.main(["--set", "awk", "--check", "--jobs", "2"])
+    assert poistuminen.value.code == 1
+    assert not Path(tmp_path / "results.json").exists()
+    tulos = json.loads((tmp_path / "results-awk.json").read_text(encoding="utf-8"))
+    assert (tulos["score"], tulos["total"]) == (1, len(awk))
+    assert [t["status"] for t in tulos["per_task"][:4]] == ["oikein", "väärin", "väärin", "ei_vastattu"]
+
+    tallennettu = lataa_tila()
+    assert tallennettu["0"] == tila["0"]
+    assert tallennettu["awk:1"]["status"] == "väärin"
+
+
+def test_sarjat_jasennetaan_laiskasti(komentorivi, monkeypatch):
+    luetut = []
+    lue = tehtavasarjat.lue_tehtavat
+    monkeypatch.setattr(tehtavasarjat, "lue_tehtavat", lambda polku: luetut.append(polku) or lue(polku))
+
+    r = tehtavasarjat.rekisteri()
+    assert r.tunnisteet() == ["grep", "awk", "sed"]
+    sarja = tehtavasarjat.valitse("awk")
+    assert luetut == []
+    assert komentorivi.tila_etuliite == "awk:" and komentorivi.results_file.endswith("results-awk.json")
+
+    tehtavat = tehtavasarjat.avaa_tehtavat()
+    assert tehtavasarjat.avaa_tehtavat() is tehtavat
+    assert luetut == [sarja.tiedosto]
+    assert r.sarja("sed")._tehtavat is None
@@ -0,0 +1,67 @@
+"""Tehtävänipun avaus: lähdetiedoston tunnistus koon, mtime_ns:n ja tiivisteen perusteella."""
+import base64
+import os
+
+from linuxcli_grep import tehtavat
+from linuxcli_grep.tehtavat import (TehtavaNippu, jasenna_tehtavat, kirjoita_nippu, lue_tehtavat,
+                                    nipun_polku)
+
+TEHTAVAT = "# Etsi rivit, joilla on Error\ngrep Error data/log.txt\n\n# Laske rivit\nwc -l data/log.txt\n"
+
+
+def _lahde(tmp_path, teksti=TEHTAVAT):
+    p = tmp_path / "tehtavat.txt.enc"
+    p.write_bytes(base64.b64encode(teksti.encode("utf-8")))
+    return p
+
+
+def test_nippu_vastaa_jasennysta(tmp_path):
+    lahde = _lahde(tmp_path)
+    kirjoita_nippu(lahde)
+    nippu = lue_tehtavat(str(lahde))
+    assert isinstance(nippu, TehtavaNippu)
+    assert list(nippu) == jasenna_tehtavat(TEHTAVAT)
+
+
+def test_ennallaan_olevaa_lahdetta_ei_tiivisteta(tmp_path, monkeypatch):
+    lahde = _lahde(tmp_path)
+    kirjoita_nippu(lahde)
+
+    def ei_saa_kutsua(_polku):
+        raise AssertionError("lähde tiivistettiin, vaikka koko ja mtime_ns täsmäävät")
+
+    monkeypatch.setattr(tehtavat, "_sha256_tiedosto", ei_saa_kutsua)
+    assert TehtavaNippu.avaa(nipun_polku(lahde), lahde) is not None
+
+
+def test_muuttunut_mtime_tiivistetaan(tmp_path, monkeypatch):
+    lahde = _lahde(tmp_path)
+    kirjoita_nippu(lahde)
+    tiedot = lahde.stat()
+    os.utime(lahde, ns=(tiedot.st_atime_ns, tiedot.st_mtime_ns + 10**9))
+
+    kutsut = []
+    alkuperainen = tehtavat._sha256_tiedosto
+    monkeypatch.setattr(tehtavat, "_sha256_tiedosto", lambda p: kutsut.append(p) or alkuperainen(p))
+    # Sisältö ennallaan (esim. git checkout): nippu kelpaa tiivisteen perusteella
+    assert TehtavaNippu.avaa(nipun_polku(lahde), lahde) is not None
+    assert kutsut == [lahde]
+
+
+def test_muuttunut_sisalto_hylataan(tmp_path):
+    lahde = _lahde(tmp_path)
+    kirjoita_nippu(lahde)
+    tiedot = lahde.stat()
+    muutettu = TEHTAVAT.replace("Error", "Errox")
+    lahde.write_bytes(base64.b64encode(muutettu.encode("utf-8")))
+    os.utime(lahde, ns=(tiedot.st_atime_ns, tiedot.st_mtime_ns + 10**9))
+
+    assert TehtavaNippu.avaa(nipun_polku(lahde), lahde) is None
+    assert lue_tehtavat(str(lahde)) == jasenna_tehtavat(muutettu)
+
+
+def test_versionhallinnan_nippu_on_ajan_tasalla(juuri):
+    lahde = juuri / "data" / "tasks" / "tehtavat.txt.enc"
+    nippu = TehtavaNippu.avaa(nipun_polku(lahde), lahde)
+    assert nippu is not None, "käännä nippu: python3 tools/manage_tasks.py bundle"
+    assert list(nippu) == jasenna_tehtavat(tehtavat.dekoodaa_tehtavat(lahde.read_text(encoding="utf-8")))
@@ -0,0 +1,121 @@
+"""tila.json-vedoksen ja journalin toisto, tiivistys ja poistumistiet."""
+import json
+from pathlib import Path
+
+import pytest
+
+from linuxcli_grep import tila as tila_moduuli
+from linuxcli_grep.tila import (journal_polku, kirjaa_tila, lataa_tila, tallenna_tila,
+                                tiivista_journal)
+
+
+@pytest.fixture(autouse=True)
+def _nollaa_laskuri(monkeypatch):
+    monkeypatch.setattr(tila_moduuli, "_journal_rivit", 0)
+
+
+def _vedos(asetukset):
+    return json.loads(Path(asetukset.tila_tiedosto).read_text(encoding="utf-8"))
+
+
+def test_journal_toistetaan_vedoksen_paalle(asetukset):
+    tila = {"nimi": "Testi", "tehtava_1": {"status": "väärin"}}
+    tallenna_tila(tila)
+    tila["tehtava_1"] = {"status": "oikein"}
+    kirjaa_tila(tila, "tehtava_1")
+    tila["tehtava_2"] = {"status": "väärin"}
+    kirjaa_tila(tila, "tehtava_2")
+
+    assert journal_polku(Path(asetukset.tila_tiedosto)).exists()
+    assert _vedos(asetukset)["tehtava_1"] == {"status": "väärin"}
+    assert lataa_tila() == tila
+
+
+def test_kesken_jaanyt_journalrivi_ohitetaan(asetukset):
+    tila = {"tehtava_1": {"status": "väärin"}}
+    tallenna_tila(tila)
+    tila["tehtava_1"] = {"status": "oikein"}
+    kirjaa_tila(tila, "tehtava_1")
+    with open(journal_polku(Path(asetukset.tila_tiedosto)), "a", encoding="utf-8") as f:
+        f.write('{"k":"tehtava_2","v":{"sta')
+
+    assert lataa_tila() == tila
+
+
+@pytest.mark.parametrize("tietue", ["[]", "1", "null", '"x"', '{"k":1,"v":2}', '{"k":"tehtava_3"}', '{"v":1}'])
+def test_muut_kuin_muutostietueet_ohitetaan(asetukset, tietue):
+    tila = {"tehtava_1": {"status": "väärin"}}
+    tallenna_tila(tila)
+    with open(journal_polku(Path(asetukset.tila_tiedosto)), "w", encoding="utf-8") as f:
+        f.write(tietue + '\n{"k":"tehtava_2","v":{"status":"oikein"}}\n')
+
+    assert lataa_tila() == {**tila, "tehtava_2": {"status": "oikein"}}
+
+
+def test_kesken_jaanyt_rivi_ei_niele_seuraavaa(asetukset):
+    tila = {"tehtava_1": {"status": "väärin"}}
+    tallenna_tila(tila)
+    with open(journal_polku(Path(asetukset.tila_tiedosto)), "w", encoding="utf-8") as f:
+        f.write('{"k":"tehtava_1","v":{"sta')
+    tila["tehtava_2"] = {"status": "oikein"}
+    kirjaa_tila(tila, "tehtava_2")
+
+    assert lataa_tila() == tila
+
+
+def test_tiivistysvali_kirjoittaa_vedoksen(asetukset):
+    asetukset.tila_tiivistysvali = 3
+    tila = {}
+    tallenna_tila(tila)
+    for i in range(1, 4):
+        tila[f"tehtava_{i}"] = {"status": "oikein"}
+        kirjaa_tila(tila, f"tehtava_{i}")
+
+    assert not journal_polku(Path(asetukset.tila_tiedosto)).exists()
+    assert _vedos(asetukset) == tila
+
+
+def test_tiivista_journal_jattaa_vedoksen_ajan_tasalle(asetukset):
+    tila = {"nimi": "Testi"}
+    tallenna_tila(tila)
+    assert tiivista_journal(tila) is False
+
+    tila["tehtava_1"] = {"status": "oikein"}
+    kirjaa_tila(tila, "tehtava_1")
+    assert tiivista_journal(tila) is True
+    assert not journal_polku(Path(asetukset.tila_tiedosto)).exists()
+    assert _vedos(asetukset) == tila
+
+
+def test_edellisen_session_journal_tiivistetaan(asetukset, monkeypatch):
+    tila = {"nimi": "Testi"}
+    tallenna_tila(tila)
+    tila["tehtava_1"] = {"status": "oikein"}
+    kirjaa_tila(tila, "tehtava_1")
+
+    # Uusi prosessi: laskuri nollassa, journal levyllä
+    monkeypatch.setattr(tila_moduuli, "_journal_rivit", 0)
+    ladattu = lataa_tila()
+    assert tiivista_journal(ladattu) is True
+    assert _vedos(asetukset) == tila
+
+
+def test_keskeytetty_sessio_tallentaa_vastaukset(asetukset, monkeypatch):
+    from linuxcli_grep import interaktiivinen
+
+    tila = {"nimi": "Testi", "opiskelijanumero": "123"}
+    tallenna_tila(tila)
+    syotteet = iter(["grep a data/ei-olemassa.txt"])
+
+    def syote(_kehote=""):
+        try:
+            return next(syotteet)
+        except StopIteration:
+            raise KeyboardInterrupt
+
+    monkeypatch.setattr("builtins.input", syote)
+    interaktiivinen.interactive_mode()
+
+    assert not journal_polku(Path(asetukset.tila_tiedosto)).exists()
+    vedos = _vedos(asetukset)
+    assert any(k.startswith(asetukset.tila_etuliite) for k in vedos)
@@ -0,0 +1,111 @@
+"""Levyvälimuistien rajat, viivästetty kirjoitus ja tuomiovälimuistin mitätöinti."""
+import json
+
+import pytest
+
+from linuxcli_grep import valimuisti
+from linuxcli_grep.valimuisti import LevyValimuisti, ViiteValimuisti, vertaa_tuomiolla
+from linuxcli_grep.vertailu import tulosteen_tiivisteet
+
+
+def test_lru_rajaa_maaran_ja_tavut(tmp_path):
+    v = LevyValimuisti(tmp_path / "v.json", maksimi=3, maksimi_tavut=30)
+    for avain in "abc":
+        v.tallenna(avain, "x" * 5)          # 7 tavua JSON-muodossa
+    assert v.hae("a") is not None            # a uusimmaksi
+    v.tallenna("d", "x" * 5)
+    assert v.hae("b") is None and len(v) == 3
+
+    v.tallenna("e", "y" * 20)                # 22 tavua: vanhimmat väistyvät
+    assert [k for k in "acde" if v.hae(k) is not None] == ["d", "e"]
+    assert v.tavut == 29
+
+    v.tallenna("iso", "z" * 100)             # rajaa suurempaa ei tallenneta
+    assert v.hae("iso") is None and v.hae("e") is not None
+
+
+def test_viivastetty_kirjoitetaan_vasta_kutsulla(tmp_path):
+    polku = tmp_path / "v.json"
+    v = LevyValimuisti(polku, viivastetty=True)
+    v.tallenna("a", "1")
+    v.tallenna("b", "2")
+    assert not polku.exists()
+    v.kirjoita()
+    assert json.loads(polku.read_text(encoding="utf-8"))["merkinnat"] == {"a": "1", "b": "2"}
+
+
+def test_ladattaessa_noudatetaan_rajoja(tmp_path):
+    polku = tmp_path / "v.json"
+    v = LevyValimuisti(polku)
+    for n in range(5):
+        v.tallenna(str(n), "x" * 10)
+    pienempi = LevyValimuisti(polku, maksimi=10, maksimi_tavut=30)
+    assert [k for k in "01234" if pienempi.hae(k) is not None] == ["3", "4"]
+
+
+def test_viitevalimuisti_kirjoitetaan_ajon_lopussa(asetukset, monkeypatch):
+    monkeypatch.setattr(valimuisti, "_VIITE_VALIMUISTI", None)
+    monkeypatch.setattr(valimuisti, "_TUOMIO_VALIMUISTI", None)
+    tiedosto = asetukset.valimuisti_hakemisto / "viitetulokset.json"
+    cmd = "grep '^Asiakas:' data/asiakastiedot.txt"
+    tulos = valimuisti.aja_oikea_komento(cmd)
+    assert tulos and not tiedosto.exists()
+    valimuisti.kirjoita_valimuistit()
+    uusi = ViiteValimuisti(tiedosto)
+    assert uusi.hae(uusi.avain(cmd)) == tulos
+
+
+@pytest.fixture
+def vertailut(asetukset, monkeypatch):
+    """Lista komennoista, joiden tuomio laskettiin (ei saatu välimuistista)."""
+    monkeypatch.setattr(valimuisti, "_TUOMIO_VALIMUISTI", None)
+    ajetut = []
+    vertaa = valimuisti.vertaa_virtana
+
+    def laskettu(cmd, viite, *args):
+        ajetut.append(cmd)
+        return vertaa(cmd, viite, *args)
+
+    monkeypatch.setattr(valimuisti, "vertaa_virtana", laskettu)
+    return ajetut
+
+
+def test_tuomio_mitatoityy_datan_muuttuessa(vertailut, tmp_path):
+    tiedosto = tmp_path / "data.txt"
+    tiedosto.write_text("a\nb\n", encoding="utf-8")
+    cmd, viite = f"cat {tiedosto}", tulosteen_tiivisteet("a\nb")
+    assert vertaa_tuomiolla(0, cmd, viite).sama
+    assert vertaa_tuomiolla(0, cmd, viite).sama and len(vertailut) == 1
+
+    tiedosto.write_text("a\nbb\n", encoding="utf-8")
+    assert not vertaa_tuomiolla(0, cmd, viite).sama
+    assert len(vertailut) == 2
+
+
+def test_tuomio_mitatoityy_viitteen_muuttuessa(vertailut, tmp_path):
+    # Oikean komennon (tai sen datan) muutos näkyy eri viitetulosteena
+    tiedosto = tmp_path / "data.txt"
+    tiedosto.write_text("a\nb\n", encoding="utf-8")
+    cmd = f"cat {tiedosto}"
+    assert vertaa_tuomiolla(0, cmd, tulosteen_tiivisteet("a\nb")).sama
+    assert not vertaa_tuomiolla(0, cmd, tulosteen_tiivisteet("a")).sama
+    assert len(vertailut) == 2
+
+
+@pytest.mark.parametrize("muutos", ["versio", "moottori", "tulosteraja", "tehtava"])
+def test_tuomio_mitatoityy_vertailun_muuttuessa(vertailut, asetukset, tmp_path, monkeypatch, muutos):
+    tiedosto = tmp_path / "data.txt"
+    tiedosto.write_text("a\nb\n", encoding="utf-8")
+    cmd, viite = f"cat {tiedosto}", tulosteen_tiivisteet("a\nb")
+    vertaa_tuomiolla(0, cmd, viite)
+    i = 0
+    if muutos == "versio":
+        monkeypatch.setattr(valimuisti, "VERTAILUN_VERSIO", valimuisti.VERTAILUN_VERSIO + 1)
+    elif muutos == "moottori":
+        asetukset.suoritusmoottori = "inprocess"
+    elif muutos == "tulosteraja":
+        asetukset.maksimi_tuloste = 2
+    else:
+        i = 1
+    vertaa_tuomiolla(i, cmd, viite)
+    assert len(vertailut) == 2
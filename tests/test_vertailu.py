@@ -0,0 +1,79 @@
+"""Virtaava vertailu vastaa vertailua `set(a.strip().splitlines()) == set(b.strip().splitlines())`."""
+import random
+
+import pytest
+
+from linuxcli_grep.vertailu import _vertaa_rivit, stripatut_rivit, tulosteen_tiivisteet, vertaa_virtana
+
+ESIMERKIT = [
+    "",
+    "\n",
+    "  \n\t\n",
+    "a",
+    "a\n",
+    "\n\na\nb\n\n",
+    "  a  \n b \n\n  \n",
+    "a\r\nb\r\n",
+    "a\rb\r",
+    "a\n\nb\n \nc\n",
+    "a\x0bb\x0cc\x1cd\x85e f",
+    "b\na\nb\na\n",
+    "ä\nö\n€\n",
+]
+
+
+def _odotettu(teksti):
+    return teksti.strip().splitlines()
+
+
+def _satunnainen(r):
+    return "".join(r.choice("ab  \t\n\n\r\x0b ") for _ in range(r.randrange(30)))
+
+
+def _palat(teksti, r):
+    rajat = sorted(r.randrange(len(teksti) + 1) for _ in range(r.randrange(5)))
+    alut = [0] + rajat
+    return [teksti[a:b] for a, b in zip(alut, rajat + [len(teksti)])]
+
+
+@pytest.mark.parametrize("teksti", ESIMERKIT)
+def test_stripatut_rivit_kaikilla_paloilla(teksti):
+    odotettu = _odotettu(teksti)
+    assert list(stripatut_rivit([teksti])) == odotettu
+    assert list(stripatut_rivit(list(teksti))) == odotettu
+    assert list(stripatut_rivit(teksti.splitlines(True))) == odotettu
+    for k in range(len(teksti) + 1):
+        assert list(stripatut_rivit([teksti[:k], "", teksti[k:]])) == odotettu
+
+
+def test_stripatut_rivit_satunnaisesti():
+    r = random.Random(4)
+    for _ in range(3000):
+        teksti = _satunnainen(r)
+        assert list(stripatut_rivit(_palat(teksti, r))) == _odotettu(teksti), repr(teksti)
+
+
+def test_vertaa_rivit_vastaa_joukkovertailua():
+    r = random.Random(7)
+    tulosteet = ESIMERKIT + [_satunnainen(r) for _ in range(60)]
+    for viite in tulosteet:
+        tiivisteet = tulosteen_tiivisteet(viite.strip())
+        for oma in tulosteet:
+            odotettu = set(_odotettu(oma)) == set(_odotettu(viite))
+            assert _vertaa_rivit(_palat(oma, r), tiivisteet, 10**6).sama == odotettu, (viite, oma)
+
+
+def test_vertaa_rivit_kokoraja():
+    tulos = _vertaa_rivit(["a\n"] * 10, tulosteen_tiivisteet("a"), 5)
+    assert (tulos.sama, tulos.syy) == (False, "tuloste liian suuri")
+
+
+@pytest.mark.parametrize("moottori", ["subprocess", "inprocess"])
+def test_vertaa_virtana_komennolla(asetukset, tmp_path, moottori):
+    asetukset.suoritusmoottori = moottori
+    tiedosto = tmp_path / "rivit.txt"
+    tiedosto.write_text("\n  kolme\nyksi\nkaksi\nyksi\n\n", encoding="utf-8")
+    oikea = "yksi\nkaksi\nkolme"
+    assert vertaa_virtana(f"cat {tiedosto}", tulosteen_tiivisteet(oikea)).sama
+    assert not vertaa_virtana(f"cat {tiedosto}", tulosteen_tiivisteet("yksi\nkaksi")).sama
+    assert not vertaa_virtana(f"grep yksi {tiedosto}", tulosteen_tiivisteet(oikea)).sama
@@ -0,0 +1,212 @@
+#!/usr/bin/env python3
+"""Mikrobenchmarkit arvioijan kuumille poluille.
+
+Mittaa `lue_tehtavat`, `turvallinen_komento`, `aja_komento`,
+`lataa_tila`/`tallenna_tila`/`kirjaa_tila` ja koko `check_mode`-ajon (myös, kun
+mikään ei ole muuttunut edellisestä validoinnista) kasvavilla
+syötteillä. Tulokset kirjoitetaan JSON-muodossa; aiempaan tulokseen
+verrattaessa hidastumat raportoidaan ja paluuarvo on 1.
+
+Käyttö (repositoryn juuresta):
+  python3 tools/benchmark.py --output bench.json
+  python3 tools/benchmark.py --baseline bench.json [--threshold 0.25]
+"""
+
+from __future__ import annotations
+
+import argparse
+import base64
+import contextlib
+import io
+import json
+import os
+import platform
+import statistics
+import sys
+import tempfile
+import time
+from pathlib import Path
+from typing import Callable
+
+sys.path.insert(0, str(Path(__file__).resolve().parent.parent / "src"))
+
+from linuxcli_grep import arviointi, tila, valimuisti  # noqa: E402
+from linuxcli_grep.konfiguraatio import asetukset  # noqa: E402
+from linuxcli_grep.suoritus import aja_komento, turvallinen_komento  # noqa: E402
+from linuxcli_grep.tehtavat import lue_tehtavat  # noqa: E402
+
+KIRJA = Path("data/kirja.txt")
+TEHTAVAT_PLAIN = Path("data/tasks/tehtavat.txt")
+
+KOMENNOT = {
+    "grep": "grep -E 'asianajaja|poliisi|lääkäri' {f}",
+    "wc": "wc -l {f}",
+    "sort": "sort {f}",
+    "uniq": "sort {f} | uniq -c",
+    "head": "head -n 100 {f}",
+    "tail": "tail -n 100 {f}",
+    "cat": "cat {f}",
+}
+
+
+def mittaa(fn: Callable[[], object], toistot: int) -> dict:
+    ajat = []
+    for _ in range(toistot):
+        alku = time.perf_counter()
+        fn()
+        ajat.append(time.perf_counter() - alku)
+    return {"median_s": statistics.median(ajat), "min_s": min(ajat), "runs": toistot}
+
+
+def skaalattu_kopio(lahde: Path, kerroin: int, kohde: Path) -> Path:
+    sisalto = lahde.read_bytes()
+    kohde.write_bytes(sisalto * kerroin)
+    return kohde
+
+
+def bench_lue_tehtavat(tmp: Path, kertoimet: list[int], toistot: int) -> dict:
+    tulokset = {}
+    teksti = TEHTAVAT_PLAIN.read_text(encoding="utf-8")
+    for k in kertoimet:
+        plain = tmp / f"tehtavat-{k}.txt"
+        plain.write_text(teksti * k, encoding="utf-8")
+        enc = tmp / f"tehtavat-{k}.txt.enc"
+        enc.write_text(base64.b64encode((teksti * k).encode("utf-8")).decode("ascii"), encoding="utf-8")
+        tulokset[f"lue_tehtavat/plain/x{k}"] = mittaa(lambda: lue_tehtavat(str(plain)), toistot)
+        tulokset[f"lue_tehtavat/base64/x{k}"] = mittaa(lambda: lue_tehtavat(str(enc)), toistot)
+    return tulokset
+
+
+def bench_turvallinen_komento(vaiheet: list[int], toistot: int) -> dict:
+    tulokset = {}
+    for n in vaiheet:
+        cmd = " | ".join(["grep -i 'jekyll' data/kirja.txt"] + ["sort -r", "uniq -c", "head -n 5"] * (n // 3))
+        tulokset[f"turvallinen_komento/{n}_vaihetta"] = mittaa(lambda: turvallinen_komento(cmd), toistot * 10)
+    return tulokset
+
+
+def bench_aja_komento(tmp: Path, kertoimet: list[int], toistot: int) -> dict:
+    tulokset = {}
+    for k in kertoimet:
+        f = KIRJA if k == 1 else skaalattu_kopio(KIRJA, k, tmp / f"kirja-{k}.txt")
+        for nimi, malli in KOMENNOT.items():
+            cmd = malli.format(f=f)
+            tulokset[f"aja_komento/{nimi}/x{k}"] = mittaa(lambda: aja_komento(cmd), toistot)
+    return tulokset
+
+
+def bench_tila(tmp: Path, koot: list[int], toistot: int) -> dict:
+    tulokset = {}
+    alkuperainen = asetukset().tila_tiedosto
+    try:
+        for n in koot:
+            asetukset().tila_tiedosto = str(tmp / f"tila-{n}.json")
+            tilasanakirja = {
+                str(i): {"status": "oikein", "student_cmd": f"grep 'rivi {i}' data/kirja.txt"}
+                for i in range(n)
+            }
+            tulokset[f"tallenna_tila/{n}"] = mittaa(lambda: tila.tallenna_tila(tilasanakirja), toistot)
+            tulokset[f"kirjaa_tila/{n}"] = mittaa(lambda: tila.kirjaa_tila(tilasanakirja, "0"), toistot)
+            tulokset[f"lataa_tila/{n}"] = mittaa(tila.lataa_tila, toistot)
+    finally:
+        asetukset().tila_tiedosto = alkuperainen
+    return tulokset
+
+
+def bench_check_mode(tmp: Path, toistot: int) -> dict:
+    tehtavat = lue_tehtavat(asetukset().tehtavat_tiedosto)
+    tila_polku = tmp / "check-tila.json"
+    tilasanakirja = {str(i): {"status": "oikein", "student_cmd": oikea} for i, (_, oikea) in enumerate(tehtavat)}
+
+    a = asetukset()
+    alkuperaiset = (a.tila_tiedosto, a.results_file, valimuisti._VIITE_VALIMUISTI)
+
+    def aja():
+        tila_polku.write_text(json.dumps(tilasanakirja), encoding="utf-8")
+        # Tyhjä välimuisti joka kierroksella: mitataan koko arviointi
+        valimuisti._VIITE_VALIMUISTI = valimuisti.ViiteValimuisti(tmp / "viite.json")
+        with contextlib.suppress(FileNotFoundError):
+            os.remove(tmp / "viite.json")
+        with contextlib.redirect_stdout(io.StringIO()), contextlib.suppress(SystemExit):
+            arviointi.check_mode()
+
+    def aja_ennallaan():
+        # Edellinen ajo tallensi sormenjäljet tilaan: mitään ei ajeta uudelleen
+        with contextlib.redirect_stdout(io.StringIO()), contextlib.suppress(SystemExit):
+            arviointi.check_mode(inkrementaalinen=True)
+
+    try:
+        a.tila_tiedosto = str(tila_polku)
+        a.results_file = str(tmp / "results.json")
+        return {
+            f"check_mode/{len(tehtavat)}_tehtavaa": mittaa(aja, toistot),
+            f"check_mode_ennallaan/{len(tehtavat)}_tehtavaa": mittaa(aja_ennallaan, toistot),
+        }
+    finally:
+        a.tila_tiedosto, a.results_file, valimuisti._VIITE_VALIMUISTI = alkuperaiset
+
+
+def vertaa_baseline(tulokset: dict, baseline: dict, kynnys: float) -> list[str]:
+    hidastumat = []
+    for nimi, arvo in sorted(tulokset.items()):
+        vanha = baseline.get("results", {}).get(nimi)
+        if not vanha:
+            continue
+        suhde = arvo["median_s"] / vanha["median_s"] if vanha["median_s"] else 1.0
+        merkki = "❌" if suhde > 1 + kynnys else "  "
+        print(f"{merkki} {nimi:<40} {vanha['median_s'] * 1000:9.2f} ms -> {arvo['median_s'] * 1000:9.2f} ms ({suhde:5.2f}x)")
+        if suhde > 1 + kynnys:
+            hidastumat.append(nimi)
+    return hidastumat
+
+
+def main() -> int:
+    parser = argparse.ArgumentParser(description="Aja linuxcli_grep-paketin mikrobenchmarkit.")
+    parser.add_argument("--output", help="Kirjoita tulokset JSON-tiedostoon")
+    parser.add_argument("--baseline", help="Vertaa aiempaan JSON-tulokseen")
+    parser.add_argument("--threshold", type=float, default=0.25,
+                        help="Sallittu hidastuma mediaanissa (oletus 0.25 = 25 %%)")
+    parser.add_argument("--repeat", type=int, default=5, help="Toistoja per mittaus (oletus 5)")
+    parser.add_argument("--quick", action="store_true", help="Pienemmät syötteet ja vähemmän toistoja")
+    args = parser.parse_args()
+
+    toistot = 2 if args.quick else args.repeat
+    kertoimet = [1, 10] if args.quick else [1, 10, 100]
+
+    tulokset: dict = {}
+    with tempfile.TemporaryDirectory() as d:
+        tmp = Path(d)
+        tulokset.update(bench_lue_tehtavat(tmp, kertoimet, toistot))
+        tulokset.update(bench_turvallinen_komento([3, 30, 300], toistot))
+        tulokset.update(bench_aja_komento(tmp, kertoimet[:2], toistot))
+        tulokset.update(bench_tila(tmp, [n * 10 for n in kertoimet], toistot))
+        tulokset.update(bench_check_mode(tmp, toistot))
+
+    raportti = {
+        "meta": {
+            "python": platform.python_version(),
+            "platform": platform.platform(),
+            "engine": asetukset().suoritusmoottori,
+            "timestamp": time.strftime("%Y-%m-%dT%H:%M:%S"),
+        },
+        "results": tulokset,
+    }
+
+    if args.output:
+        Path(args.output).write_text(json.dumps(raportti, indent=2), encoding="utf-8")
+        print(f"✅ Tulokset kirjoitettu: {args.output}")
+
+    if args.baseline:
+        baseline = json.loads(Path(args.baseline).read_text(encoding="utf-8"))
+        hidastumat = vertaa_baseline(tulokset, baseline, args.threshold)
+        if hidastumat:
+            print(f"\n❌ {len(hidastumat)} mittausta hidastui yli {args.threshold:.0%}")
+            return 1
+        print("\n✅ Ei hidastumia")
+    elif not args.output:
+        print(json.dumps(raportti, indent=2))
+    return 0
+
+
+if __name__ == "__main__":
+    raise SystemExit(main())
@@ -0,0 +1,131 @@
+#!/usr/bin/env python3
+"""Vertaa sisäisen suoritusmoottorin tulosteita oikeisiin ohjelmiin.
+
+Ajaa jokaisen komennon sekä `/bin/sh`:lla että `linuxcli_grep`-paketin sisäisellä
+moottorilla ja vertaa stdoutia tavu tavulta. Komennot ovat tehtävätiedoston
+oikeat vastaukset sekä alla oleva lista, joka kattaa tuetut optiot.
+
+Käyttö (repositoryn juuresta):
+  python3 tools/conformance.py [--verbose]
+"""
+
+from __future__ import annotations
+
+import argparse
+import subprocess
+import sys
+from pathlib import Path
+
+sys.path.insert(0, str(Path(__file__).resolve().parent.parent / "src"))
+
+from linuxcli_grep.konfiguraatio import asetukset  # noqa: E402
+from linuxcli_grep.moottori import TuetumatonKomento, aja_sisaisesti  # noqa: E402
+from linuxcli_grep.tehtavat import lue_tehtavat  # noqa: E402
+
+LISAKOMENNOT = [
+    "cat data/log.txt",
+    "cat -n data/users.csv",
+    "cat data/users.csv data/log.txt | wc -l",
+    "grep -c 'login' data/log.txt",
+    "grep -ci 'ERROR' data/log.txt",
+    "grep -vn 'User' data/log.txt",
+    "grep -w 'ei' data/kirja.txt",
+    "grep -ow 'ja' data/kirja.txt | wc -l",
+    "grep -x '' data/kirja.txt | wc -l",
+    "grep -F '.' data/asiakastiedot.txt",
+    "grep -e 'Mika' -e 'Anna' data/log.txt",
+    "grep -l 'Mika' data/log.txt data/users.csv data/kirja.txt",
+    "grep -H 'Error' data/log.txt",
+    "grep -h 'a' data/log.txt data/users.csv",
+    "grep 'a\\{2\\}' data/kirja.txt",
+    "grep 'ä\\(n\\|ä\\)' data/kirja.txt",
+    "grep -E '^[[:upper:]]' data/users.csv",
+    "grep -E '[[:digit:]]{4}-[[:digit:]]{2}' data/log.txt",
+    "grep -oE '[[:alpha:]]+ä' data/kirja.txt | head -20",
+    "grep -o '\\<[A-Z][a-z]*' data/kirja.txt | sort | uniq -c | sort -rn | head",
+    "grep -r 'Mika' data",
+    "grep -o 'a*' data/users.csv",
+    "grep -E 'x*' data/log.txt | wc -l",
+    "grep 'Error$' data/log.txt",
+    "grep '^$' data/kirja.txt | wc -l",
+    "grep -oE '[0-9]+(\\.[0-9]+)?' data/survey.csv",
+    "wc data/log.txt",
+    "wc -w data/kirja.txt",
+    "wc -l data/log.txt data/users.csv",
+    "wc -c data/kirja.txt",
+    "wc -m data/kirja.txt",
+    "cat data/log.txt | wc",
+    "cat data/log.txt | wc -lw",
+    "sort data/users.csv",
+    "sort -r data/log.txt",
+    "sort -f data/users.csv",
+    "sort -u data/kirja.txt | wc -l",
+    "grep -o '[0-9]*' data/log.txt | sort -n | uniq",
+    "sort data/kirja.txt | uniq -d | head",
+    "sort data/kirja.txt | uniq -u | wc -l",
+    "sort data/kirja.txt | uniq -ci | sort -n | tail -5",
+    "head data/kirja.txt",
+    "head -3 data/log.txt",
+    "head -n -20 data/log.txt",
+    "head -n 2 data/log.txt data/users.csv",
+    "tail data/kirja.txt",
+    "tail -n 4 data/log.txt",
+    "tail -n +20 data/log.txt",
+    "tail -2 data/users.csv data/log.txt",
+    "cat data/kirja.txt | head -100 | tail -5",
+]
+
+
+def komennot() -> list[str]:
+    tulos: list[str] = []
+    for tiedosto in sorted(Path("data/tasks").glob("*.txt")):
+        for _, oikea in lue_tehtavat(str(tiedosto)):
+            if oikea and oikea not in tulos:
+                tulos.append(oikea)
+    tulos.extend(LISAKOMENNOT)
+    return tulos
+
+
+def vertaa(cmd: str) -> tuple[str, str, str]:
+    """Palauttaa (tila, odotettu, saatu); tila on 'ok', 'ero' tai 'varaaja'."""
+    aikaraja = asetukset().timeout_seconds * 10
+    odotettu = subprocess.run(cmd, shell=True, capture_output=True, text=True,
+                              timeout=aikaraja).stdout
+    try:
+        saatu = "".join(aja_sisaisesti(cmd, aikaraja))
+    except TuetumatonKomento as e:
+        return "varaaja", odotettu, str(e)
+    return ("ok" if saatu == odotettu else "ero"), odotettu, saatu
+
+
+def main() -> int:
+    parser = argparse.ArgumentParser(description="Sisäisen moottorin yhdenmukaisuustesti.")
+    parser.add_argument("--verbose", "-v", action="store_true", help="Näytä erojen sisältö")
+    args = parser.parse_args()
+
+    laskurit = {"ok": 0, "ero": 0, "varaaja": 0}
+    for cmd in komennot():
+        tila, odotettu, saatu = vertaa(cmd)
+        laskurit[tila] += 1
+        merkki = {"ok": "✅", "ero": "❌", "varaaja": "↪️ "}[tila]
+        lisatieto = f"  ({saatu})" if tila == "varaaja" else ""
+        print(f"{merkki} {cmd}{lisatieto}")
+        if tila == "ero" and args.verbose:
+            odotetut = odotettu.splitlines()
+            saadut = saatu.splitlines()
+            for n, (a, b) in enumerate(zip(odotetut, saadut), start=1):
+                if a != b:
+                    print(f"    rivi {n}: odotettu {a!r}, saatu {b!r}")
+                    break
+            if len(odotetut) != len(saadut):
+                print(f"    rivejä: odotettu {len(odotetut)}, saatu {len(saadut)}")
+
+    print(
+        f"\nYhdenmukaisia: {laskurit['ok']}, eroja: {laskurit['ero']}, "
+        f"oikeaan ohjelmaan ohjattuja: {laskurit['varaaja']}"
+    )
+    return 1 if laskurit["ero"] else 0
+
+
+if __name__ == "__main__":
+    raise SystemExit(main())
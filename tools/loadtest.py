@@ -0,0 +1,447 @@
+#!/usr/bin/env python3
+"""Kuormitustesti: montako samanaikaista opiskelijaa yksi arviointikone kestää.
+
+Luo työhakemistoon synteettiset aineistot, jotka muistuttavat tiedostoja
+`data/kirja.txt`, `asiakastiedot.txt`, `users.csv` ja `log.txt` (halutun
+kokoisina, megatavuista gigatavuihin), ja ajaa N samanaikaista simuloitua
+opiskelijaa. Opiskelijat lähettävät oikeita ja vääriä komentoja
+tiedostoista `data/tasks/*.txt`: tehtävien oikeita komentoja (eri
+lainauksin), toisten tehtävien komentoja sekä awk/sed-komentoja, jotka
+hylätään. Komennot arvioidaan oikeaa polkua pitkin: oletuksena
+arviointipalvelimen (`linuxcli-grep serve`) kautta, `--mode local`
+-valinnalla kuten interaktiivinen tila ilman palvelinta.
+
+Raportoi läpäisyn, arvioinnin viiveen prosenttipisteet (p50/p95/p99) ja
+koneen muistinkäytön. Kaikki ajetaan paikallisesti.
+
+Käyttö (repositoryn juuresta):
+  python3 tools/loadtest.py --size 10M --students 20 --requests 400
+  python3 tools/loadtest.py --size 1G --students 50 --duration 120 --workdir /tmp/lt --keep
+"""
+
+from __future__ import annotations
+
+import argparse
+import json
+import os
+import random
+import re
+import shlex
+import shutil
+import signal
+import subprocess
+import sys
+import tempfile
+import threading
+import time
+from pathlib import Path
+
+JUURI = Path(__file__).resolve().parent.parent
+sys.path.insert(0, str(JUURI / "src"))
+
+from linuxcli_grep.asiakas import PalvelinAsiakas, PalvelinVirhe  # noqa: E402
+from linuxcli_grep.komentorivi import TuetumatonKomento, jasenna_putki  # noqa: E402
+from linuxcli_grep.tehtavat import jasenna_tehtavat  # noqa: E402
+from linuxcli_grep.vertailu import rivin_tiiviste, stripatut_rivit, tulosteen_tiivisteet  # noqa: E402
+
+KORPUKSET = ("kirja.txt", "asiakastiedot.txt", "users.csv", "log.txt")
+TEHTAVAT = "tehtavat.txt"
+YKSIKOT = {"": 1, "K": 1 << 10, "M": 1 << 20, "G": 1 << 30}
+_NUMERO = re.compile(rb"\d")
+
+
+def koko_tavuina(arvo: str) -> int:
+    m = re.fullmatch(r"(\d+(?:\.\d+)?)\s*([KMG]?)i?B?", arvo.strip(), re.IGNORECASE)
+    if not m:
+        raise argparse.ArgumentTypeError(f"tuntematon koko: {arvo} (esim. 512K, 10M, 2G)")
+    return int(float(m.group(1)) * YKSIKOT[m.group(2).upper()])
+
+
+# ---------- Aineistot ----------
+
+def _palat(rivit: list[bytes], satunnainen: random.Random, maara: int = 4096) -> list[bytes]:
+    """Satunnaisia yhtenäisiä rivijaksoja lähteestä; osassa numerot vaihdettu.
+
+    Jaksot säilyttävät tiedoston paikallisen rakenteen (esim. asiakastietojen
+    lohkot), ja numeroiden vaihtaminen tuottaa uusia puhelinnumeroita,
+    tunnuksia ja aikaleimoja samassa muodossa.
+    """
+    palat = []
+    for _ in range(maara):
+        alku = satunnainen.randrange(len(rivit))
+        pala = b"".join(rivit[alku:alku + satunnainen.randint(1, 32)])
+        if satunnainen.random() < 0.5:
+            pala = _NUMERO.sub(lambda _: b"%d" % satunnainen.randrange(10), pala)
+        palat.append(pala)
+    return palat
+
+
+def luo_korpus(lahde: Path, kohde: Path, koko: int, satunnainen: random.Random) -> None:
+    """Kirjoita täsmälleen `koko` tavun aineisto; viimeinen rivi päättyy rivinvaihtoon."""
+    rivit = lahde.read_bytes().splitlines(keepends=True)
+    if rivit and not rivit[-1].endswith(b"\n"):
+        rivit[-1] += b"\n"
+    otsake = rivit.pop(0) if lahde.suffix == ".csv" else b""
+    palat = _palat(rivit, satunnainen)
+    with open(kohde, "wb") as f:
+        f.write(otsake)
+        kirjoitettu = len(otsake)
+        while kirjoitettu < koko:
+            lohko = b"".join(satunnainen.choices(palat, k=1024))
+            if kirjoitettu + len(lohko) >= koko:
+                lohko = lohko[:koko - kirjoitettu]
+                if not lohko.endswith(b"\n"):
+                    lohko = lohko[:-1] + b"\n"
+            f.write(lohko)
+            kirjoitettu += len(lohko)
+
+
+def valmistele_tyohakemisto(tyo: Path, koko: int, siemen: int, aikaraja: int) -> None:
+    """Luo aineistot, tehtävätiedosto ja konfiguraatio työhakemistoon.
+
+    Aineistot luodaan uudelleen vain, jos koko tai siemen on muuttunut.
+    """
+    data = tyo / "data"
+    (data / "tasks").mkdir(parents=True, exist_ok=True)
+    kuvaus_polku = tyo / "korpus.json"
+    kuvaus = {"size": koko, "seed": siemen}
+    ajantasalla = kuvaus_polku.exists() and json.loads(kuvaus_polku.read_text()) == kuvaus
+    if not ajantasalla:
+        satunnainen = random.Random(siemen)
+        for nimi in KORPUKSET:
+            alku = time.perf_counter()
+            luo_korpus(JUURI / "data" / nimi, data / nimi, koko, satunnainen)
+            print(f"📄 {nimi:<18} {(data / nimi).stat().st_size / (1 << 20):9.1f} MiB "
+                  f"({time.perf_counter() - alku:.1f} s)")
+        kuvaus_polku.write_text(json.dumps(kuvaus))
+    # Muut datatiedostot (esim. `grep -R ./data/*`) sellaisinaan
+    for p in (JUURI / "data").iterdir():
+        if p.is_file() and p.name not in KORPUKSET:
+            shutil.copy2(p, data / p.name)
+    for p in (JUURI / "data" / "tasks").glob("*.txt"):
+        shutil.copy2(p, data / "tasks" / p.name)
+
+    config = json.loads((JUURI / "configs" / "config.json").read_text(encoding="utf-8"))
+    # Oletussarjan tehtävätiedosto on sarjan määrityksessä (task_sets), jos sellainen on
+    sarjat = config.get("task_sets") or {}
+    oletussarja = sarjat.get(config.get("default_task_set", "grep"))
+    if oletussarja is not None:
+        oletussarja["tasks_file"] = f"data/tasks/{TEHTAVAT}"
+    config.update({
+        "tehtavat_tiedosto": f"data/tasks/{TEHTAVAT}",
+        "tila_tiedosto": "configs/tila.json",
+        "results_file": "output/results.json",
+        "cache_dir": ".cache",
+        "daemon_socket": ".cache/loadtest.sock",
+        "timeout_seconds": aikaraja,
+    })
+    (tyo / "configs").mkdir(exist_ok=True)
+    (tyo / "configs" / "config.json").write_text(json.dumps(config, indent=2), encoding="utf-8")
+
+
+# ---------- Komentojen valinta ----------
+
+def lue_komennot(hakemisto: Path) -> tuple[list[str], list[str]]:
+    """Palauta (arvioitavien tehtävien oikeat komennot, muiden tehtäväsarjojen komennot)."""
+    oikeat = [c for _, c in jasenna_tehtavat((hakemisto / TEHTAVAT).read_text(encoding="utf-8"))]
+    muut = []
+    for p in sorted(hakemisto.glob("*.txt")):
+        if p.name != TEHTAVAT:
+            muut.extend(c for _, c in jasenna_tehtavat(p.read_text(encoding="utf-8")) if c)
+    return oikeat, muut
+
+
+def uudelleenlainattu(cmd: str) -> str:
+    """Sama komento eri lainauksin ja välilyönnein (sama argv)."""
+    try:
+        vaiheet = jasenna_putki(cmd)
+    except TuetumatonKomento:
+        return cmd
+    osat = []
+    for v in vaiheet:
+        osa = " ".join(shlex.quote(a) for a in v.argv)
+        if v.syote is not None:
+            osa += f" < {shlex.quote(v.syote)}"
+        if v.virheet_pois:
+            osa += " 2>/dev/null"
+        osat.append(osa)
+    return "  |  ".join(osat)
+
+
+def valitse_komento(oikeat: list[str], muut: list[str], satunnainen: random.Random,
+                    vaarin: float, hylatty: float) -> tuple[int, str]:
+    i = satunnainen.randrange(len(oikeat))
+    arpa = satunnainen.random()
+    if muut and arpa < hylatty:
+        return i, satunnainen.choice(muut)
+    if arpa < hylatty + vaarin:
+        return i, oikeat[satunnainen.randrange(len(oikeat))]
+    return i, oikeat[i] if satunnainen.random() < 0.5 else uudelleenlainattu(oikeat[i])
+
+
+# ---------- Muistinkäyttö ----------
+
+def _proc_kentat(polku: str, kentat: tuple[str, ...]) -> dict[str, int]:
+    """Lue kB-arvot /proc-tiedostosta (Linux); muualla tyhjä."""
+    tulos = {}
+    try:
+        with open(polku) as f:
+            for rivi in f:
+                nimi, _, arvo = rivi.partition(":")
+                if nimi in kentat:
+                    tulos[nimi] = int(arvo.split()[0]) * 1024
+    except OSError:
+        pass
+    return tulos
+
+
+class MuistiNaytteistin(threading.Thread):
+    """Näytteistää koneen käytetyn muistin ja palvelinprosessin RSS:n."""
+
+    def __init__(self, pid: int, vali_s: float = 0.25):
+        super().__init__(daemon=True)
+        self.pid = pid
+        self.vali_s = vali_s
+        self.kone: list[int] = []
+        self.prosessi: list[int] = []
+        self._loppu = threading.Event()
+
+    @staticmethod
+    def koneen_kaytto() -> int | None:
+        m = _proc_kentat("/proc/meminfo", ("MemTotal", "MemAvailable"))
+        return m["MemTotal"] - m["MemAvailable"] if len(m) == 2 else None
+
+    def run(self) -> None:
+        while not self._loppu.wait(self.vali_s):
+            kone = self.koneen_kaytto()
+            if kone is not None:
+                self.kone.append(kone)
+            rss = _proc_kentat(f"/proc/{self.pid}/status", ("VmRSS",)).get("VmRSS")
+            if rss is not None:
+                self.prosessi.append(rss)
+
+    def lopeta(self) -> dict:
+        self._loppu.set()
+        self.join()
+        hwm = _proc_kentat(f"/proc/{self.pid}/status", ("VmHWM",)).get("VmHWM")
+        mib = 1 << 20
+        raportti: dict = {}
+        if self.kone:
+            raportti["host_used_peak_mib"] = round(max(self.kone) / mib, 1)
+            raportti["host_used_mean_mib"] = round(sum(self.kone) / len(self.kone) / mib, 1)
+        if self.prosessi:
+            raportti["grader_rss_peak_mib"] = round(max(max(self.prosessi), hwm or 0) / mib, 1)
+        return raportti
+
+
+# ---------- Simuloidut opiskelijat ----------
+
+class Tulokset:
+    def __init__(self):
+        self.viiveet: list[float] = []
+        self.tuomiot = {"oikein": 0, "väärin": 0, "hylätty": 0, "virhe": 0}
+        self._lukko = threading.Lock()
+
+    def kirjaa(self, tuomio: str, viive_s: float | None) -> None:
+        with self._lukko:
+            self.tuomiot[tuomio] += 1
+            if viive_s is not None:
+                self.viiveet.append(viive_s)
+
+
+def tuomio(opiskelija: str, oikea: str) -> str:
+    # Kuten interaktiivinen tila: tyhjä tuloste on väärin, rivit verrataan
+    # joukkoina samoilla rivitiivisteillä kuin arvioinnissa (`vertailu`)
+    if not opiskelija or opiskelija.startswith("(virhe:"):
+        return "väärin"
+    omat = frozenset(rivin_tiiviste(r) for r in stripatut_rivit([opiskelija]))
+    return "oikein" if omat == tulosteen_tiivisteet(oikea) else "väärin"
+
+
+def arvioija_palvelimella(soketti: Path, tunniste: str):
+    asiakas = PalvelinAsiakas.yhdista(soketti, aikaraja_s=600)
+    if asiakas is None:
+        raise RuntimeError("arviointipalvelimeen ei saatu yhteyttä")
+
+    def arvioi(i: int, cmd: str) -> str:
+        try:
+            return tuomio(*asiakas.arvioi(i, cmd, tunniste))
+        except PalvelinVirhe as e:
+            return "hylätty" if str(e) == "komento ei ole sallittu" else "virhe"
+    return arvioi, asiakas.sulje
+
+
+def arvioija_paikallisesti(oikeat: list[str]):
+    from linuxcli_grep.suoritus import turvallinen_komento
+    from linuxcli_grep.valimuisti import aja_oikea_komento
+    from linuxcli_grep.vertailu import vertaa_virtana
+
+    def arvioi(i: int, cmd: str) -> str:
+        if not turvallinen_komento(cmd):
+            return "hylätty"
+        # Sama virtaava vertailu kuin --check-tilassa; tyhjä viite on aina väärin
+        viite = tulosteen_tiivisteet(aja_oikea_komento(oikeat[i]))
+        return "oikein" if viite and vertaa_virtana(cmd, viite).sama else "väärin"
+    return arvioi, lambda: None
+
+
+def opiskelija(n: int, args: argparse.Namespace, oikeat: list[str], muut: list[str],
+               tulokset: Tulokset, laskuri: list[int], lukko: threading.Lock, loppu_aika: float) -> None:
+    satunnainen = random.Random(args.seed * 1000 + n)
+    if args.mode == "daemon":
+        arvioi, sulje = arvioija_palvelimella(Path(".cache/loadtest.sock"), f"opiskelija-{n}")
+    else:
+        arvioi, sulje = arvioija_paikallisesti(oikeat)
+    try:
+        while time.monotonic() < loppu_aika:
+            with lukko:
+                if args.requests and laskuri[0] >= args.requests:
+                    return
+                laskuri[0] += 1
+            if args.think_ms:
+                time.sleep(satunnainen.expovariate(1000 / args.think_ms))
+            i, cmd = valitse_komento(oikeat, muut, satunnainen, args.wrong, args.disallowed)
+            alku = time.perf_counter()
+            try:
+                t = arvioi(i, cmd)
+            except Exception:
+                t = "virhe"
+            kesto = time.perf_counter() - alku
+            tulokset.kirjaa(t, None if t == "hylätty" else kesto)
+    finally:
+        sulje()
+
+
+def prosenttipisteet(arvot: list[float]) -> dict:
+    if not arvot:
+        return {}
+    j = sorted(arvot)
+
+    def p(q: float) -> float:
+        return round(j[min(len(j) - 1, int(q * len(j)))] * 1000, 2)
+    return {"p50": p(0.50), "p95": p(0.95), "p99": p(0.99), "max": round(j[-1] * 1000, 2)}
+
+
+def kaynnista_palvelin(tyo: Path, jobs: int | None) -> subprocess.Popen:
+    komento = [sys.executable, str(JUURI / "harjoitus.py"), "serve"]
+    if jobs:
+        komento += ["--jobs", str(jobs)]
+    proc = subprocess.Popen(komento, cwd=tyo, stdout=subprocess.DEVNULL)
+    soketti = tyo / ".cache" / "loadtest.sock"
+    for _ in range(300):
+        asiakas = PalvelinAsiakas.yhdista(soketti, aikaraja_s=5)
+        if asiakas is not None:
+            asiakas.sulje()
+            return proc
+        if proc.poll() is not None:
+            break
+        time.sleep(0.1)
+    proc.kill()
+    raise RuntimeError("arviointipalvelin ei käynnistynyt")
+
+
+def main() -> int:
+    parser = argparse.ArgumentParser(description="Kuormitustesti simuloiduilla opiskelijoilla.")
+    parser.add_argument("--size", type=koko_tavuina, default=koko_tavuina("10M"),
+                        help="Kunkin synteettisen aineiston koko (esim. 512K, 10M, 2G; oletus 10M)")
+    parser.add_argument("--students", type=int, default=10, help="Samanaikaisia opiskelijoita (oletus 10)")
+    parser.add_argument("--requests", type=int, default=200,
+                        help="Arviointeja yhteensä (0 = rajaton, käytä --duration)")
+    parser.add_argument("--duration", type=float, default=0, help="Ajon enimmäiskesto sekunteina (0 = rajaton)")
+    parser.add_argument("--think-ms", type=float, default=0, help="Keskimääräinen miettimisaika pyyntöjen välillä")
+    parser.add_argument("--wrong", type=float, default=0.3, help="Väärien komentojen osuus (oletus 0.3)")
+    parser.add_argument("--disallowed", type=float, default=0.05, help="Hylättävien komentojen osuus (oletus 0.05)")
+    parser.add_argument("--mode", choices=["daemon", "local"], default="daemon",
+                        help="daemon: arviointipalvelimen kautta (oletus); local: kuten interaktiivinen tila")
+    parser.add_argument("--jobs", type=int, default=None, help="Palvelimen rinnakkaisuus (oletus konfiguraatiosta)")
+    parser.add_argument("--timeout", type=int, default=30, help="Komentojen aikaraja sekunteina (oletus 30)")
+    parser.add_argument("--seed", type=int, default=1, help="Satunnaislukusiemen (oletus 1)")
+    parser.add_argument("--workdir", help="Työhakemisto (oletus: väliaikainen)")
+    parser.add_argument("--keep", action="store_true", help="Älä poista väliaikaista työhakemistoa")
+    parser.add_argument("--output", help="Kirjoita raportti JSON-tiedostoon")
+    args = parser.parse_args()
+    if not args.requests and not args.duration:
+        parser.error("anna --requests tai --duration")
+
+    tyo = Path(args.workdir or tempfile.mkdtemp(prefix="loadtest-")).resolve()
+    tuloste = Path(args.output).resolve() if args.output else None
+    palvelin = None
+    try:
+        valmistele_tyohakemisto(tyo, args.size, args.seed, args.timeout)
+        # Komennot viittaavat polkuihin `data/...`, ja konfiguraatio luetaan työhakemistosta
+        os.chdir(tyo)
+        oikeat, muut = lue_komennot(Path("data/tasks"))
+
+        kone_ennen = MuistiNaytteistin.koneen_kaytto()
+        if args.mode == "daemon":
+            palvelin = kaynnista_palvelin(tyo, args.jobs)
+        naytteistin = MuistiNaytteistin(palvelin.pid if palvelin else os.getpid())
+        naytteistin.start()
+
+        print(f"🚀 {args.students} opiskelijaa, tila {args.mode}, aineistot {args.size / (1 << 20):.1f} MiB/tiedosto")
+        tulokset = Tulokset()
+        laskuri, lukko = [0], threading.Lock()
+        loppu_aika = time.monotonic() + args.duration if args.duration else float("inf")
+        alku = time.perf_counter()
+        saikeet = [
+            threading.Thread(target=opiskelija, args=(n, args, oikeat, muut, tulokset, laskuri, lukko, loppu_aika))
+            for n in range(args.students)
+        ]
+        for s in saikeet:
+            s.start()
+        for s in saikeet:
+            s.join()
+        kesto = time.perf_counter() - alku
+
+        palvelimen_tilastot = None
+        if palvelin is not None:
+            asiakas = PalvelinAsiakas.yhdista(Path(".cache/loadtest.sock"))
+            if asiakas is not None:
+                palvelimen_tilastot = asiakas.tilastot()
+                asiakas.sulje()
+        muisti = naytteistin.lopeta()
+        if kone_ennen is not None and "host_used_peak_mib" in muisti:
+            muisti["host_used_before_mib"] = round(kone_ennen / (1 << 20), 1)
+
+        arvioituja = len(tulokset.viiveet)
+        raportti = {
+            "config": {k: getattr(args, k) for k in
+                       ("size", "students", "requests", "duration", "think_ms", "wrong", "disallowed",
+                        "mode", "jobs", "timeout", "seed")},
+            "elapsed_s": round(kesto, 3),
+            "graded": arvioituja,
+            "throughput_per_s": round(arvioituja / kesto, 2) if kesto else None,
+            "verdicts": tulokset.tuomiot,
+            "latency_ms": prosenttipisteet(tulokset.viiveet),
+            "memory": muisti,
+        }
+        if palvelimen_tilastot is not None:
+            raportti["daemon"] = palvelimen_tilastot
+
+        v = raportti["latency_ms"]
+        print(f"⏱️  {arvioituja} arviointia {kesto:.1f} s:ssa = {raportti['throughput_per_s']} /s")
+        if v:
+            print(f"   viive p50 {v['p50']} ms, p95 {v['p95']} ms, p99 {v['p99']} ms, max {v['max']} ms")
+        print("   tuomiot: " + ", ".join(f"{k} {n}" for k, n in tulokset.tuomiot.items()))
+        if muisti:
+            print("🧠 " + ", ".join(f"{k} {n}" for k, n in muisti.items()))
+        if tuloste:
+            tuloste.write_text(json.dumps(raportti, ensure_ascii=False, indent=2), encoding="utf-8")
+            print(f"✅ Raportti kirjoitettu: {tuloste}")
+        return 1 if tulokset.tuomiot["virhe"] else 0
+    finally:
+        if palvelin is not None:
+            palvelin.send_signal(signal.SIGTERM)
+            try:
+                palvelin.wait(10)
+            except subprocess.TimeoutExpired:
+                palvelin.kill()
+        os.chdir(JUURI)
+        if not args.workdir and not args.keep:
+            shutil.rmtree(tyo, ignore_errors=True)
+        elif not args.workdir:
+            print(f"📁 Työhakemisto säilytettiin: {tyo}")
+
+
+if __name__ == "__main__":
+    raise SystemExit(main())
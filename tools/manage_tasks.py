@@ -5,9 +5,29 @@ ja opiskelijalle vietävän Markdown-listan luomiseen.
 
 Käyttö:
   python manage_tasks.py decrypt     - Purkaa tehtavat.txt.enc -> tehtavat.txt
-  python manage_tasks.py encrypt     - Salaa tehtavat.txt -> tehtavat.txt.enc (+ markdown-vienti)
+  python manage_tasks.py encrypt     - Salaa tehtavat.txt -> tehtavat.txt.enc (+ nippu ja markdown-vienti)
+  python manage_tasks.py bundle      - Kääntää tehtavat.txt.enc -> tehtavat.txt.bundle
+  python manage_tasks.py bundle awk  - Kääntää tehtäväsarjan (configs/config.json: task_sets) tehtävätiedoston nipuksi
+  python manage_tasks.py bundle --if-stale  - Kääntää nipun vain, jos se puuttuu tai on vanhentunut
+  python manage_tasks.py bundle --check     - Tarkistaa nipun kääntämättä (paluuarvo 1, jos vanhentunut)
   python manage_tasks.py student-md  - Luo tehtävistä Markdown-listan (ilman vastauksia)
 
+Käännetty nippu (`tehtavat.txt.bundle`) sisältää jäsennetyt tehtävät ja
+siirtymäindeksin, jonka avulla harjoitus.py lataa tehtävät ilman jäsennystä.
+Nippu on versionhallinnassa, jotta opiskelijoiden checkoutit ja CI saavat
+sen; käännä se uudelleen aina .enc-tiedoston muututtua. Jos nippu puuttuu
+tai ei vastaa .enc-tiedostoa, harjoitus.py jäsentää tehtävätiedoston kuten
+ennenkin.
+
+Nippua käännettäessä jokainen oikea komento ajetaan kerran (rinnakkain)
+data/-tiedostoja vastaan, ja nippuun tallennetaan tuloste, sen tiiviste,
+rivimäärä ja datatiedostojen sormenjäljet. Arviointi käyttää tallennettua
+tulostetta ajamatta oikeaa komentoa niin kauan kuin data on ennallaan.
+Komennot, jotka eivät tulosta mitään tai epäonnistuvat (esim. aikakatkaisu),
+listataan varoituksina. Nippua itseään lukevien komentojen (esim.
+`grep -R ... ./data/*`) tulosteet lasketaan valmiista nipusta, kunnes ne
+eivät enää muutu (`settle_self_reading`).
+
 Kommentit tehtavat.txt-tiedostossa:
   Rivit jotka alkavat '---' ohitetaan kommenttina. Esim:
     --- Grep-harjoitukset
@@ -18,9 +38,18 @@ Kommentit tehtavat.txt-tiedostossa:
 import base64
 import sys
 import os
+from concurrent.futures import ThreadPoolExecutor
+from pathlib import Path
+
+# Jäsennin ja nippumuoto ovat paketissa, jotta arvioija ja tämä työkalu käyttävät samaa
+sys.path.insert(0, os.path.join(os.path.dirname(os.path.dirname(os.path.abspath(__file__))), "src"))
+from linuxcli_grep.tehtavasarjat import TuntematonSarja, valitse  # noqa: E402
+from linuxcli_grep.tehtavat import TehtavaNippu, jasenna_tehtavat, kirjoita_nippu, nipun_polku  # noqa: E402
+from linuxcli_grep.valimuisti import laske_odotettu, odotettu_tuloste  # noqa: E402
 
 ENC_FILE = "data/tasks/tehtavat.txt.enc"
 PLAIN_FILE = "data/tasks/tehtavat.txt"
+BUNDLE_FILE = str(nipun_polku(ENC_FILE))
 STUDENT_MD = "./tehtavat_student.md"
 
 
@@ -68,11 +97,117 @@ def encrypt():
         print(f"❌ Virhe salaamessa: {e}")
         sys.exit(1)
     
+    bundle()
+
     # Exportaa opiskelijoiden Markdown-lista automaattisesti salauksen jälkeen
     print("📝 Viedään opiskelijoiden Markdown-lista...")
     export_student_markdown()
 
 
+def bundle_is_current(lahde, kohde):
+    """Onko nippu käännetty nykyisestä lähdetiedostosta ja ovatko sen odotetut tulosteet yhä voimassa"""
+    nippu = TehtavaNippu.avaa(kohde, lahde)
+    if nippu is None:
+        return False
+    for i, (_, oikea) in enumerate(nippu):
+        odotettu = nippu.odotettu(i)
+        if odotettu is not None and odotettu_tuloste(odotettu, oikea) is None:
+            return False
+    return True
+
+
+def bundle(sarja=None, tila=None):
+    """Kääntää salatun tiedoston (tai tehtäväsarjan tehtävätiedoston) nipuksi nopeaa latausta varten.
+
+    `tila` "check" vain tarkistaa nipun (paluuarvo 1, jos se on vanhentunut),
+    "if-stale" kääntää sen vain tarvittaessa.
+    """
+    lahde = ENC_FILE
+    if sarja is not None:
+        try:
+            # Sarjan aikaraja koskee myös oikeiden komentojen ajoa
+            lahde = valitse(sarja).tiedosto
+        except TuntematonSarja:
+            print(f"❌ Tuntematon tehtäväsarja: {sarja}")
+            sys.exit(1)
+    kohde = str(nipun_polku(lahde))
+    if not os.path.exists(lahde):
+        print(f"❌ Tiedostoa {lahde} ei löydy")
+        sys.exit(1)
+
+    if tila is not None:
+        if bundle_is_current(Path(lahde), Path(kohde)):
+            print(f"✅ Nippu on ajan tasalla: {kohde}")
+            return
+        if tila == "check":
+            print(f"❌ Nippu puuttuu tai on vanhentunut: {kohde} (aja: python3 tools/manage_tasks.py bundle)")
+            sys.exit(1)
+
+    kaannetty = {}
+
+    def laske(tehtavat):
+        kaannetty["tehtavat"] = tehtavat
+        kaannetty["odotetut"] = expected_outputs(tehtavat, kohde)
+        return kaannetty["odotetut"]
+
+    try:
+        kirjoita_nippu(lahde, kohde, odotetut=laske)
+        settle_self_reading(lahde, kohde, kaannetty["tehtavat"], kaannetty["odotetut"])
+        print(f"✅ Nippu käännetty: {lahde} -> {kohde}")
+    except Exception as e:
+        print(f"❌ Virhe nipun kääntämisessä: {e}")
+        sys.exit(1)
+
+
+def settle_self_reading(lahde, kohde, tehtavat, odotetut, kierrokset=3):
+    """Laske nippua itseään lukevien komentojen tulosteet valmiista nipusta.
+
+    Tuloste lasketaan uudelleen kirjoitetusta nipusta ja nippu kirjoitetaan
+    uudelleen, kunnes tulosteet eivät enää muutu: silloin nipun tietue on
+    sama kuin komennon tuloste juuri tätä nippua vastaan. Jos tulosteet
+    eivät asetu (esim. `cat data/*` tulostaa nipun itsensä), niitä ei
+    tallenneta.
+    """
+    itse = [i for i, o in enumerate(odotetut) if o is not None and "nippu" in o]
+    for _ in range(kierrokset):
+        muuttuneet = 0
+        for i in itse:
+            uusi = laske_odotettu(tehtavat[i][1], nippu=kohde)
+            if uusi != odotetut[i]:
+                odotetut[i] = uusi
+                muuttuneet += 1
+        if not muuttuneet:
+            return
+        kirjoita_nippu(lahde, kohde, odotetut=lambda _: odotetut)
+    for i in itse:
+        print(f"⚠️  Tehtävä {i + 1}: oikean komennon tuloste riippuu nipusta, tulostetta ei tallenneta: {tehtavat[i][1]}")
+        odotetut[i] = None
+    kirjoita_nippu(lahde, kohde, odotetut=lambda _: odotetut)
+
+
+def expected_outputs(tehtavat, kohde=BUNDLE_FILE):
+    """Aja tehtävien oikeat komennot rinnakkain ja palauta odotetut tulosteet nippua varten"""
+    print(f"⚙️  Ajetaan {len(tehtavat)} oikeaa komentoa odotettujen tulosteiden laskemiseksi...")
+    with ThreadPoolExecutor(max_workers=os.cpu_count() or 1) as pool:
+        odotetut = list(pool.map(lambda t: laske_odotettu(t[1], nippu=kohde) if t[1] else None, tehtavat))
+
+    varoitukset = 0
+    for idx, ((kuvaus, oikea), odotettu) in enumerate(zip(tehtavat, odotetut), start=1):
+        if odotettu is None:
+            print(f"⚠️  Tehtävä {idx}: oikea komento puuttuu ({kuvaus})")
+        elif "virhe" in odotettu:
+            print(f"⚠️  Tehtävä {idx}: oikea komento epäonnistui {odotettu['virhe']}: {oikea}")
+            odotetut[idx - 1] = None
+        elif not odotettu["tuloste"]:
+            print(f"⚠️  Tehtävä {idx}: oikea komento ei tulosta mitään: {oikea}")
+        else:
+            continue
+        varoitukset += 1
+    tallennetut = sum(1 for o in odotetut if o is not None)
+    print(f"✅ Odotetut tulosteet: {tallennetut}/{len(tehtavat)} tallennettu, varoituksia {varoitukset}")
+    return odotetut
+
+
 def export_student_markdown(output=STUDENT_MD):
     """Luo Markdown-tiedosto, joka sisältää numeroidun listan tehtävistä ilman vastauksia.
 
@@ -97,24 +232,7 @@ def export_student_markdown(output=STUDENT_MD):
         print(f"❌ Ei löydy {PLAIN_FILE} tai {ENC_FILE}")
         sys.exit(1)
 
-    lines = content.splitlines()
-    tasks = []
-    i = 0
-    n = len(lines)
-    while i < n:
-        line = lines[i].strip()
-        if not line:
-            i += 1
-            continue
-        # Ohita kommenttirivit jotka alkavat '---'
-        if line.startswith('---'):
-            i += 1
-            continue
-        # Odotetaan, että tehtävän kuvaus alkaa rivillä '#' ja seuraava ei-tyhjä rivi on vastaus
-        if line.startswith('#'):
-            desc = line.lstrip('#').strip()
-            tasks.append(desc)
-        i += 1
+    tasks = [desc for desc, _ in jasenna_tehtavat(content)]
 
     # Rakennetaan markdown
     md_lines = ["# Tehtävät", "", "Seuraavat tehtävät — vastaukset jätetty pois.", ""]
@@ -152,6 +270,14 @@ if __name__ == "__main__":
         decrypt()
     elif cmd == "encrypt":
         encrypt()
+    elif cmd == "bundle":
+        args = sys.argv[2:]
+        tila = None
+        for valitsin in ("--check", "--if-stale"):
+            if valitsin in args:
+                args.remove(valitsin)
+                tila = valitsin[2:]
+        bundle(args[0] if args else None, tila)
     elif cmd in ("student-md", "export-md", "markdown"):
         export_student_markdown()
     elif cmd == "help" or cmd == "-h" or cmd == "--help":
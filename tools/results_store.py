@@ -0,0 +1,329 @@
+#!/usr/bin/env python3
+"""Autograding-tulosten SQLite-tietokanta.
+
+Vaihtoehto sille, että yhteenveto etsii jokaisella ajolla hakemistosta
+tiedostot `<opiskelija>-<aikaleima>.json` ja päättelee opiskelijoiden
+uusimmat tulokset tiedostonimistä. Tulokset (myös `per_task`) tallennetaan
+indeksoituun tietokantaan, ja kunkin opiskelijan uusin tulos pidetään
+`latest`-taulussa ajan tasalla lisäysten yhteydessä, joten yhteenveto on
+indeksihaku eikä hakemiston läpikäynti.
+
+Käyttö:
+  python3 tools/results_store.py import --db results.sqlite --results-dir .
+      - tuo hakemiston tulostiedostot (jo tuodut ohitetaan nimen ja koon perusteella)
+  python3 tools/results_store.py ingest --db results.sqlite output/results.json [--student S]
+      - tuo yksittäisiä `results.json`-tiedostoja; opiskelija ja aikaleima otetaan
+        tiedostonimestä, `opiskelijanumero`-kentästä tai valitsimista (aikaleima
+        oletuksena tiedoston mtime); saman tunnisteen saavat tiedostot hylätään
+  python3 tools/results_store.py latest --db results.sqlite
+      - listaa opiskelijoiden uusimmat tulokset
+
+Yhteenveto tietokannasta:
+  python3 tools/summarize_autograding_results.py --db results.sqlite --output SUMMARY.md
+"""
+
+from __future__ import annotations
+
+import argparse
+import json
+import os
+import sqlite3
+import sys
+from datetime import datetime, timedelta, timezone
+from pathlib import Path
+from typing import Iterator
+
+# Yhteenvetotyökalu on samassa hakemistossa; toimii myös tuotuna muualta
+sys.path.insert(0, str(Path(__file__).resolve().parent))
+from summarize_autograding_results import (  # noqa: E402
+    EPOCH, FILENAME_RE, MANIFEST_NAME, TS_FORMAT, ResultRow, parse_result_payload,
+)
+
+SCHEMA_VERSION = 1
+BATCH_SIZE = 1000
+
+SCHEMA = """
+CREATE TABLE IF NOT EXISTS results (
+    id INTEGER PRIMARY KEY,
+    source_file TEXT NOT NULL UNIQUE,
+    student TEXT NOT NULL,
+    ts INTEGER NOT NULL,            -- sekunteja vuodesta 1970 (UTC)
+    score INTEGER NOT NULL,
+    total INTEGER NOT NULL,
+    statuses TEXT NOT NULL          -- yksi STATUS_CODES-merkki per tehtävä
+);
+CREATE INDEX IF NOT EXISTS results_student_ts ON results (student, ts DESC);
+
+CREATE TABLE IF NOT EXISTS per_task (
+    result_id INTEGER NOT NULL REFERENCES results (id) ON DELETE CASCADE,
+    task INTEGER NOT NULL,
+    status TEXT,
+    student_cmd TEXT,
+    PRIMARY KEY (result_id, task)
+) WITHOUT ROWID;
+CREATE INDEX IF NOT EXISTS per_task_task_status ON per_task (task, status);
+
+-- Kunkin opiskelijan uusin tulos
+CREATE TABLE IF NOT EXISTS latest (
+    student TEXT PRIMARY KEY,
+    result_id INTEGER NOT NULL,
+    ts INTEGER NOT NULL
+) WITHOUT ROWID;
+
+-- Tuodut tiedostot (myös ne, joita ei voitu jäsentää), jotta niitä ei lueta uudelleen
+CREATE TABLE IF NOT EXISTS files (
+    name TEXT PRIMARY KEY,
+    size INTEGER NOT NULL
+) WITHOUT ROWID;
+"""
+
+
+class StoreError(Exception):
+    """Tietokanta on tuntematonta versiota."""
+
+
+class DuplicateSourceError(ValueError):
+    """Kaksi tuotavaa tiedostoa saisi saman `source_file`-tunnisteen."""
+
+
+def open_store(path: Path) -> sqlite3.Connection:
+    conn = sqlite3.connect(path)
+    conn.execute("PRAGMA foreign_keys = ON")
+    conn.execute("PRAGMA journal_mode = WAL")
+    conn.execute("PRAGMA synchronous = NORMAL")
+    version = conn.execute("PRAGMA user_version").fetchone()[0]
+    if version not in (0, SCHEMA_VERSION):
+        conn.close()
+        raise StoreError(f"{path}: tuntematon tietokannan versio {version}")
+    with conn:
+        conn.executescript(SCHEMA)
+        conn.execute(f"PRAGMA user_version = {SCHEMA_VERSION}")
+    return conn
+
+
+def _seconds(timestamp: datetime) -> int:
+    return int((timestamp - EPOCH).total_seconds())
+
+
+def _per_task_items(per_task: object) -> Iterator[tuple[int, str | None, str | None]]:
+    if not isinstance(per_task, list):
+        return
+    for task, item in enumerate(per_task):
+        if not isinstance(item, dict):
+            yield task, None, None
+            continue
+        status = item.get("status")
+        cmd = item.get("student_cmd")
+        yield (task, status if isinstance(status, str) else None,
+               cmd if isinstance(cmd, str) else None)
+
+
+def _refresh_latest(conn: sqlite3.Connection, student: str) -> None:
+    row = conn.execute(
+        "SELECT id, ts FROM results WHERE student = ? ORDER BY ts DESC, id LIMIT 1", (student,)
+    ).fetchone()
+    if row is None:
+        conn.execute("DELETE FROM latest WHERE student = ?", (student,))
+    else:
+        conn.execute("INSERT OR REPLACE INTO latest (student, result_id, ts) VALUES (?, ?, ?)",
+                     (student, row[0], row[1]))
+
+
+def add_result(conn: sqlite3.Connection, row: ResultRow, per_task: object) -> None:
+    """Lisää tai korvaa (saman `source_file`-nimen) tulos ja päivitä `latest`."""
+    old = conn.execute("SELECT id, student FROM results WHERE source_file = ?", (row.source_file,)).fetchone()
+    if old is not None:
+        conn.execute("DELETE FROM results WHERE id = ?", (old[0],))
+    ts = _seconds(row.timestamp)
+    result_id = conn.execute(
+        "INSERT INTO results (source_file, student, ts, score, total, statuses) VALUES (?, ?, ?, ?, ?, ?)",
+        (row.source_file, row.student, ts, row.score, row.total, row.statuses),
+    ).lastrowid
+    conn.executemany(
+        "INSERT INTO per_task (result_id, task, status, student_cmd) VALUES (?, ?, ?, ?)",
+        ((result_id, task, status, cmd) for task, status, cmd in _per_task_items(per_task)),
+    )
+    if old is not None:
+        _refresh_latest(conn, old[1])
+        if old[1] != row.student:
+            _refresh_latest(conn, row.student)
+        return
+    conn.execute(
+        "INSERT INTO latest (student, result_id, ts) VALUES (?, ?, ?) "
+        "ON CONFLICT (student) DO UPDATE SET result_id = excluded.result_id, ts = excluded.ts "
+        "WHERE excluded.ts > latest.ts",
+        (row.student, result_id, ts),
+    )
+
+
+def _read_json(path: Path) -> object:
+    try:
+        return json.loads(path.read_text(encoding="utf-8"))
+    except (OSError, UnicodeDecodeError, json.JSONDecodeError):
+        return None
+
+
+def import_dir(conn: sqlite3.Connection, results_dir: Path) -> tuple[int, int]:
+    """Tuo hakemiston `<opiskelija>-<aikaleima>.json`-tiedostot.
+
+    Tiedosto ohitetaan, jos saman niminen ja kokoinen tiedosto on jo tuotu
+    (tulostiedostoja ei kirjoiteta uudelleen samalla nimellä). Palauttaa
+    (tuodut tulokset, ohitetut tiedostot).
+    """
+    known = dict(conn.execute("SELECT name, size FROM files"))
+    imported = skipped = pending = 0
+    with conn:
+        with os.scandir(results_dir) as entries:
+            for entry in entries:
+                name = entry.name
+                if not name.endswith(".json") or name == MANIFEST_NAME or not entry.is_file():
+                    continue
+                size = entry.stat().st_size
+                if known.get(name) == size:
+                    skipped += 1
+                    continue
+                match = FILENAME_RE.match(name)
+                data = _read_json(results_dir / name) if match else None
+                row = None
+                if match:
+                    row = parse_result_payload(data, match.group("student"),
+                                               datetime.strptime(match.group("ts"), TS_FORMAT), name)
+                if row is not None:
+                    add_result(conn, row, data.get("per_task"))
+                    imported += 1
+                conn.execute("INSERT OR REPLACE INTO files (name, size) VALUES (?, ?)", (name, size))
+                pending += 1
+                if pending >= BATCH_SIZE:
+                    conn.commit()
+                    pending = 0
+    return imported, skipped
+
+
+def _student_name(raw: str) -> str:
+    # Sama muunnos kuin autograding-työnkulussa
+    name = "".join(c if c.isascii() and (c.isalnum() or c in "._-") else "-" for c in raw.lower())
+    while "--" in name:
+        name = name.replace("--", "-")
+    return name.strip("-")
+
+
+def _mtime(path: Path) -> datetime:
+    """Tiedoston mtime sekunnin tarkkuudella (UTC); nyt, jos sitä ei voi lukea."""
+    try:
+        return datetime.fromtimestamp(path.stat().st_mtime, timezone.utc).replace(tzinfo=None, microsecond=0)
+    except OSError:
+        return datetime.now(timezone.utc).replace(tzinfo=None, microsecond=0)
+
+
+def ingest_file(conn: sqlite3.Connection, path: Path, student: str | None = None,
+                timestamp: datetime | None = None, reserved: set[str] | None = None) -> ResultRow | None:
+    """Tuo yksi `results.json`-tiedosto; None, jos sitä ei voitu jäsentää.
+
+    Opiskelija ja aikaleima otetaan valitsimista, tiedostonimestä tai
+    (opiskelija) `opiskelijanumero`-kentästä; aikaleima on oletuksena
+    tiedoston mtime. Tulos korvaa saman tunnisteen (`source_file`) aiemman
+    tuloksen, joten saman tiedoston tuonti uudelleen ei lisää riviä.
+    `reserved` sisältää samassa ajossa jo tuotujen tiedostojen tunnisteet:
+    jos tiedosto saisi saman tunnisteen, nostetaan `DuplicateSourceError`
+    eikä aiempaa tulosta korvata.
+    """
+    data = _read_json(path)
+    match = FILENAME_RE.match(path.name)
+    if student is None and match:
+        student = match.group("student")
+    if student is None and isinstance(data, dict) and isinstance(data.get("opiskelijanumero"), str):
+        student = _student_name(data["opiskelijanumero"])
+    if not student:
+        return None
+    if timestamp is None:
+        timestamp = datetime.strptime(match.group("ts"), TS_FORMAT) if match else _mtime(path)
+    source_file = f"{student}-{timestamp.strftime(TS_FORMAT)}.json"
+    row = parse_result_payload(data, student, timestamp, source_file)
+    if row is not None:
+        if reserved is not None:
+            if source_file in reserved:
+                raise DuplicateSourceError(
+                    f"sama opiskelija ja aikaleima kuin aiemmalla tiedostolla ({source_file}); "
+                    "anna tiedostot eri ajoissa tai eri --timestamp-arvoilla")
+            reserved.add(source_file)
+        with conn:
+            add_result(conn, row, data.get("per_task"))
+    return row
+
+
+def latest_rows(conn: sqlite3.Connection) -> Iterator[ResultRow]:
+    """Kunkin opiskelijan uusin tulos opiskelijan nimen mukaan (kuten `ResultColumns.latest`)."""
+    wrong: dict[int, dict[int, str]] = {}
+    for result_id, task, cmd in conn.execute(
+        "SELECT p.result_id, p.task, p.student_cmd FROM latest l JOIN per_task p ON p.result_id = l.result_id "
+        "WHERE p.status = 'väärin' AND p.student_cmd IS NOT NULL"
+    ):
+        if cmd.strip():
+            wrong.setdefault(result_id, {})[task] = cmd.strip()
+    cursor = conn.execute(
+        "SELECT r.id, r.student, r.score, r.total, r.source_file, r.ts, r.statuses "
+        "FROM latest l JOIN results r ON r.id = l.result_id ORDER BY lower(r.student), r.ts"
+    )
+    for result_id, student, score, total, source_file, ts, statuses in cursor:
+        yield ResultRow(
+            student=student,
+            score=score,
+            total=total,
+            source_file=source_file,
+            timestamp=EPOCH + timedelta(seconds=ts),
+            statuses=statuses,
+            wrong_cmds=wrong.get(result_id, {}),
+        )
+
+
+def main() -> int:
+    parser = argparse.ArgumentParser(description="Autograding-tulosten SQLite-tietokanta.")
+    sub = parser.add_subparsers(dest="command", required=True)
+    p_import = sub.add_parser("import", help="Tuo hakemiston tulostiedostot")
+    p_import.add_argument("--results-dir", default=".", help="Hakemisto jossa JSON-tulokset sijaitsevat")
+    p_ingest = sub.add_parser("ingest", help="Tuo yksittäisiä results.json-tiedostoja")
+    p_ingest.add_argument("files", nargs="+", help="results.json-tiedostot")
+    p_ingest.add_argument("--student", default=None, help="Opiskelija (oletus: tiedostonimestä tai opiskelijanumerosta)")
+    p_ingest.add_argument("--timestamp", default=None,
+                          help="Aikaleima muodossa YYYY-MM-DDTHH-MM-SS (UTC, oletus: tiedoston mtime)")
+    sub.add_parser("latest", help="Listaa opiskelijoiden uusimmat tulokset")
+    for p in (p_import, p_ingest, sub.choices["latest"]):
+        p.add_argument("--db", default="results.sqlite", help="Tietokannan polku (oletus results.sqlite)")
+    args = parser.parse_args()
+
+    try:
+        conn = open_store(Path(args.db))
+    except (StoreError, sqlite3.DatabaseError) as e:
+        print(f"❌ {e}")
+        return 1
+    try:
+        if args.command == "import":
+            imported, skipped = import_dir(conn, Path(args.results_dir))
+            print(f"✅ {imported} tulosta tuotu, {skipped} tiedostoa jo tietokannassa")
+        elif args.command == "ingest":
+            timestamp = datetime.strptime(args.timestamp, TS_FORMAT) if args.timestamp else None
+            failed = 0
+            reserved: set[str] = set()
+            for name in args.files:
+                try:
+                    row = ingest_file(conn, Path(name), args.student, timestamp, reserved)
+                except DuplicateSourceError as e:
+                    print(f"❌ {name}: {e}")
+                    failed += 1
+                    continue
+                if row is None:
+                    print(f"⚠️  {name}: ei voitu jäsentää (pisteet tai opiskelija puuttuu)")
+                    failed += 1
+                else:
+                    print(f"✅ {name} -> {row.source_file} ({row.score}/{row.total})")
+            return 1 if failed else 0
+        else:
+            for row in latest_rows(conn):
+                print(f"{row.student}\t{row.score}/{row.total}\t{row.timestamp.isoformat(sep=' ')}\t{row.source_file}")
+    finally:
+        conn.close()
+    return 0
+
+
+if __name__ == "__main__":
+    raise SystemExit(main())
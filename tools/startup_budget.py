@@ -0,0 +1,117 @@
+#!/usr/bin/env python3
+"""Käynnistysajan budjetti `--check`- ja interaktiiviselle tilalle.
+
+Ajaa `python -X importtime` -mittauksen kummankin tilan tuontipolulle
+(uusi prosessi per kierros) ja tarkistaa:
+
+- tuotujen moduulien määrän budjettia vastaan; määrä ei riipu koneen
+  kuormasta, joten se on ensisijainen (deterministinen) raja,
+- ettei tilan polulla tuoda moduuleja, joita se ei tarvitse (esim.
+  sisäinen moottori interaktiivisessa tilassa),
+- ettei paketin tuonti lue konfiguraatiota,
+- kokonaistuontiajan mediaanin N kierroksesta; aikabudjetti ylittyy vasta,
+  kun mediaani on yli budjetin toleranssin verran (oletus 50 %), jotta
+  kuormitettu CI-kone ei kaada tarkistusta satunnaisesti.
+
+Käyttö (repositoryn juuresta):
+  python3 tools/startup_budget.py [--check-modules 130] [--interactive-modules 115]
+                                  [--check-ms 80] [--interactive-ms 50] [--tolerance 0.5] [--rounds 7]
+"""
+
+from __future__ import annotations
+
+import argparse
+import os
+import statistics
+import subprocess
+import sys
+from pathlib import Path
+
+SRC = Path(__file__).resolve().parent.parent / "src"
+
+# tila -> (tuontipolku, moduulit joita polulla ei saa tuoda)
+TILAT = {
+    "check": (
+        ["linuxcli_grep.cli", "linuxcli_grep.arviointi"],
+        ["linuxcli_grep.moottori", "linuxcli_grep.interaktiivinen"],
+    ),
+    "interactive": (
+        ["linuxcli_grep.cli", "linuxcli_grep.interaktiivinen"],
+        ["linuxcli_grep.moottori", "linuxcli_grep.arviointi", "concurrent.futures"],
+    ),
+}
+
+# Oletusbudjetit (moduulien määrä); myös tests/test_kaynnistys.py käyttää näitä
+MODUULIBUDJETIT = {"check": 130, "interactive": 115}
+
+SIVUVAIKUTUKSETON = (
+    "import linuxcli_grep.cli, linuxcli_grep.arviointi, linuxcli_grep.interaktiivinen\n"
+    "from linuxcli_grep import konfiguraatio\n"
+    "raise SystemExit(0 if konfiguraatio._ASETUKSET is None else 1)\n"
+)
+
+
+def mittaa(moduulit: list[str]) -> tuple[float, set[str]]:
+    """Palauta (tuontiaika ms, tuodut moduulit) yhdestä uudesta prosessista."""
+    env = dict(os.environ, PYTHONPATH=str(SRC))
+    koodi = "; ".join(f"import {m}" for m in moduulit)
+    res = subprocess.run([sys.executable, "-X", "importtime", "-c", koodi],
+                         capture_output=True, text=True, env=env, check=True)
+    yhteensa_us = 0
+    tuodut = set()
+    for rivi in res.stderr.splitlines():
+        if not rivi.startswith("import time:") or "|" not in rivi:
+            continue
+        oma, _, nimi = rivi[len("import time:"):].split("|")
+        if not oma.strip().isdigit():
+            continue  # otsikkorivi
+        yhteensa_us += int(oma)
+        tuodut.add(nimi.strip())
+    return yhteensa_us / 1000, tuodut
+
+
+def main() -> int:
+    parser = argparse.ArgumentParser(description="Tarkista käynnistysajan budjetti.")
+    parser.add_argument("--check-modules", type=int, default=MODUULIBUDJETIT["check"],
+                        help="Moduulibudjetti --check-tilalle")
+    parser.add_argument("--interactive-modules", type=int, default=MODUULIBUDJETIT["interactive"],
+                        help="Moduulibudjetti interaktiiviselle tilalle")
+    parser.add_argument("--check-ms", type=float, default=80.0, help="Aikabudjetti --check-tilalle (ms)")
+    parser.add_argument("--interactive-ms", type=float, default=50.0,
+                        help="Aikabudjetti interaktiiviselle tilalle (ms)")
+    parser.add_argument("--tolerance", type=float, default=0.5,
+                        help="Sallittu suhteellinen ylitys aikabudjettiin (0.5 = 50 %%)")
+    parser.add_argument("--rounds", type=int, default=7, help="Mittauskierroksia per tila (mediaani lasketaan)")
+    args = parser.parse_args()
+    aikabudjetit = {"check": args.check_ms, "interactive": args.interactive_ms}
+    moduulibudjetit = {"check": args.check_modules, "interactive": args.interactive_modules}
+
+    virheet = []
+    for tila, (moduulit, kielletyt) in TILAT.items():
+        tulokset = [mittaa(moduulit) for _ in range(max(1, args.rounds))]
+        mediaani = statistics.median(ms for ms, _ in tulokset)
+        raja = aikabudjetit[tila] * (1 + args.tolerance)
+        # Moduulijoukko on sama joka kierroksella; yhdiste kattaa mahdolliset poikkeamat
+        tuodut = set().union(*(t for _, t in tulokset))
+        ok = mediaani <= raja and len(tuodut) <= moduulibudjetit[tila]
+        print(f"{'✅' if ok else '❌'} {tila:<12} {mediaani:7.1f} ms (budjetti {aikabudjetit[tila]:.0f} ms "
+              f"+{args.tolerance:.0%}), {len(tuodut)} moduulia (budjetti {moduulibudjetit[tila]})")
+        if len(tuodut) > moduulibudjetit[tila]:
+            virheet.append(f"{tila}: {len(tuodut)} moduulia > {moduulibudjetit[tila]}")
+        if mediaani > raja:
+            virheet.append(f"{tila}: mediaani {mediaani:.1f} ms > {raja:.0f} ms")
+        for m in kielletyt:
+            if m in tuodut:
+                virheet.append(f"{tila}: tuo moduulin {m}")
+
+    env = dict(os.environ, PYTHONPATH=str(SRC))
+    if subprocess.run([sys.executable, "-c", SIVUVAIKUTUKSETON], env=env).returncode != 0:
+        virheet.append("paketin tuonti lukee konfiguraation")
+
+    for v in virheet:
+        print(f"❌ {v}")
+    return 1 if virheet else 0
+
+
+if __name__ == "__main__":
+    raise SystemExit(main())
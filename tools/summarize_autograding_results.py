@@ -4,20 +4,59 @@
 Tarkoitettu ajettavaksi autograding-repositoryssa, johon opiskelijoiden
 `results.json`-tiedostot tallennetaan nimellä `<opiskelija>-<aikaleima>.json`.
 Oletuksena taulukkoon otetaan kustakin opiskelijasta uusin tulos.
+
+Jäsennetyt tiedostot kirjataan manifestiin (`.summary-manifest.json`
+tuloshakemistossa), joten seuraavalla ajolla luetaan vain uudet tai
+muuttuneet tiedostot. `--rebuild` jäsentää kaikki tiedostot uudelleen.
+
+Tiedostojen tiedot pidetään muistissa ja manifestissa sarakkeina
+(`array`-taulukoina, tehtävien tilat yhtenä tavujonona), joten muistinkulutus
+on muutamia kymmeniä tavuja tiedostoa kohden eikä yhtä Python-oliota per
+kenttä. Manifesti on JSON Lines -muotoinen: otsakerivin jälkeen kukin rivi on
+enintään `MANIFEST_CHUNK` alkion palanen yhdestä sarakkeesta, ja se luetaan
+rivi kerrallaan suoraan sarakkeisiin.
+
+Tehtäväkohtaiset tilastot (läpäisyprosentit, yleisimmät väärät komennot) ja
+opiskelija × tehtävä -tilamatriisi kootaan yhdellä läpikäynnillä
+opiskelijoiden uusimmista tuloksista; `--analytics-dir` kirjoittaa ne myös
+CSV- ja JSON-muodossa. Myös väärät komennot lasketaan vain uusimmista
+tuloksista: komento, jonka opiskelija on myöhemmin korjannut, ei näy
+tilastoissa, ja kukin opiskelija lasketaan kunkin tehtävän kohdalla
+enintään kerran.
+
+`--db` lukee tulokset hakemiston sijaan `tools/results_store.py`:n
+SQLite-tietokannasta, jossa opiskelijoiden uusimmat tulokset ovat valmiina.
 """
 
 from __future__ import annotations
 
 import argparse
+import base64
+import csv
 import json
+import os
 import re
-from dataclasses import dataclass
-from datetime import datetime
+import sys
+from array import array
+from collections import Counter
+from dataclasses import dataclass, field
+from datetime import datetime, timedelta
 from pathlib import Path
+from typing import Iterator
 
 FILENAME_RE = re.compile(
     r"^(?P<student>.+)-(?P<ts>\d{4}-\d{2}-\d{2}T\d{2}-\d{2}-\d{2})\.json$"
 )
+MANIFEST_NAME = ".summary-manifest.json"
+MANIFEST_VERSION = 3
+MANIFEST_CHUNK = 4096  # alkiota per manifestin tietue
+TS_FORMAT = "%Y-%m-%dT%H-%M-%S"
+EPOCH = datetime(1970, 1, 1)
+
+# Tehtävän tila yhtenä tavuna tilamatriisissa
+STATUS_CODES = {"oikein": "O", "väärin": "X", "ei_vastattu": "-"}
+STATUS_OTHER = "?"
+STATUS_SYMBOLS = {"O": "✅", "X": "❌", "-": "·", "?": "?"}
 
 
 @dataclass
@@ -27,45 +66,404 @@ class ResultRow:
     total: int
     source_file: str
     timestamp: datetime
+    statuses: str = ""  # yksi STATUS_CODES-merkki per tehtävä
+    wrong_cmds: dict[int, str] = field(default_factory=dict)  # tehtävä -> väärä komento
 
 
-def parse_result_file(path: Path) -> ResultRow | None:
-    match = FILENAME_RE.match(path.name)
-    if not match:
-        return None
+def parse_per_task(per_task: object) -> tuple[str, dict[int, str]]:
+    """Palauta `per_task`-listasta tilamerkit ja väärin merkityt komennot."""
+    if not isinstance(per_task, list):
+        return "", {}
+    statuses = []
+    wrong = {}
+    for task, item in enumerate(per_task):
+        if not isinstance(item, dict):
+            statuses.append(STATUS_OTHER)
+            continue
+        status = item.get("status")
+        statuses.append(STATUS_CODES.get(status, STATUS_OTHER))
+        cmd = item.get("student_cmd")
+        if status == "väärin" and isinstance(cmd, str) and cmd.strip():
+            wrong[task] = cmd.strip()
+    return "".join(statuses), wrong
 
-    try:
-        data = json.loads(path.read_text(encoding="utf-8"))
-    except json.JSONDecodeError:
-        return None
 
+def parse_result_payload(data: object, student: str, timestamp: datetime, source_file: str) -> ResultRow | None:
+    """Jäsennä yksi `results.json`-sisältö; None, jos pisteet puuttuvat."""
+    if not isinstance(data, dict):
+        return None
     score = data.get("score")
     total = data.get("total")
     if not isinstance(score, int) or not isinstance(total, int):
         return None
 
-    ts = datetime.strptime(match.group("ts"), "%Y-%m-%dT%H-%M-%S")
+    statuses, wrong = parse_per_task(data.get("per_task"))
     return ResultRow(
-        student=match.group("student"),
+        student=student,
         score=score,
         total=total,
-        source_file=path.name,
-        timestamp=ts,
+        source_file=source_file,
+        timestamp=timestamp,
+        statuses=statuses,
+        wrong_cmds=wrong,
     )
 
 
-def collect_rows(results_dir: Path) -> list[ResultRow]:
-    latest_by_student: dict[str, ResultRow] = {}
+def parse_result_file(path: Path) -> ResultRow | None:
+    match = FILENAME_RE.match(path.name)
+    if not match:
+        return None
+
+    try:
+        data = json.loads(path.read_text(encoding="utf-8"))
+    except json.JSONDecodeError:
+        return None
+
+    ts = datetime.strptime(match.group("ts"), TS_FORMAT)
+    return parse_result_payload(data, match.group("student"), ts, path.name)
+
+
+class ResultColumns:
+    """Tulostiedostojen tiedot sarakkeina.
 
-    for path in sorted(results_dir.glob("*.json")):
-        row = parse_result_file(path)
+    Rivi `i` on yksi tulostiedosto. Opiskelijat ja väärät komennot on
+    internoitu taulukoihin (`students`, `commands`), ja sarakkeet viittaavat
+    niihin indekseillä; -1 tarkoittaa tiedostoa, jota ei voitu jäsentää.
+    Tehtävien tilat ovat yhdessä tavujonossa (`status`), ja tiedoston `i`
+    tilat ovat väliltä `status_end[i-1]:status_end[i]`. Väärät komennot
+    (tehtävä, komento) -pareina samaan tapaan (`wrong_end`).
+    """
+
+    STRING_COLUMNS = ("names", "students", "commands")
+    INT_COLUMNS = ("size", "mtime_ns", "student", "score", "total", "ts",
+                   "status_end", "wrong_task", "wrong_cmd", "wrong_end")
+
+    def __init__(self) -> None:
+        self.names: list[str] = []
+        self.students: list[str] = []
+        self.commands: list[str] = []
+        self.status = bytearray()
+        for column in self.INT_COLUMNS:
+            setattr(self, column, array("q"))
+        self._student_ids: dict[str, int] = {}
+        self._command_ids: dict[str, int] = {}
+
+    def __len__(self) -> int:
+        return len(self.names)
+
+    @staticmethod
+    def _intern(value: str, table: list[str], ids: dict[str, int]) -> int:
+        i = ids.get(value)
+        if i is None:
+            i = ids[value] = len(table)
+            table.append(value)
+        return i
+
+    def _append(self, name: str, size: int, mtime_ns: int, student: str | None, score: int, total: int,
+                ts: int, statuses: bytes, wrong: Iterator[tuple[int, str]]) -> None:
+        self.names.append(name)
+        self.size.append(size)
+        self.mtime_ns.append(mtime_ns)
+        self.student.append(-1 if student is None else self._intern(student, self.students, self._student_ids))
+        self.score.append(score)
+        self.total.append(total)
+        self.ts.append(ts)
+        self.status += statuses
+        self.status_end.append(len(self.status))
+        for task, cmd in wrong:
+            self.wrong_task.append(task)
+            self.wrong_cmd.append(self._intern(cmd, self.commands, self._command_ids))
+        self.wrong_end.append(len(self.wrong_task))
+
+    def add(self, name: str, size: int, mtime_ns: int, row: ResultRow | None) -> None:
         if row is None:
-            continue
-        current = latest_by_student.get(row.student)
-        if current is None or row.timestamp > current.timestamp:
-            latest_by_student[row.student] = row
+            self._append(name, size, mtime_ns, None, 0, 0, 0, b"", iter(()))
+            return
+        self._append(name, size, mtime_ns, row.student, row.score, row.total,
+                     int((row.timestamp - EPOCH).total_seconds()),
+                     row.statuses.encode("ascii"), iter(row.wrong_cmds.items()))
+
+    def add_from(self, other: ResultColumns, i: int) -> None:
+        """Kopioi toisen sarakejoukon rivi `i` (muuttumaton tiedosto)."""
+        student = other.student[i]
+        self._append(
+            other.names[i], other.size[i], other.mtime_ns[i],
+            other.students[student] if student >= 0 else None,
+            other.score[i], other.total[i], other.ts[i], bytes(other.statuses(i)),
+            ((task, other.commands[cmd]) for task, cmd in other.wrong(i)),
+        )
+
+    def statuses(self, i: int) -> memoryview:
+        return memoryview(self.status)[self.status_end[i - 1] if i else 0:self.status_end[i]]
+
+    def wrong(self, i: int) -> Iterator[tuple[int, int]]:
+        """Tiedoston `i` väärät komennot (tehtävä, komennon indeksi) -pareina."""
+        for k in range(self.wrong_end[i - 1] if i else 0, self.wrong_end[i]):
+            yield self.wrong_task[k], self.wrong_cmd[k]
+
+    def row(self, i: int) -> ResultRow:
+        return ResultRow(
+            student=self.students[self.student[i]],
+            score=self.score[i],
+            total=self.total[i],
+            source_file=self.names[i],
+            timestamp=EPOCH + timedelta(seconds=self.ts[i]),
+            statuses=bytes(self.statuses(i)).decode("ascii"),
+            wrong_cmds={task: self.commands[cmd] for task, cmd in self.wrong(i)},
+        )
+
+    def latest(self) -> list[int]:
+        """Kunkin opiskelijan uusimman tuloksen rivi, opiskelijan nimen mukaan."""
+        best: dict[int, int] = {}
+        for i, student in enumerate(self.student):
+            if student < 0:
+                continue
+            current = best.get(student)
+            if current is None or self.ts[i] > self.ts[current]:
+                best[student] = i
+        return sorted(best.values(), key=lambda i: (self.students[self.student[i]].lower(), self.ts[i]))
+
+    def records(self, chunk: int = MANIFEST_CHUNK) -> Iterator[list]:
+        """Sarakkeet manifestin tietueina `[sarake, palanen]`, enintään `chunk` alkiota tietueessa."""
+        for c in self.STRING_COLUMNS:
+            values = getattr(self, c)
+            for k in range(0, len(values), chunk):
+                yield [c, values[k:k + chunk]]
+        for k in range(0, len(self.status), chunk * 8):
+            yield ["status", base64.b64encode(self.status[k:k + chunk * 8]).decode("ascii")]
+        for c in self.INT_COLUMNS:
+            values = getattr(self, c)
+            for k in range(0, len(values), chunk):
+                yield [c, base64.b64encode(values[k:k + chunk].tobytes()).decode("ascii")]
+
+    @classmethod
+    def from_records(cls, records: Iterator[object]) -> ResultColumns:
+        """Kokoa sarakkeet manifestin tietueista; heittää `ValueError`-poikkeuksen, jos data on virheellistä."""
+        columns = cls()
+        try:
+            for record in records:
+                column, value = record
+                if column in cls.STRING_COLUMNS:
+                    if not isinstance(value, list) or not all(isinstance(v, str) for v in value):
+                        raise ValueError(f"sarake {column} ei ole merkkijonolista")
+                    getattr(columns, column).extend(value)
+                elif column == "status":
+                    columns.status += base64.b64decode(value)
+                elif column in cls.INT_COLUMNS:
+                    getattr(columns, column).frombytes(base64.b64decode(value))
+                elif column != "latest":
+                    raise ValueError(f"tuntematon tietue {column!r}")
+        except (TypeError, ValueError) as e:
+            raise ValueError(f"virheellinen manifesti: {e}") from None
+        n = len(columns.names)
+        if any(len(getattr(columns, c)) != n for c in ("size", "mtime_ns", "student", "score",
+                                                         "total", "ts", "status_end", "wrong_end")):
+            raise ValueError("virheellinen manifesti: sarakkeiden pituudet eroavat")
+        if len(columns.wrong_task) != len(columns.wrong_cmd):
+            raise ValueError("virheellinen manifesti: väärien komentojen sarakkeet eroavat")
+        return columns
+
+
+def load_manifest(path: Path) -> ResultColumns:
+    """Lue manifesti tietue (rivi) kerrallaan; puuttuva tai virheellinen manifesti on tyhjä."""
+    try:
+        with open(path, encoding="utf-8") as f:
+            header = json.loads(f.readline())
+            if (
+                not isinstance(header, dict)
+                or header.get("version") != MANIFEST_VERSION
+                or header.get("byteorder") != sys.byteorder
+            ):
+                return ResultColumns()
+            return ResultColumns.from_records(json.loads(line) for line in f)
+    except (OSError, ValueError):
+        return ResultColumns()
+
+
+def save_manifest(path: Path, columns: ResultColumns, latest: list[int]) -> None:
+    tmp = path.with_name(path.name + ".tmp")
+    with open(tmp, "w", encoding="utf-8") as f:
+        json.dump({"version": MANIFEST_VERSION, "byteorder": sys.byteorder}, f)
+        f.write("\n")
+        for record in columns.records():
+            json.dump(record, f, ensure_ascii=False, separators=(",", ":"))
+            f.write("\n")
+        for k in range(0, len(latest), MANIFEST_CHUNK):
+            chunk = {columns.students[columns.student[i]]: columns.names[i] for i in latest[k:k + MANIFEST_CHUNK]}
+            json.dump(["latest", chunk], f, ensure_ascii=False, sort_keys=True, separators=(",", ":"))
+            f.write("\n")
+    os.replace(tmp, path)
+
+
+def collect_columns_incremental(
+    results_dir: Path,
+    manifest_path: Path,
+    rebuild: bool = False,
+    ignore_mtime: bool = False,
+) -> tuple[ResultColumns, list[int], int]:
+    """Lue tulostiedostot sarakkeiksi jäsentäen vain uudet tai muuttuneet tiedostot.
+
+    Tiedosto tulkitaan muuttumattomaksi, jos sen koko ja mtime vastaavat
+    manifestia (`ignore_mtime`: pelkkä koko). Tiedostot käsitellään nimen
+    mukaan järjestettyinä. Manifestista poistetaan
+    tiedostot, joita hakemistossa ei enää ole. Palauttaa sarakkeet,
+    opiskelijoiden uusimpien tulosten rivit ja jäsennettyjen tiedostojen määrän.
+    """
+    old = ResultColumns() if rebuild else load_manifest(manifest_path)
+    old_index = {name: i for i, name in enumerate(old.names)}
+    columns = ResultColumns()
+    parsed = 0
+
+    with os.scandir(results_dir) as entries:
+        # Nimen mukaan kuten alkuperäinen sorted(glob(...)): tasatilanteet ja
+        # rivien järjestys eivät riipu hakemiston järjestyksestä
+        for dir_entry in sorted(entries, key=lambda e: e.name):
+            name = dir_entry.name
+            if not name.endswith(".json") or name == MANIFEST_NAME or not dir_entry.is_file():
+                continue
+            st = dir_entry.stat()
+            cached = old_index.get(name)
+            if (
+                cached is not None
+                and old.size[cached] == st.st_size
+                and (ignore_mtime or old.mtime_ns[cached] == st.st_mtime_ns)
+            ):
+                columns.add_from(old, cached)
+                continue
+            columns.add(name, st.st_size, st.st_mtime_ns, parse_result_file(results_dir / name))
+            parsed += 1
+
+    del old, old_index
+    latest = columns.latest()
+    save_manifest(manifest_path, columns, latest)
+    return columns, latest, parsed
+
+
+def collect_columns_from_store(db_path: Path) -> tuple[ResultColumns, list[int]]:
+    """Lue opiskelijoiden uusimmat tulokset SQLite-tietokannasta (ks. `results_store`)."""
+    from results_store import latest_rows, open_store
+
+    conn = open_store(db_path)
+    try:
+        columns = ResultColumns()
+        for row in latest_rows(conn):
+            columns.add(row.source_file, 0, 0, row)
+    finally:
+        conn.close()
+    return columns, list(range(len(columns)))
+
+
+# ---------- Tehtäväkohtaiset tilastot ----------
+
+@dataclass
+class TaskStats:
+    task: int
+    students: int = 0  # opiskelijat, joiden tuloksessa tehtävä on
+    answered: int = 0
+    passed: int = 0
+    wrong: Counter = field(default_factory=Counter)  # komennon indeksi -> opiskelijoita (uusin tulos)
+
+    @property
+    def pass_rate(self) -> float:
+        return self.passed / self.students if self.students else 0.0
+
+
+def task_stats(columns: ResultColumns, latest: list[int]) -> list[TaskStats]:
+    """Kokoa tehtäväkohtaiset tilastot yhdellä läpikäynnillä uusimmista tuloksista."""
+    stats: list[TaskStats] = []
+    passed, wrong = ord("O"), ord("X")
+    for i in latest:
+        statuses = columns.statuses(i)
+        while len(stats) < len(statuses):
+            stats.append(TaskStats(len(stats)))
+        for task, code in enumerate(statuses):
+            s = stats[task]
+            s.students += 1
+            if code == passed:
+                s.passed += 1
+            if code == passed or code == wrong:
+                s.answered += 1
+        for task, cmd in columns.wrong(i):
+            if task < len(stats):
+                stats[task].wrong[cmd] += 1
+    return stats
+
+
+def _md_cell(text: str) -> str:
+    return text.replace("|", "\\|").replace("\n", " ")
+
+
+def build_task_markdown(columns: ResultColumns, latest: list[int], stats: list[TaskStats],
+                        top: int, matrix_limit: int) -> str:
+    lines = [
+        "",
+        "## Tehtävät",
+        "",
+        "| Tehtävä | Läpäisy | Oikein / vastanneet | Yleisimmät väärät komennot |",
+        "|---:|---:|---:|---|",
+    ]
+    for s in stats:
+        common = "<br>".join(
+            f"{n} × `{_md_cell(columns.commands[cmd])}`" for cmd, n in s.wrong.most_common(top)
+        )
+        lines.append(f"| {s.task + 1} | {s.pass_rate:.0%} | {s.passed}/{s.answered} | {common or '-'} |")
+    if not stats:
+        lines.append("| *(ei tehtävätietoja)* | - | - | - |")
+
+    lines += ["", "## Tilamatriisi", ""]
+    if len(latest) > matrix_limit:
+        lines.append(f"*{len(latest)} opiskelijaa: matriisi vain CSV-muodossa (`--analytics-dir`).*")
+        return "\n".join(lines) + "\n"
+    lines.append("| Opiskelija | " + " | ".join(str(t + 1) for t in range(len(stats))) + " |")
+    lines.append("|---|" + "---|" * len(stats))
+    for i in latest:
+        statuses = bytes(columns.statuses(i)).decode("ascii").ljust(len(stats))
+        cells = " | ".join(STATUS_SYMBOLS.get(c, " ") for c in statuses)
+        lines.append(f"| {columns.students[columns.student[i]]} | {cells} |")
+    lines.append("")
+    lines.append("✅ oikein, ❌ väärin, · ei vastattu")
+    return "\n".join(lines) + "\n"
+
 
-    return sorted(latest_by_student.values(), key=lambda r: (r.student.lower(), r.timestamp), reverse=False)
+def write_analytics(directory: Path, columns: ResultColumns, latest: list[int],
+                    stats: list[TaskStats], top: int) -> None:
+    """Kirjoita `tasks.csv`, `wrong_commands.csv`, `matrix.csv` ja `analytics.json`."""
+    directory.mkdir(parents=True, exist_ok=True)
+    with open(directory / "tasks.csv", "w", newline="", encoding="utf-8") as f:
+        w = csv.writer(f)
+        w.writerow(["task", "students", "answered", "passed", "pass_rate"])
+        for s in stats:
+            w.writerow([s.task + 1, s.students, s.answered, s.passed, f"{s.pass_rate:.4f}"])
+    with open(directory / "wrong_commands.csv", "w", newline="", encoding="utf-8") as f:
+        w = csv.writer(f)
+        w.writerow(["task", "rank", "students", "student_cmd"])
+        for s in stats:
+            for rank, (cmd, n) in enumerate(s.wrong.most_common(top), 1):
+                w.writerow([s.task + 1, rank, n, columns.commands[cmd]])
+    with open(directory / "matrix.csv", "w", newline="", encoding="utf-8") as f:
+        w = csv.writer(f)
+        w.writerow(["student", "source_file", "score", "total"] + [f"t{t + 1}" for t in range(len(stats))])
+        for i in latest:
+            statuses = bytes(columns.statuses(i)).decode("ascii")
+            w.writerow([columns.students[columns.student[i]], columns.names[i], columns.score[i],
+                        columns.total[i]] + list(statuses.ljust(len(stats))))
+    analytics = {
+        "students": len(latest),
+        "status_codes": {code: status for status, code in STATUS_CODES.items()},
+        "tasks": [
+            {
+                "task": s.task + 1,
+                "students": s.students,
+                "answered": s.answered,
+                "passed": s.passed,
+                "pass_rate": round(s.pass_rate, 4),
+                "common_wrong": [{"student_cmd": columns.commands[cmd], "students": n}
+                                 for cmd, n in s.wrong.most_common(top)],
+            }
+            for s in stats
+        ],
+    }
+    (directory / "analytics.json").write_text(json.dumps(analytics, ensure_ascii=False, indent=2), encoding="utf-8")
 
 
 def build_markdown(rows: list[ResultRow]) -> str:
@@ -90,14 +488,37 @@ def main() -> int:
     parser = argparse.ArgumentParser(description="Luo autograding-yhteenvetotaulukko.")
     parser.add_argument("--results-dir", default=".", help="Hakemisto jossa JSON-tulokset sijaitsevat")
     parser.add_argument("--output", default="SUMMARY.md", help="Yhteenvetotiedoston polku")
+    parser.add_argument("--manifest", default=None,
+                        help=f"Manifestin polku (oletus: <results-dir>/{MANIFEST_NAME})")
+    parser.add_argument("--rebuild", action="store_true", help="Jäsennä kaikki tiedostot uudelleen")
+    parser.add_argument("--db", default=None,
+                        help="Lue tulokset tästä SQLite-tietokannasta (tools/results_store.py) hakemiston sijaan")
+    parser.add_argument("--ignore-mtime", action="store_true",
+                        help="Vertaa vain tiedostokokoa (esim. CI:ssä, jossa checkout muuttaa mtimet)")
+    parser.add_argument("--analytics-dir", default=None,
+                        help="Kirjoita tehtäväkohtaiset tilastot ja tilamatriisi CSV/JSON-muodossa tähän hakemistoon")
+    parser.add_argument("--top", type=int, default=3, help="Yleisimpiä vääriä komentoja per tehtävä (oletus 3)")
+    parser.add_argument("--matrix-limit", type=int, default=200,
+                        help="Tilamatriisi Markdowniin enintään näin monelle opiskelijalle (oletus 200)")
     args = parser.parse_args()
 
     results_dir = Path(args.results_dir)
     output = Path(args.output)
+    manifest = Path(args.manifest) if args.manifest else results_dir / MANIFEST_NAME
 
-    rows = collect_rows(results_dir)
-    output.write_text(build_markdown(rows), encoding="utf-8")
-    print(f"✅ Yhteenveto kirjoitettu: {output} ({len(rows)} opiskelijaa)")
+    if args.db:
+        columns, latest = collect_columns_from_store(Path(args.db))
+        source = f"tietokannasta {args.db}"
+    else:
+        columns, latest, parsed = collect_columns_incremental(results_dir, manifest, args.rebuild, args.ignore_mtime)
+        source = f"{parsed} tiedostoa jäsennetty"
+    stats = task_stats(columns, latest)
+    markdown = build_markdown([columns.row(i) for i in latest])
+    markdown += build_task_markdown(columns, latest, stats, args.top, args.matrix_limit)
+    output.write_text(markdown, encoding="utf-8")
+    if args.analytics_dir:
+        write_analytics(Path(args.analytics_dir), columns, latest, stats, args.top)
+    print(f"✅ Yhteenveto kirjoitettu: {output} ({len(latest)} opiskelijaa, {source})")
     return 0
 
 
@@ -1,3 +1,6 @@
+# Kirjoita kesken jääneen session vastaukset tila.json:iin ja päivitä results.json
+python3 harjoitus.py --check > /dev/null || true
+
 # Commit files
 git commit -a -m "Done"
 git push